@@ -0,0 +1,63 @@
+import argparse
+import asyncio
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from config import BACKFILL_COUNTER_BUFFER_JOURNAL_PATH, SERVER_URLS
+from src.backfill import BackfillEngine
+from src.database import counter_buffer
+from src.http_client import http_client
+from src.utils import logger
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Backfill historical 5v5 hellgate battles into the database."
+    )
+    parser.add_argument(
+        "--lookback-minutes",
+        type=int,
+        required=True,
+        help="How far back in time to crawl.",
+    )
+    parser.add_argument(
+        "--servers",
+        nargs="+",
+        choices=list(SERVER_URLS),
+        default=list(SERVER_URLS),
+        help="Servers to crawl.",
+    )
+    parser.add_argument(
+        "--reset",
+        action="store_true",
+        help="Discard the saved checkpoint and start from the first page.",
+    )
+    return parser.parse_args()
+
+
+async def run(args: argparse.Namespace):
+    engine = BackfillEngine(
+        max_lookback_minutes=args.lookback_minutes, servers=args.servers
+    )
+    if args.reset:
+        engine.reset()
+    await counter_buffer.start(journal_path=BACKFILL_COUNTER_BUFFER_JOURNAL_PATH)
+    try:
+        await engine.run()
+        logger.warning(
+            "Backfilled battles are not rated. Stop the bot and run python replay_ratings.py "
+            "to rate every battle in time order."
+        )
+    finally:
+        await counter_buffer.stop()
+        await http_client.close()
+
+
+def main():
+    logger.setLevel("INFO")
+    asyncio.run(run(parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""
+Throughput of classifying battles one RawBattle at a time versus one
+classify_battles call, on a mix of synthetic 2v2 and 5v5 battles.
+"""
+import argparse
+import random
+import time
+from src.albion_objects import RawBattle
+from src.batch_classifier import classify_battles
+from benchmarks.synthetic import battle_dict
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000], help="Battles per run."
+    )
+    return parser.parse_args()
+
+
+def synthetic_battles(nb_battles: int) -> list:
+    battle_dicts = []
+    for seed in range(1_000):
+        rng = random.Random(seed)
+        battle_dicts.append(
+            battle_dict(seed, players_per_team=rng.choice([2, 5]), nb_events=rng.choice([3, 6, 10]), seed=seed)
+        )
+    return [battle_dicts[index % len(battle_dicts)] for index in range(nb_battles)]
+
+
+def main():
+    args = parse_args()
+
+    for nb_battles in args.sizes:
+        battle_dicts = synthetic_battles(nb_battles)
+
+        started_at = time.perf_counter()
+        per_battle = [RawBattle(data).hellgate_mode for data in battle_dicts]
+        per_battle_time = time.perf_counter() - started_at
+
+        started_at = time.perf_counter()
+        batch = classify_battles(battle_dicts)
+        batch_time = time.perf_counter() - started_at
+
+        assert per_battle == batch, "batch classification differs from RawBattle"
+        print(
+            f"{nb_battles:>7,} battles: per-battle {nb_battles / per_battle_time:,.0f}/s"
+            f" \tbatch {nb_battles / batch_time:,.0f}/s"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+"""
+Peak and retained memory of parsing one Battle, measured with tracemalloc on
+synthetic 10-player battles with the item caches warm.
+"""
+import argparse
+import copy
+import gc
+import tracemalloc
+from benchmarks.common import add_repo_argument, load_albion_objects
+from benchmarks.synthetic import battle_dict
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__)
+    add_repo_argument(parser)
+    parser.add_argument("--events", type=int, nargs="+", default=[8, 30], help="Events per battle.")
+    parser.add_argument("--battles", type=int, default=20, help="Battles measured per event count.")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    albion_objects = load_albion_objects(args.repo)
+
+    for nb_events in args.events:
+        battle_dicts = [battle_dict(battle_id, nb_events=nb_events, seed=battle_id) for battle_id in range(args.battles + 1)]
+        albion_objects.Battle(copy.deepcopy(battle_dicts[0]))  # warm the item caches
+
+        peaks, retained = [], []
+        for data in battle_dicts[1:]:
+            data = copy.deepcopy(data)
+            gc.collect()
+            tracemalloc.start()
+            battle = albion_objects.Battle(data)
+            current, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            peaks.append(peak)
+            retained.append(current)
+            del battle
+
+        print(
+            f"{nb_events:>3} events: peak {sum(peaks) / len(peaks) / 1024:.1f} KiB, "
+            f"retained {sum(retained) / len(retained) / 1024:.1f} KiB per parsed battle"
+        )
+
+
+if __name__ == "__main__":
+    main()
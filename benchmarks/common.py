@@ -0,0 +1,23 @@
+"""Helpers shared by the benchmarks. Run them from the repository root, e.g. python -m benchmarks.battle_memory."""
+import argparse
+import importlib
+import os
+import sys
+from types import ModuleType
+
+
+def add_repo_argument(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument(
+        "--repo",
+        default=".",
+        help="Checkout whose src/albion_objects.py is benchmarked, e.g. one made with "
+        "git worktree add /tmp/before <rev>. The synthetic battles always come from this tree.",
+    )
+
+
+def load_albion_objects(repo: str) -> ModuleType:
+    # config.py and the item taxonomy are read relative to the checkout
+    repo = os.path.abspath(repo)
+    os.chdir(repo)
+    sys.path.insert(0, repo)
+    return importlib.import_module("src.albion_objects")
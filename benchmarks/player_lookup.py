@@ -0,0 +1,54 @@
+"""
+Battle.get_player over every player reference of a synthetic 10-player
+battle with many events, and the construction of that battle.
+"""
+import argparse
+import copy
+import time
+from benchmarks.common import add_repo_argument, load_albion_objects
+from benchmarks.synthetic import battle_dict
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__)
+    add_repo_argument(parser)
+    parser.add_argument("--events", type=int, default=2000, help="Events in the battle.")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per measure; the best is kept.")
+    return parser.parse_args()
+
+
+def best_of(repeat: int, function) -> float:
+    timings = []
+    for _ in range(repeat):
+        started_at = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - started_at)
+    return min(timings)
+
+
+def main():
+    args = parse_args()
+    albion_objects = load_albion_objects(args.repo)
+    data = battle_dict(1, nb_events=args.events, seed=3)
+
+    battle = albion_objects.Battle(copy.deepcopy(data))
+    player_ids = [
+        player.id
+        for event in battle.events
+        for player in event.participants + event.group_members + [event.killer, event.victim]
+    ]
+
+    def lookups():
+        for player_id in player_ids:
+            battle.get_player(player_id)
+
+    copies = [copy.deepcopy(data) for _ in range(args.repeat)]
+    lookup_time = best_of(args.repeat, lookups)
+    construction_time = best_of(args.repeat, lambda: albion_objects.Battle(copies.pop()))
+
+    print(f"get_player over {len(player_ids)} references: {lookup_time * 1000:.1f} ms")
+    print(f"Battle construction ({args.events} events):   {construction_time * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
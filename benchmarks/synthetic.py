@@ -0,0 +1,77 @@
+"""Synthetic gameinfo battle dicts, shaped like /battles/{id} plus its events."""
+import random
+from datetime import datetime, timedelta, timezone
+
+WEAPONS = ["MAIN_SWORD", "2H_CLAYMORE", "MAIN_HOLYSTAFF", "2H_BOW", "MAIN_NATURESTAFF", "2H_HALBERD"]
+ARMORS = ["ARMOR_PLATE_SET1", "ARMOR_PLATE_SET2", "ARMOR_LEATHER_SET3", "ARMOR_CLOTH_SET1"]
+
+
+def item_dict(item_type: str, rng: random.Random) -> dict:
+    enchantment = rng.choice([0, 0, 1, 2, 3, 4])
+    suffix = f"@{enchantment}" if enchantment else ""
+    return {"Type": f"T{rng.choice([4, 5, 6, 7, 8])}_{item_type}{suffix}", "Quality": rng.randint(1, 5), "Count": 1}
+
+
+def equipment_dict(rng: random.Random) -> dict:
+    weapon = rng.choice(WEAPONS)
+    return {
+        "MainHand": item_dict(weapon, rng),
+        "OffHand": None if weapon.startswith("2H") else item_dict("OFF_SHIELD", rng),
+        "Head": item_dict("HEAD_PLATE_SET1", rng),
+        "Armor": item_dict(rng.choice(ARMORS), rng),
+        "Shoes": item_dict("SHOES_LEATHER_SET1", rng),
+        "Cape": item_dict("CAPEITEM_FW_MARTLOCK", rng),
+        "Bag": item_dict("BAG", rng),
+        "Potion": item_dict("POTION_HEAL", rng),
+        "Food": item_dict("MEAL_STEW", rng),
+        "Mount": None,
+    }
+
+
+def player_dict(player_id: str, equipment: dict) -> dict:
+    return {
+        "Id": player_id,
+        "Name": f"Player{player_id}",
+        "GuildName": "",
+        "AllianceName": "",
+        "Equipment": equipment,
+        "AverageItemPower": 1000,
+    }
+
+
+def battle_dict(battle_id: int, players_per_team: int = 5, nb_events: int = 8, seed: int = 0) -> dict:
+    """
+    A battle between two teams drawn from a small pool of players, so players,
+    rosters and builds repeat across battles. Team b loses every fight.
+    """
+    rng = random.Random(seed)
+    pool = [str(player_id) for player_id in range(4 * players_per_team)]
+    players = rng.sample(pool, 2 * players_per_team)
+    team_a, team_b = players[:players_per_team], players[players_per_team:]
+    # A player keeps the same build within a battle
+    equipments = {player_id: equipment_dict(rng) for player_id in players}
+
+    events = []
+    for event_index in range(nb_events):
+        killer = rng.choice(team_a)
+        victim = team_b[event_index % players_per_team]
+        participants = rng.sample(team_a, rng.randint(1, players_per_team))
+        events.append({
+            "EventId": battle_id * 100 + event_index,
+            "TotalVictimKillFame": rng.randint(1, 10_000),
+            "Killer": player_dict(killer, equipments[killer]),
+            "Victim": player_dict(victim, equipments[victim]),
+            "Participants": [player_dict(player_id, equipments[player_id]) for player_id in participants],
+            "GroupMembers": [player_dict(player_id, equipments[player_id]) for player_id in team_a],
+        })
+
+    start_time = datetime(2024, 5, 1, tzinfo=timezone.utc) + timedelta(minutes=battle_id)
+    return {
+        "id": battle_id,
+        "startTime": start_time.isoformat().replace("+00:00", "Z"),
+        "endTime": (start_time + timedelta(minutes=4)).isoformat().replace("+00:00", "Z"),
+        "players": {player_id: {"name": f"Player{player_id}", "deaths": 0, "kills": 0} for player_id in players},
+        "totalKills": nb_events,
+        "totalFame": 1000,
+        "battle_events": events,
+    }
@@ -0,0 +1,37 @@
+"""
+Battle._split_ids_by_team on synthetic 10-player battles with many events.
+"""
+import argparse
+import copy
+import time
+from benchmarks.common import add_repo_argument, load_albion_objects
+from benchmarks.synthetic import battle_dict
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__)
+    add_repo_argument(parser)
+    parser.add_argument("--events", type=int, nargs="+", default=[200, 2000], help="Events per battle.")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per measure; the best is kept.")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    albion_objects = load_albion_objects(args.repo)
+
+    for nb_events in args.events:
+        battle = albion_objects.Battle(copy.deepcopy(battle_dict(1, nb_events=nb_events, seed=3)))
+
+        timings = []
+        for _ in range(args.repeat):
+            battle.team_conflicts = []
+            started_at = time.perf_counter()
+            battle._split_ids_by_team()
+            timings.append(time.perf_counter() - started_at)
+
+        print(f"{nb_events:>5} events: {min(timings) * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -15,6 +15,8 @@ SERVER_URLS = {
 # TIMING AND RATE LIMITS
 # --------------------------------------------------------------------------------------------------
 RATE_LIMIT_DELAY_SECONDS = 0.5
+RATE_LIMIT_BURST = 5
+MAX_CONCURRENT_REQUESTS_PER_HOST = 10
 TIMEOUT = 30
 BATTLE_CHECK_INTERVAL_MINUTES = 1
 BATTLES_MAX_AGE_MINUTES = 15
@@ -28,6 +30,11 @@ EQUIPMENT_IMAGE_FOLDER = "./images/equipments"
 BATTLE_REPORT_IMAGE_FOLDER = "./images/battle_reports"
 
 CHANNELS_JSON_PATH = "./data/channels.json"
+BACKFILL_CHECKPOINT_PATH = "./data/backfill_checkpoint.json"
+ITEM_TAXONOMY_PATH = "./data/item_taxonomy.json"
+# One counter buffer journal per process role, so the bot and a backfill never replay or trim each other's lines
+COUNTER_BUFFER_JOURNAL_PATH = "./data/counter_buffer_journal_bot.jsonl"
+BACKFILL_COUNTER_BUFFER_JOURNAL_PATH = "./data/counter_buffer_journal_backfill.jsonl"
 
 PLAYER_NAME_FONT_PATH = "arialbd.ttf"
 TIMESTAMP_FONT_PATH = "arial.ttf"
@@ -43,6 +50,86 @@ VERBOSE_LOGGING = False
 # --------------------------------------------------------------------------------------------------
 BATTLES_LIMIT = 50
 MAX_RETRIES = 3
+RETRY_BACKOFF_SECONDS = 1.0
+RECENT_BATTLE_IDS_CACHE_SIZE = 5000
+
+# --------------------------------------------------------------------------------------------------
+# PLAYER STATS CACHE
+# --------------------------------------------------------------------------------------------------
+PLAYER_STATS_CACHE_SIZE = 256
+PLAYER_STATS_CACHE_TTL_SECONDS = 10 * 60
+
+# --------------------------------------------------------------------------------------------------
+# LEADERBOARDS
+# --------------------------------------------------------------------------------------------------
+LEADERBOARD_SIZE = 10
+LEADERBOARD_CANDIDATES = 50
+LEADERBOARD_MIN_BATTLES_FOR_WINRATE = 20
+
+# --------------------------------------------------------------------------------------------------
+# SIMILAR ROSTERS
+# --------------------------------------------------------------------------------------------------
+SIMILAR_ROSTERS_MIN_SHARED_PLAYERS = 3
+SIMILAR_ROSTERS_SIZE = 10
+
+# --------------------------------------------------------------------------------------------------
+# BUILD META ROLLUPS
+# --------------------------------------------------------------------------------------------------
+BUILD_ROLLUP_HOURLY_RETENTION_DAYS = 35
+BUILD_META_SIZE = 10
+BUILD_META_MIN_USES_FOR_WINRATE = 20
+BUILD_MATCHUP_SIZE = 3
+BUILD_MATCHUP_MIN_ENCOUNTERS = 10
+
+# --------------------------------------------------------------------------------------------------
+# RATINGS
+# --------------------------------------------------------------------------------------------------
+RATING_INITIAL = 1500
+RATING_K_FACTOR = 24
+RATING_PROVISIONAL_K_FACTOR = 48
+RATING_PROVISIONAL_BATTLES = 15
+RATING_CACHE_SIZE = 200_000
+RATING_REPLAY_BATCH_SIZE = 5000
+
+# --------------------------------------------------------------------------------------------------
+# BATTLE SUMMARY PRE-FILTER
+# --------------------------------------------------------------------------------------------------
+PREFILTER_MAX_DURATION_MINUTES = 20
+PREFILTER_MAX_DEATHS_PER_PLAYER = 1
+PREFILTER_MIN_TOTAL_KILLS = 1
+
+# --------------------------------------------------------------------------------------------------
+# BATTLE REPORT PIPELINE
+# --------------------------------------------------------------------------------------------------
+PIPELINE_QUEUE_SIZE = 20
+PIPELINE_EVENT_WORKERS = 10
+PIPELINE_PARSE_WORKERS = 2
+PIPELINE_PERSIST_WORKERS = 2
+PIPELINE_RENDER_WORKERS = 1
+PIPELINE_DELIVER_WORKERS = 2
+
+# --------------------------------------------------------------------------------------------------
+# HISTORICAL BACKFILL
+# --------------------------------------------------------------------------------------------------
+BACKFILL_MAX_PAGES = 200
+BACKFILL_CHUNK_PAGES = 10
+BACKFILL_CONCURRENCY = 4
+BACKFILL_RATE_LIMIT_DELAY_SECONDS = 0.2
+
+# --------------------------------------------------------------------------------------------------
+# DATABASE COUNTER BUFFER
+# --------------------------------------------------------------------------------------------------
+COUNTER_BUFFER_FLUSH_INTERVAL_SECONDS = 30
+COUNTER_BUFFER_MAX_PENDING = 2000
+
+# --------------------------------------------------------------------------------------------------
+# HTTP CONNECTION POOL
+# --------------------------------------------------------------------------------------------------
+HTTP_POOL_LIMIT = 100
+HTTP_POOL_LIMIT_PER_HOST = 20
+HTTP_DNS_CACHE_TTL_SECONDS = 300
+HTTP_KEEPALIVE_TIMEOUT_SECONDS = 60
+
 # --------------------------------------------------------------------------------------------------
 # IMAGE GENERATION SETTINGS
 # --------------------------------------------------------------------------------------------------
@@ -86,28 +173,6 @@ LAYOUT = {
 IMAGE_SIZE = 217
 EQUIPMENT_CANVAS_SIZE = (3 * IMAGE_SIZE, 3 * IMAGE_SIZE)
 
-# --------------------------------------------------------------------------------------------------
-# WEAPON LISTS
-# --------------------------------------------------------------------------------------------------
-HEALING_WEAPONS = [
-    "MAIN_HOLYSTAFF",
-    "2H_HOLYSTAFF",
-    "2H_DIVINESTAFF",
-    "MAIN_HOLYSTAFF_MORGANA",
-    "2H_HOLYSTAFF_HELL",
-    "2H_HOLYSTAFF_UNDEAD",
-    "MAIN_HOLYSTAFF_AVALON",
-    "2H_HOLYSTAFF_CRYSTAL",
-    "MAIN_NATURESTAFF",
-    "2H_NATURESTAFF",
-    "2H_WILDSTAFF",
-    "MAIN_NATURESTAFF_KEEPER",
-    "2H_NATURESTAFF_HELL",
-    "2H_NATURESTAFF_KEEPER",
-    "MAIN_NATURESTAFF_AVALON",
-    "MAIN_NATURESTAFF_CRYSTAL",
-]
-
 # --------------------------------------------------------------------------------------------------
 # ALBION STATS
 # --------------------------------------------------------------------------------------------------
@@ -0,0 +1,65 @@
+import argparse
+import asyncio
+import sys
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from src.database import apply_index_manifest, client
+from src.index_audit import audit_index_manifest, audit_queries, seed_audit_database
+from src.utils import logger
+
+PRODUCTION_DATABASE = "hellgate_watcher"
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Run explain() on every query in src/database.py and fail on collection scans."
+    )
+    parser.add_argument(
+        "--database",
+        default="hellgate_watcher_index_audit",
+        help="Database to audit.",
+    )
+    parser.add_argument(
+        "--seed-players",
+        type=int,
+        default=0,
+        help="Drop the database and seed it with this many synthetic players first.",
+    )
+    return parser.parse_args()
+
+
+async def run(args: argparse.Namespace) -> int:
+    database = client[args.database]
+
+    if args.seed_players:
+        if args.database == PRODUCTION_DATABASE:
+            logger.error(f"Refusing to drop and seed the {PRODUCTION_DATABASE} database")
+            return 2
+        await client.drop_database(args.database)
+        await seed_audit_database(database, nb_players=args.seed_players)
+        await apply_index_manifest(database)
+
+    failed = False
+    for problem in await audit_index_manifest(database):
+        logger.error(problem)
+        failed = True
+
+    for audit in await audit_queries(database):
+        logger.info(str(audit))
+        if audit.collection_scans:
+            logger.error(f"{audit.name} scans the {audit.collection} collection")
+            failed = True
+
+    await client.close()
+    return 1 if failed else 0
+
+
+def main():
+    logger.setLevel("INFO")
+    sys.exit(asyncio.run(run(parse_args())))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,39 @@
+import argparse
+import asyncio
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from config import RATING_REPLAY_BATCH_SIZE
+from src.database import client, replay_ratings
+from src.utils import logger
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Rebuild every player and team rating from the battles collection, in time order. "
+        "Stop the bot and any backfill first."
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=RATING_REPLAY_BATCH_SIZE,
+        help="Battles read and rating snapshots written per batch.",
+    )
+    return parser.parse_args()
+
+
+async def run(args: argparse.Namespace):
+    try:
+        await replay_ratings(batch_size=args.batch_size)
+    finally:
+        await client.close()
+
+
+def main():
+    logger.setLevel("INFO")
+    asyncio.run(run(parse_args()))
+
+
+if __name__ == "__main__":
+    main()
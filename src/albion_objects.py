@@ -1,4 +1,5 @@
-from typing import List, Optional
+import sys
+from typing import Dict, List, Optional, Tuple
 from enum import Enum
 from config import (
     BASE_IP,
@@ -6,8 +7,8 @@ from config import (
     LETHAL_2V2_SOFTCAP_PERCENT,
     LETHAL_5V5_IP_CAP,
     LETHAL_5V5_SOFTCAP_PERCENT,
-    HEALING_WEAPONS,
 )
+from src.item_taxonomy import ItemTaxon, item_taxonomy
 from src.utils import logger
 
 
@@ -23,27 +24,64 @@ class Slot(Enum):
     Food = "Food"
 
 
+SLOT_KEYS = tuple(slot.value for slot in Slot)
+
+
 class Item:
+    """
+    Immutable item. Items are shared between players and events, so use
+    from_dict() to get the single cached instance for a (Type, Quality) pair.
+    """
+
+    __slots__ = ("type", "tier", "enchantment", "quality")
+
+    type: str
+    tier: int
+    enchantment: int
+    quality: int
+
+    _flyweights: Dict[Tuple[type, str, int], "Item"] = {}
+
     def __init__(self, item_dict: dict):
-        self.type: str = ""
-        self.tier: int = 0
-        self.enchantment: int = 0
-        self.quality = item_dict["Quality"]
-        item_type = item_dict["Type"]
-        self._parse_item_type(item_type)
-
-    def _parse_item_type(self, item_type: str):
+        item_type, tier, enchantment = self._parse_item_type(item_dict["Type"])
+        object.__setattr__(self, "type", item_type)
+        object.__setattr__(self, "tier", tier)
+        object.__setattr__(self, "enchantment", enchantment)
+        object.__setattr__(self, "quality", item_dict["Quality"])
+
+    @classmethod
+    def from_dict(cls, item_dict: dict) -> "Item":
+        key = (cls, item_dict["Type"], item_dict["Quality"])
+        item = Item._flyweights.get(key)
+        if item is None:
+            item = cls(item_dict)
+            Item._flyweights[key] = item
+        return item
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{self.__class__.__name__} is immutable")
+
+    def __delattr__(self, name):
+        raise AttributeError(f"{self.__class__.__name__} is immutable")
+
+    @staticmethod
+    def _parse_item_type(item_type: str) -> Tuple[str, int, int]:
+        tier = 0
+        enchantment = 0
+
         if item_type[0].upper() == "T":
-            self.tier = int(item_type[1])
+            tier = int(item_type[1])
             item_type = item_type[3:]
-        else:
-            self.tier = 0
 
         if item_type[-2] == "@":
-            self.enchantment = int(item_type[-1])
+            enchantment = int(item_type[-1])
             item_type = item_type[:-2]
 
-        self.type = item_type
+        return sys.intern(item_type), tier, enchantment
+
+    @property
+    def taxon(self) -> ItemTaxon:
+        return item_taxonomy.lookup(self.type)
 
     def __str__(self):
         return f"{self.type.ljust(25)} \tTier: {self.tier} \tEnchantment:{self.enchantment} \tQuality: {self.quality}"
@@ -66,6 +104,22 @@ class Item:
         return ip_cap + (ip - ip_cap) * (soft_cap_percent / 100)
 
     def get_max_item_power(self, ip_cap: float, ip_softcap_percent: int) -> float:
+        """Looks up the item's max item power in the precomputed table."""
+        key = (
+            self.__class__,
+            self.tier,
+            self.enchantment,
+            self.quality,
+            ip_cap,
+            ip_softcap_percent,
+        )
+        item_power = _max_item_power_table.get(key)
+        if item_power is None:
+            item_power = self._compute_max_item_power(ip_cap, ip_softcap_percent)
+            _max_item_power_table[key] = item_power
+        return item_power
+
+    def _compute_max_item_power(self, ip_cap: float, ip_softcap_percent: int) -> float:
         """Calculates base item power without mastery bonuses."""
         item_power = BASE_IP
         item_power += self.tier * 100
@@ -76,11 +130,13 @@ class Item:
 
 
 class ArmorPiece(Item):
+    __slots__ = ()
+
     def __init__(self, item_dict: dict):
         super().__init__(item_dict)
 
-    def get_max_item_power(self, ip_cap: float, ip_softcap_percent: int) -> float:
-        item_power = super().get_max_item_power(ip_cap, ip_softcap_percent)
+    def _compute_max_item_power(self, ip_cap: float, ip_softcap_percent: int) -> float:
+        item_power = super()._compute_max_item_power(ip_cap, ip_softcap_percent)
 
         MASTERY_BONUS_PERCENT = self.tier - 4 * 5
         MAX_ITEM_LEVEL = 120
@@ -106,23 +162,25 @@ class ArmorPiece(Item):
 
     @property
     def is_plate(self) -> bool:
-        return "plate" in self.type.lower()
+        return self.taxon.armor_class == "plate"
 
     @property
     def is_leather(self) -> bool:
-        return "leather" in self.type.lower()
+        return self.taxon.armor_class == "leather"
 
     @property
     def is_cloth(self) -> bool:
-        return "cloth" in self.type.lower()
+        return self.taxon.armor_class == "cloth"
 
 
 class WeaponOrOffhand(Item):
+    __slots__ = ()
+
     def __init__(self, item_dict: dict):
         super().__init__(item_dict)
 
-    def get_max_item_power(self, ip_cap: float, ip_softcap_percent: int) -> float:
-        item_power = super().get_max_item_power(ip_cap, ip_softcap_percent)
+    def _compute_max_item_power(self, ip_cap: float, ip_softcap_percent: int) -> float:
+        item_power = super()._compute_max_item_power(ip_cap, ip_softcap_percent)
 
         MASTERY_BONUS_PERCENT = self.tier - 4 * 5
         MAX_ITEM_LEVEL = 120
@@ -151,63 +209,127 @@ class WeaponOrOffhand(Item):
 
 
 class ItemWithoutIPScaling(Item):
+    __slots__ = ()
+
     def __init__(self, item_dict: dict):
         super().__init__(item_dict)
 
-    def get_max_item_power(self, ip_cap: float, ip_softcap_percent: int) -> float:
-        return super().get_max_item_power(ip_cap, ip_softcap_percent)
+    def _compute_max_item_power(self, ip_cap: float, ip_softcap_percent: int) -> float:
+        return super()._compute_max_item_power(ip_cap, ip_softcap_percent)
 
 
 class MainHand(WeaponOrOffhand):
+    __slots__ = ()
+
     def __init__(self, item_dict: dict):
         super().__init__(item_dict)
 
     @property
     def is_healing_weapon(self) -> bool:
-        return self.type in HEALING_WEAPONS
+        return self.taxon.role == "healer"
+
+    @property
+    def is_two_handed(self) -> bool:
+        return self.taxon.two_handed
 
 
 class OffHand(WeaponOrOffhand):
+    __slots__ = ()
+
     def __init__(self, item_dict: dict):
         super().__init__(item_dict)
 
 
 class Armor(ArmorPiece):
+    __slots__ = ()
+
     def __init__(self, item_dict: dict):
         super().__init__(item_dict)
 
 
 class Head(ArmorPiece):
+    __slots__ = ()
+
     def __init__(self, item_dict: dict):
         super().__init__(item_dict)
 
 
 class Shoes(ArmorPiece):
+    __slots__ = ()
+
     def __init__(self, item_dict: dict):
         super().__init__(item_dict)
 
 
 class Cape(ItemWithoutIPScaling):
+    __slots__ = ()
+
     def __init__(self, item_dict: dict):
         super().__init__(item_dict)
 
 
 class Bag(ItemWithoutIPScaling):
+    __slots__ = ()
+
     def __init__(self, item_dict: dict):
         super().__init__(item_dict)
 
 
 class Potion(ItemWithoutIPScaling):
+    __slots__ = ()
+
     def __init__(self, item_dict: dict):
         super().__init__(item_dict)
 
 
 class Food(ItemWithoutIPScaling):
+    __slots__ = ()
+
     def __init__(self, item_dict: dict):
         super().__init__(item_dict)
 
 
+IP_CAP_PROFILES = [
+    (LETHAL_5V5_IP_CAP, LETHAL_5V5_SOFTCAP_PERCENT),
+    (LETHAL_2V2_IP_CAP, LETHAL_2V2_SOFTCAP_PERCENT),
+]
+MAX_TIER = 8
+MAX_ENCHANTMENT = 4
+MAX_QUALITY = 5
+
+# (item class, tier, enchantment, quality, ip cap, softcap percent) -> max item power
+_max_item_power_table: Dict[Tuple[type, int, int, int, float, int], float] = {}
+
+
+def _build_max_item_power_table() -> None:
+    item_classes = [MainHand, OffHand, Armor, Head, Shoes, Cape, Bag, Potion, Food]
+    for item_class in item_classes:
+        for tier in range(MAX_TIER + 1):
+            for enchantment in range(MAX_ENCHANTMENT + 1):
+                item_type = f"T{tier}_ITEM@{enchantment}" if enchantment else f"T{tier}_ITEM"
+                for quality in range(MAX_QUALITY + 1):
+                    item = item_class({"Type": item_type, "Quality": quality})
+                    for ip_cap, ip_softcap_percent in IP_CAP_PROFILES:
+                        item.get_max_item_power(ip_cap, ip_softcap_percent)
+
+
+_build_max_item_power_table()
+
+
 class Equipment:
+    __slots__ = (
+        "mainhand",
+        "offhand",
+        "armor",
+        "head",
+        "shoes",
+        "cape",
+        "bag",
+        "potion",
+        "food",
+        "_max_average_item_power_cache",
+    )
+
     _item_class_map = {
         Slot.MainHand: MainHand,
         Slot.OffHand: OffHand,
@@ -230,14 +352,16 @@ class Equipment:
         self.bag: Optional[Bag] = None
         self.potion: Optional[Potion] = None
         self.food: Optional[Food] = None
+        self._max_average_item_power_cache: Dict[Tuple[float, int], int] = {}
 
         for slot, item_class in self._item_class_map.items():
             if equipment_dict.get(slot.value):
-                setattr(self, slot.name.lower(), item_class(equipment_dict[slot.value]))
+                setattr(self, slot.name.lower(), item_class.from_dict(equipment_dict[slot.value]))
 
     @property
     def items(self) -> List[Item]:
-        return [item for item in self.__dict__.values() if isinstance(item, Item)]
+        items = [getattr(self, slot.name.lower()) for slot in self._item_class_map]
+        return [item for item in items if isinstance(item, Item)]
 
     def __str__(self):
         equipment = ""
@@ -248,6 +372,16 @@ class Equipment:
         return equipment
 
     def max_average_item_power(self, ip_cap: float, ip_softcap_percent: int) -> int:
+        cap_profile = (ip_cap, ip_softcap_percent)
+        max_average_item_power = self._max_average_item_power_cache.get(cap_profile)
+        if max_average_item_power is None:
+            max_average_item_power = self._compute_max_average_item_power(
+                ip_cap, ip_softcap_percent
+            )
+            self._max_average_item_power_cache[cap_profile] = max_average_item_power
+        return max_average_item_power
+
+    def _compute_max_average_item_power(self, ip_cap: float, ip_softcap_percent: int) -> int:
         total_ip = 0
 
         ip_contributing_items = [
@@ -262,9 +396,8 @@ class Equipment:
             if item:
                 total_ip += item.get_max_item_power(ip_cap, ip_softcap_percent)
 
-        if (
-            self.offhand is None and self.mainhand is not None
-        ):  # 2-handed weapon, counts for two slots
+        if self.mainhand is not None and self.mainhand.is_two_handed:
+            # 2-handed weapon, counts for two slots
             total_ip += self.mainhand.get_max_item_power(ip_cap, ip_softcap_percent)
 
         return int(total_ip / 6)
@@ -281,9 +414,12 @@ class Equipment:
 
             if current_item is None and source_item is not None:
                 setattr(self, slot_name, source_item)
+                self._max_average_item_power_cache.clear()
 
 
 class Player:
+    __slots__ = ("id", "name", "guild", "alliance", "equipment", "average_item_power")
+
     id: str
     name: str
     guild: str
@@ -339,6 +475,159 @@ class Event:
         return event
 
 
+class TeamUnionFind:
+    """
+    Disjoint sets of player ids where every id also knows whether it is on the
+    same side as the root of its set, so sides are resolved in a single pass.
+    """
+
+    def __init__(self):
+        self._parent: Dict[str, str] = {}
+        # 0 if on the same side as the parent, 1 if on the opposite side
+        self._parity: Dict[str, int] = {}
+
+    def find(self, id: str) -> Tuple[str, int]:
+        parent = self._parent.get(id)
+        if parent is None:
+            self._parent[id] = id
+            self._parity[id] = 0
+            return id, 0
+        if parent == id:
+            return id, 0
+        if self._parent[parent] == parent:
+            return parent, self._parity[id]
+
+        path = []
+        root = id
+        while self._parent[root] != root:
+            path.append(root)
+            root = self._parent[root]
+
+        # Compress the path, turning each parity into the parity to the root
+        parity_to_root = 0
+        for node in reversed(path):
+            parity_to_root ^= self._parity[node]
+            self._parity[node] = parity_to_root
+            self._parent[node] = root
+
+        return root, self._parity[id] if path else 0
+
+    def union(self, id_a: str, id_b: str, opposite: bool) -> bool:
+        """Links two ids on the same or opposite sides. Returns False if that contradicts earlier links."""
+        root_a, parity_a = self.find(id_a)
+        root_b, parity_b = self.find(id_b)
+        expected = 1 if opposite else 0
+
+        if root_a == root_b:
+            return parity_a ^ parity_b == expected
+
+        self._parent[root_b] = root_a
+        self._parity[root_b] = parity_a ^ parity_b ^ expected
+        return True
+
+
+class RawBattle:
+    """
+    First parsing phase: classifies a battle straight from its raw event dicts,
+    with the same checks as Battle.is_hellgate_5v5/is_hellgate_2v2, so the full
+    object graph is only built for battles that pass.
+    """
+
+    def __init__(self, battle_dict: dict):
+        if "battle_events" not in battle_dict or battle_dict["battle_events"] is None:
+            raise ValueError(
+                f"Error: \t{battle_dict['id']} battle_events cannot be None"
+            )
+
+        self.id: int = battle_dict["id"]
+        self.events: List[dict] = battle_dict["battle_events"]
+        self.player_ids = {
+            player_dict["Id"]
+            for event_dict in self.events
+            for player_dict in self._event_players(event_dict)
+        }
+
+    @staticmethod
+    def _event_players(event_dict: dict) -> List[dict]:
+        # Same order as Battle._find_and_update_players, so merged players match
+        return (
+            event_dict["Participants"]
+            + event_dict["GroupMembers"]
+            + [event_dict["Killer"], event_dict["Victim"]]
+        )
+
+    @property
+    def hellgate_mode(self) -> str | None:
+        if self.is_hellgate_5v5:
+            return "5v5"
+        if self.is_hellgate_2v2:
+            return "2v2"
+        return None
+
+    @property
+    def is_hellgate_5v5(self) -> bool:
+        return (
+            len(self.player_ids) == 10
+            and self._is_x_vs_x_battle(5)
+            and self._is_ip_capped(
+                ip_cap=LETHAL_5V5_IP_CAP, ip_softcap_percent=LETHAL_5V5_SOFTCAP_PERCENT
+            )
+        )
+
+    @property
+    def is_hellgate_2v2(self) -> bool:
+        return (
+            len(self.player_ids) == 4
+            and self._is_x_vs_x_battle(2)
+            and self._is_ip_capped(
+                ip_cap=LETHAL_2V2_IP_CAP, ip_softcap_percent=LETHAL_2V2_SOFTCAP_PERCENT
+            )
+            and not self.is_depths()
+        )
+
+    def _is_x_vs_x_battle(self, x: int) -> bool:
+        has_team_of_size_x = False
+        for event_dict in self.events:
+            group_member_count = len(event_dict["GroupMembers"])
+            if group_member_count > x:
+                return False
+            if group_member_count == x:
+                has_team_of_size_x = True
+        return has_team_of_size_x
+
+    def is_depths(self) -> bool:
+        return any(event_dict["TotalVictimKillFame"] == 0 for event_dict in self.events)
+
+    def _merged_players(self) -> Dict[str, Tuple[dict, float]]:
+        """Merges every sighting of a player the way Player.update does: first non-empty slot and first non-zero IP win."""
+        merged: Dict[str, Tuple[dict, float]] = {}
+        for event_dict in self.events:
+            for player_dict in self._event_players(event_dict):
+                player_id = player_dict["Id"]
+                equipment_dict = player_dict["Equipment"]
+                if player_id not in merged:
+                    merged[player_id] = (dict(equipment_dict), player_dict["AverageItemPower"])
+                    continue
+
+                merged_equipment, average_item_power = merged[player_id]
+                for slot_key in SLOT_KEYS:
+                    if not merged_equipment.get(slot_key) and equipment_dict.get(slot_key):
+                        merged_equipment[slot_key] = equipment_dict[slot_key]
+                if average_item_power == 0 and player_dict["AverageItemPower"] > 0:
+                    merged[player_id] = (merged_equipment, player_dict["AverageItemPower"])
+        return merged
+
+    def _is_ip_capped(self, ip_cap: float, ip_softcap_percent: int) -> bool:
+        ACCOUNT_FOR_ARTIFACT_IP = 150
+        for equipment_dict, average_item_power in self._merged_players().values():
+            max_average_item_power = Equipment(equipment_dict).max_average_item_power(
+                ip_cap, ip_softcap_percent
+            )
+            if average_item_power > max_average_item_power + ACCOUNT_FOR_ARTIFACT_IP:
+                return False
+        return True
+
+
 class Battle:
     def __init__(self, battle_dict: dict):
         if "battle_events" not in battle_dict or battle_dict["battle_events"] is None:
@@ -355,10 +644,12 @@ class Battle:
         self.victim_ids: List[str] = [event.victim.id for event in self.events]
 
         self.players: List[Player] = []
+        self._players_by_id: Dict[str, Player] = {}
         self._find_and_update_players()
 
         self.team_a_ids: List[str] = []
         self.team_b_ids: List[str] = []
+        self.team_conflicts: List[str] = []
 
         self._split_ids_by_team()
         self._sort_teams_by_class()
@@ -437,15 +728,12 @@ class Battle:
         return has_team_of_size_x
 
     def _is_ip_capped(self, ip_cap: float, ip_softcap_percent: int) -> bool:
+        ACCOUNT_FOR_ARTIFACT_IP = 150
         for player in self.players:
-            ACCOUNT_FOR_ARTIFACT_IP = 150
-            if (
-                player.average_item_power
-                > player.max_average_item_power(ip_cap, ip_softcap_percent)
-                + ACCOUNT_FOR_ARTIFACT_IP
-            ):
+            max_average_item_power = player.max_average_item_power(ip_cap, ip_softcap_percent)
+            if player.average_item_power > max_average_item_power + ACCOUNT_FOR_ARTIFACT_IP:
                 logger.debug(
-                    f"Battle: {self.id} \tPlayer {player.name} has an average item power of {player.average_item_power} and max average item power of {player.max_average_item_power(ip_cap, ip_softcap_percent) + ACCOUNT_FOR_ARTIFACT_IP}",
+                    f"Battle: {self.id} \tPlayer {player.name} has an average item power of {player.average_item_power} and max average item power of {max_average_item_power + ACCOUNT_FOR_ARTIFACT_IP}",
                 )
                 return False
         return True
@@ -462,36 +750,40 @@ class Battle:
 
         all_player_ids = set([player.id for player in self.players])
 
-        # Seed the teams with the first event's killer.
+        # Killers share a side with their group members and oppose their victims.
+        sides = TeamUnionFind()
+        for event in self.events:
+            killer_id = event.killer.id
+            victim_id = event.victim.id
+
+            for group_member in event.group_members:
+                if group_member.id == killer_id:
+                    continue
+                if not sides.union(killer_id, group_member.id, opposite=False):
+                    self.team_conflicts.append(
+                        f"Event {event.id}: {group_member.name} is in the group of {event.killer.name} but on the other side"
+                    )
+            if killer_id != victim_id and not sides.union(killer_id, victim_id, opposite=True):
+                self.team_conflicts.append(
+                    f"Event {event.id}: {event.killer.name} killed {event.victim.name} but they are on the same side"
+                )
+
+        if self.team_conflicts:
+            logger.warning(
+                f"Battle: {self.id} \tConflicting team assignments: {self.team_conflicts}"
+            )
+
+        # Seed the teams with the first event's killer; every player linked to it gets a side.
         if self.events:
-            first_killer_id = self.events[0].killer.id
-            team_a_ids.add(first_killer_id)
-
-        # Iteratively assign players to teams until the assignments are stable.
-        for _ in range(len(all_player_ids) + 1):
-            for event in self.events:
-                killer_id = event.killer.id
-                victim_id = event.victim.id
-
-                group_member_ids = {player.id for player in event.group_members}
-
-                if killer_id in team_a_ids:
-                    team_a_ids.update(group_member_ids)
-                    if victim_id not in team_a_ids:
-                        team_b_ids.add(victim_id)
-                elif killer_id in team_b_ids:
-                    team_b_ids.update(group_member_ids)
-                    if victim_id not in team_b_ids:
-                        team_a_ids.add(victim_id)
-
-                if victim_id in team_a_ids:
-                    if killer_id not in team_a_ids:
-                        team_b_ids.add(killer_id)
-                        team_b_ids.update(group_member_ids)
-                elif victim_id in team_b_ids:
-                    if killer_id not in team_b_ids:
-                        team_a_ids.add(killer_id)
-                        team_a_ids.update(group_member_ids)
+            seed_root, seed_parity = sides.find(self.events[0].killer.id)
+            for player_id in all_player_ids:
+                root, parity = sides.find(player_id)
+                if root != seed_root:
+                    continue
+                if parity == seed_parity:
+                    team_a_ids.add(player_id)
+                else:
+                    team_b_ids.add(player_id)
 
         # Assigning any remaining unassigned players
         # if either team is full, add any remaining players to the other team
@@ -510,10 +802,10 @@ class Battle:
         self.team_b_ids = list(team_b_ids)
 
     def get_player(self, id: str) -> Player:
-        for player in self.players:
-            if player.id == id:
-                return player
-        raise ValueError(f"Player with id {id} not found")
+        player = self._players_by_id.get(id)
+        if player is None:
+            raise ValueError(f"Player with id {id} not found")
+        return player
 
     def _sort_teams_by_class(self) -> None:
         self.team_a_ids = self._sort_team(self.team_a_ids)
@@ -527,8 +819,7 @@ class Battle:
         cloth = []
         unknown = []
 
-        # Initialize player_id_to_player_map for efficient lookup
-        player_id_to_player_map = {p.id: p for p in self.players}
+        player_id_to_player_map = self._players_by_id
 
         for player_id in team:
             player = player_id_to_player_map.get(player_id)
@@ -544,24 +835,16 @@ class Battle:
                 unknown.append(player_id)
                 continue
 
-            if player.equipment.armor.is_plate:
-                if (
-                    "ROYAL" in player.equipment.armor.type
-                    or "SET1" in player.equipment.armor.type
-                ):
+            armor_taxon = player.equipment.armor.taxon
+            if armor_taxon.armor_class == "plate":
+                if armor_taxon.role == "melee":
                     melees.append(player_id)
-                    continue
                 else:
                     tanks.append(player_id)
-                    continue
-
-            if player.equipment.armor.is_leather:
+            elif armor_taxon.armor_class == "leather":
                 leathers.append(player_id)
-                continue
-
-            if player.equipment.armor.is_cloth:
+            elif armor_taxon.armor_class == "cloth":
                 cloth.append(player_id)
-                continue
 
         def key(player_id):
             player = player_id_to_player_map.get(player_id)
@@ -587,7 +870,9 @@ class Battle:
                 event.participants + event.group_members + [event.killer, event.victim]
             )
             for player in all_players:
-                try:
-                    self.get_player(player.id).update(player)
-                except ValueError:
+                known_player = self._players_by_id.get(player.id)
+                if known_player is not None:
+                    known_player.update(player)
+                else:
+                    self._players_by_id[player.id] = player
                     self.players.append(player)
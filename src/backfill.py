@@ -0,0 +1,212 @@
+import asyncio
+import json
+import os
+import time
+from typing import Dict, List, Tuple
+from config import (
+    SERVER_URLS,
+    BACKFILL_MAX_PAGES,
+    BACKFILL_CHUNK_PAGES,
+    BACKFILL_CONCURRENCY,
+    BACKFILL_RATE_LIMIT_DELAY_SECONDS,
+    BACKFILL_CHECKPOINT_PATH,
+)
+from src.hellgate_watcher import HellgateWatcher
+from src.http_client import HostBudget
+from src.utils import logger
+
+
+class BackfillEngine:
+    """
+    Crawls historical battles for 5v5 hellgates. The recent battles list
+    grows at the front while it is crawled, so progress is anchored on the
+    oldest battle id processed per server and page offsets are only a search
+    position: pages are fetched in order, battles at or after the anchor are
+    skipped, and a page that starts past the anchor sends the search back.
+    Each chunk of pages is processed in parallel under one global request
+    budget, then checkpointed so a restarted backfill resumes where it stopped.
+    """
+
+    def __init__(
+        self,
+        max_lookback_minutes: int,
+        servers: List[str] = ["europe", "americas", "asia"],
+        max_pages: int = BACKFILL_MAX_PAGES,
+        chunk_pages: int = BACKFILL_CHUNK_PAGES,
+        concurrency: int = BACKFILL_CONCURRENCY,
+        checkpoint_path: str = BACKFILL_CHECKPOINT_PATH,
+    ):
+        self.max_lookback_minutes = max_lookback_minutes
+        self.servers = servers
+        self.max_pages = max_pages
+        self.chunk_pages = chunk_pages
+        self.checkpoint_path = checkpoint_path
+
+        self._budget = HostBudget(
+            max_concurrent=concurrency,
+            delay_seconds=BACKFILL_RATE_LIMIT_DELAY_SECONDS,
+            burst=concurrency,
+        )
+        self._page_semaphore = asyncio.Semaphore(concurrency)
+        self._checkpoint_lock = asyncio.Lock()
+        self._checkpoint: Dict = {}
+
+        self._started_at = 0.0
+        self.pages_done = 0
+        self.battles_scanned = 0
+        self.battles_saved = 0
+
+    # --- Checkpoint ---
+
+    @staticmethod
+    def _new_server_state() -> Dict:
+        # oldest_id: every battle from the start of the backfill down to this id has been processed
+        return {"oldest_id": None, "search_page": 0, "done": False, "saved": 0}
+
+    def _new_checkpoint(self) -> Dict:
+        return {
+            "max_lookback_minutes": self.max_lookback_minutes,
+            "servers": {server: self._new_server_state() for server in self.servers},
+        }
+
+    def _load_checkpoint(self) -> Dict:
+        if not os.path.exists(self.checkpoint_path):
+            return self._new_checkpoint()
+
+        checkpoint = HellgateWatcher.load_json(self.checkpoint_path)
+        if checkpoint.get("max_lookback_minutes") != self.max_lookback_minutes:
+            logger.warning("Backfill checkpoint was made with other settings, starting over")
+            return self._new_checkpoint()
+        if any("oldest_id" not in state for state in checkpoint["servers"].values()):
+            logger.warning("Backfill checkpoint uses offset chunks, starting over")
+            return self._new_checkpoint()
+
+        for server in self.servers:
+            checkpoint["servers"].setdefault(server, self._new_server_state())
+        logger.info(f"Resuming backfill from {self.checkpoint_path}")
+        return checkpoint
+
+    def _save_checkpoint(self) -> None:
+        os.makedirs(os.path.dirname(self.checkpoint_path), exist_ok=True)
+        tmp_path = f"{self.checkpoint_path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self._checkpoint, f, indent=4)
+        os.replace(tmp_path, self.checkpoint_path)
+
+    def reset(self) -> None:
+        if os.path.exists(self.checkpoint_path):
+            os.remove(self.checkpoint_path)
+
+    # --- Crawl ---
+
+    async def _fetch_page(self, server: str, page_number: int) -> List[dict]:
+        async with self._budget.acquire():
+            return await HellgateWatcher._get_50_battles(SERVER_URLS[server], page=page_number)
+
+    async def _fetch_chunk(self, server: str) -> Tuple[List[List[dict]], int | None, int, bool]:
+        """
+        Fetches, in order, up to chunk_pages pages of battles older than the
+        server's anchor. Returns the pages, the new anchor, the next search
+        page and whether the server is done.
+
+        A page fetched right after the page before it can only overlap it,
+        since new battles push older ones to later offsets. Any other page
+        whose newest battle is already older than the anchor may have skipped
+        battles, so the search steps back a page.
+        """
+        server_state = self._checkpoint["servers"][server]
+        oldest_id = server_state["oldest_id"]
+        page_number = server_state["search_page"]
+        previous_page_number = None
+        pages = []
+
+        while len(pages) < self.chunk_pages:
+            if page_number >= self.max_pages:
+                logger.info(f"Reached the page limit ({self.max_pages}) on {server}")
+                return pages, oldest_id, page_number, True
+
+            batch = await self._fetch_page(server, page_number)
+            if not batch:
+                logger.info(f"No more battles found on {server} at page {page_number}")
+                return pages, oldest_id, page_number, True
+
+            ids = [battle_dict["id"] for battle_dict in batch]
+            follows_previous_page = previous_page_number == page_number - 1
+            previous_page_number = page_number
+
+            if oldest_id is not None and min(ids) >= oldest_id:
+                # Already processed, the anchor has moved to a later offset
+                page_number += 1
+                continue
+            if oldest_id is not None and max(ids) < oldest_id and not follows_previous_page and page_number > 0:
+                page_number -= 1
+                previous_page_number = None
+                continue
+
+            batch = [battle_dict for battle_dict in batch if oldest_id is None or battle_dict["id"] < oldest_id]
+            pages.append(batch)
+            oldest_id = min(battle_dict["id"] for battle_dict in batch)
+
+            if HellgateWatcher._contains_battles_out_of_range(
+                batch, range_minutes=self.max_lookback_minutes
+            ):
+                logger.info(f"Reached lookback limit ({self.max_lookback_minutes}m) on {server} at page {page_number}")
+                return pages, oldest_id, page_number, True
+
+            page_number += 1
+
+        return pages, oldest_id, page_number, False
+
+    async def _process_page(self, server: str, batch: List[dict]) -> int:
+        async with self._page_semaphore:
+            # Ratings are left to replay_ratings, see save_data_from_battles5v5
+            results = await HellgateWatcher.process_battles(batch, server, rate=False)
+        saved_in_page = len([b for b in results if b and b.is_hellgate_5v5])
+
+        self.pages_done += 1
+        self.battles_scanned += len(batch)
+        self.battles_saved += saved_in_page
+        return saved_in_page
+
+    async def _run_server(self, server: str) -> None:
+        server_state = self._checkpoint["servers"][server]
+
+        while not server_state["done"]:
+            pages, oldest_id, search_page, done = await self._fetch_chunk(server)
+            saved_in_chunk = sum(
+                await asyncio.gather(*[self._process_page(server, batch) for batch in pages])
+            )
+
+            # The anchor only moves once every page up to it has been processed
+            async with self._checkpoint_lock:
+                server_state["oldest_id"] = oldest_id
+                server_state["search_page"] = search_page
+                server_state["done"] = done
+                server_state["saved"] += saved_in_chunk
+                self._save_checkpoint()
+
+            self._log_progress(server)
+
+    def _log_progress(self, server: str) -> None:
+        server_state = self._checkpoint["servers"][server]
+        nb_done = len([state for state in self._checkpoint["servers"].values() if state["done"]])
+        elapsed = time.monotonic() - self._started_at
+        logger.info(
+            f"Backfill {server} down to battle {server_state['oldest_id']} (page {server_state['search_page']}) "
+            f"\t{nb_done}/{len(self.servers)} servers done "
+            f"\t{self.pages_done} pages \t{self.battles_saved} 5v5 saved "
+            f"\t{self.pages_done / elapsed:.2f} pages/s \t{self.battles_scanned / elapsed:.1f} battles/s"
+        )
+
+    async def run(self) -> Dict[str, int]:
+        self._checkpoint = self._load_checkpoint()
+        self._started_at = time.monotonic()
+
+        servers_left = [server for server in self.servers if not self._checkpoint["servers"][server]["done"]]
+        logger.info(f"Backfill started: {len(servers_left)} servers left (Lookback: {self.max_lookback_minutes}m)")
+        await asyncio.gather(*[self._run_server(server) for server in servers_left])
+
+        saved = {server: self._checkpoint["servers"][server]["saved"] for server in self.servers}
+        for server, total_saved in saved.items():
+            logger.info(f"Finished {server}. Total 5v5 battles saved: {total_saved}")
+        return saved
@@ -0,0 +1,207 @@
+from functools import cache
+from typing import List, Tuple
+import numpy as np
+from config import (
+    LETHAL_2V2_IP_CAP,
+    LETHAL_2V2_SOFTCAP_PERCENT,
+    LETHAL_5V5_IP_CAP,
+    LETHAL_5V5_SOFTCAP_PERCENT,
+)
+from src.albion_objects import (
+    MAX_ENCHANTMENT,
+    MAX_QUALITY,
+    MAX_TIER,
+    Equipment,
+    Item,
+    RawBattle,
+    Slot,
+)
+from src.utils import logger
+
+# Same order as Equipment._compute_max_average_item_power, so sums match bit for bit
+IP_SLOTS = [Slot.Head, Slot.Armor, Slot.Shoes, Slot.MainHand, Slot.OffHand, Slot.Cape]
+IP_SLOT_ROWS = [
+    (slot_index, slot.value, Equipment._item_class_map[slot])
+    for slot_index, slot in enumerate(IP_SLOTS)
+]
+MAINHAND_INDEX = IP_SLOTS.index(Slot.MainHand)
+ACCOUNT_FOR_ARTIFACT_IP = 150
+
+
+class PackedBattles:
+    """
+    Column arrays for a batch of battles, with one row per event, per merged
+    player and per item power contributing item. Built with add() and then
+    converted to NumPy arrays by freeze().
+    """
+
+    _COLUMNS = {
+        "event_battle": np.int64,
+        "event_group_size": np.int64,
+        "event_fame": np.float64,
+        "player_battle": np.int64,
+        "player_average_item_power": np.float64,
+        "item_player": np.int64,
+        "item_slot": np.int64,
+        "item_tier": np.int64,
+        "item_enchantment": np.int64,
+        "item_quality": np.int64,
+    }
+
+    def __init__(self, nb_battles: int):
+        self.nb_battles = nb_battles
+        self.player_counts = np.zeros(nb_battles, dtype=np.int64)
+        self.valid = np.ones(nb_battles, dtype=bool)
+        # (item row, item) for items outside the lookup table's range
+        self.fallback_items: List[Tuple[int, Item]] = []
+        for column in self._COLUMNS:
+            setattr(self, column, [])
+
+    def add(self, battle_index: int, battle_dict: dict) -> None:
+        try:
+            self._add(battle_index, battle_dict)
+        except Exception as e:
+            # Rows already packed for this battle are ignored once it is invalid
+            logger.error(f"An error occurred while packing battle {battle_dict.get('id')}: {e}")
+            self.valid[battle_index] = False
+
+    def _add(self, battle_index: int, battle_dict: dict) -> None:
+        raw_battle = RawBattle(battle_dict)
+        self.player_counts[battle_index] = len(raw_battle.player_ids)
+        for event_dict in raw_battle.events:
+            self.event_battle.append(battle_index)
+            self.event_group_size.append(len(event_dict["GroupMembers"]))
+            self.event_fame.append(event_dict["TotalVictimKillFame"])
+
+        # Only battles with a hellgate player count can pass, skip packing the rest
+        if self.player_counts[battle_index] not in (4, 10):
+            return
+
+        for equipment_dict, average_item_power in raw_battle._merged_players().values():
+            player_index = len(self.player_battle)
+            self.player_battle.append(battle_index)
+            self.player_average_item_power.append(average_item_power)
+
+            rows = [
+                (slot_index, item_class.from_dict(equipment_dict[slot_key]))
+                for slot_index, slot_key, item_class in IP_SLOT_ROWS
+                if equipment_dict.get(slot_key)
+            ]
+            # 2-handed weapon, counts for two slots
+            rows += [
+                (slot_index, item)
+                for slot_index, item in rows
+                if slot_index == MAINHAND_INDEX and item.is_two_handed
+            ]
+
+            for slot_index, item in rows:
+                in_table = (
+                    isinstance(item.quality, int)
+                    and 0 <= item.tier <= MAX_TIER
+                    and 0 <= item.enchantment <= MAX_ENCHANTMENT
+                    and 0 <= item.quality <= MAX_QUALITY
+                )
+                if not in_table:
+                    self.fallback_items.append((len(self.item_player), item))
+                self.item_player.append(player_index)
+                self.item_slot.append(slot_index)
+                self.item_tier.append(item.tier if in_table else 0)
+                self.item_enchantment.append(item.enchantment if in_table else 0)
+                self.item_quality.append(item.quality if in_table else 0)
+
+    def freeze(self) -> None:
+        for column, dtype in self._COLUMNS.items():
+            setattr(self, column, np.asarray(getattr(self, column), dtype=dtype))
+
+
+@cache
+def _max_item_power_lookup(ip_cap: float, ip_softcap_percent: int) -> np.ndarray:
+    """[slot, tier, enchantment, quality] -> max item power, built from the precomputed item table."""
+    lookup = np.zeros(
+        (len(IP_SLOTS), MAX_TIER + 1, MAX_ENCHANTMENT + 1, MAX_QUALITY + 1), dtype=np.float64
+    )
+    for slot_index, slot in enumerate(IP_SLOTS):
+        item_class = Equipment._item_class_map[slot]
+        for tier in range(MAX_TIER + 1):
+            for enchantment in range(MAX_ENCHANTMENT + 1):
+                item_type = f"T{tier}_ITEM@{enchantment}" if enchantment else f"T{tier}_ITEM"
+                for quality in range(MAX_QUALITY + 1):
+                    item = item_class({"Type": item_type, "Quality": quality})
+                    lookup[slot_index, tier, enchantment, quality] = item.get_max_item_power(
+                        ip_cap, ip_softcap_percent
+                    )
+    return lookup
+
+
+def _is_x_vs_x(packed: PackedBattles, x: int) -> np.ndarray:
+    too_large = np.zeros(packed.nb_battles, dtype=bool)
+    np.logical_or.at(too_large, packed.event_battle, packed.event_group_size > x)
+    has_team_of_size_x = np.zeros(packed.nb_battles, dtype=bool)
+    np.logical_or.at(has_team_of_size_x, packed.event_battle, packed.event_group_size == x)
+    return has_team_of_size_x & ~too_large
+
+
+def _is_depths(packed: PackedBattles) -> np.ndarray:
+    depths = np.zeros(packed.nb_battles, dtype=bool)
+    np.logical_or.at(depths, packed.event_battle, packed.event_fame == 0)
+    return depths
+
+
+def _is_ip_capped(packed: PackedBattles, ip_cap: float, ip_softcap_percent: int) -> np.ndarray:
+    item_power = _max_item_power_lookup(ip_cap, ip_softcap_percent)[
+        packed.item_slot, packed.item_tier, packed.item_enchantment, packed.item_quality
+    ]
+    for row, item in packed.fallback_items:
+        item_power[row] = item.get_max_item_power(ip_cap, ip_softcap_percent)
+
+    # bincount adds rows in order, which keeps the per-player float sums identical
+    total_item_power = np.bincount(
+        packed.item_player, weights=item_power, minlength=len(packed.player_battle)
+    )
+    max_average_item_power = np.trunc(total_item_power / 6)
+    over_cap = (
+        packed.player_average_item_power > max_average_item_power + ACCOUNT_FOR_ARTIFACT_IP
+    )
+
+    battle_over_cap = np.zeros(packed.nb_battles, dtype=bool)
+    np.logical_or.at(battle_over_cap, packed.player_battle, over_cap)
+    return ~battle_over_cap
+
+
+def pack_battles(battle_dicts: List[dict]) -> PackedBattles:
+    packed = PackedBattles(len(battle_dicts))
+    for battle_index, battle_dict in enumerate(battle_dicts):
+        packed.add(battle_index, battle_dict)
+    packed.freeze()
+    return packed
+
+
+def classify_battles(battle_dicts: List[dict]) -> List[str | None]:
+    """
+    Classifies a batch of battle dicts (with battle_events) as "5v5", "2v2" or
+    None in one vectorized pass. Matches RawBattle.hellgate_mode and
+    Battle.is_hellgate_5v5/is_hellgate_2v2.
+    """
+    if not battle_dicts:
+        return []
+
+    packed = pack_battles(battle_dicts)
+
+    is_5v5 = (
+        packed.valid
+        & (packed.player_counts == 10)
+        & _is_x_vs_x(packed, 5)
+        & _is_ip_capped(packed, LETHAL_5V5_IP_CAP, LETHAL_5V5_SOFTCAP_PERCENT)
+    )
+    is_2v2 = (
+        packed.valid
+        & (packed.player_counts == 4)
+        & _is_x_vs_x(packed, 2)
+        & _is_ip_capped(packed, LETHAL_2V2_IP_CAP, LETHAL_2V2_SOFTCAP_PERCENT)
+        & ~_is_depths(packed)
+    )
+
+    return [
+        "5v5" if battle_is_5v5 else "2v2" if battle_is_2v2 else None
+        for battle_is_5v5, battle_is_2v2 in zip(is_5v5.tolist(), is_2v2.tolist())
+    ]
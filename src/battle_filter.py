@@ -0,0 +1,73 @@
+from collections import Counter
+from datetime import datetime
+from config import (
+    PREFILTER_MAX_DURATION_MINUTES,
+    PREFILTER_MAX_DEATHS_PER_PLAYER,
+    PREFILTER_MIN_TOTAL_KILLS,
+)
+from src.utils import logger
+
+
+class BattleSummaryFilter:
+    """
+    Rejects battles that cannot be hellgates using only the fields of the
+    /battles listing, so no events request is spent on them.
+    """
+
+    def __init__(
+        self,
+        max_duration_minutes: float = PREFILTER_MAX_DURATION_MINUTES,
+        max_deaths_per_player: int = PREFILTER_MAX_DEATHS_PER_PLAYER,
+        min_total_kills: int = PREFILTER_MIN_TOTAL_KILLS,
+    ):
+        self.max_duration_minutes = max_duration_minutes
+        self.max_deaths_per_player = max_deaths_per_player
+        self.min_total_kills = min_total_kills
+        self.accepted: int = 0
+        self.rejected: Counter = Counter()
+
+    def rejection_reason(self, battle_dict: dict) -> str | None:
+        players = battle_dict["players"]
+        player_count = len(players)
+        total_kills = battle_dict.get("totalKills", 0)
+
+        if total_kills < self.min_total_kills:
+            return "too_few_kills"
+
+        # Nobody respawns in a hellgate, so at least one player survives
+        if total_kills > player_count - 1:
+            return "too_many_kills"
+
+        for player in players.values():
+            if player.get("deaths", 0) > self.max_deaths_per_player:
+                return "player_died_too_often"
+
+        duration = datetime.fromisoformat(battle_dict["endTime"]) - datetime.fromisoformat(
+            battle_dict["startTime"]
+        )
+        if duration.total_seconds() > self.max_duration_minutes * 60:
+            return "too_long"
+
+        # 2v2 hellgates are rejected in the depths, where fights give no fame
+        if player_count == 4 and battle_dict.get("totalFame", 0) == 0:
+            return "no_fame"
+
+        return None
+
+    def accepts(self, battle_dict: dict) -> bool:
+        reason = self.rejection_reason(battle_dict)
+        if reason:
+            logger.debug(f"Battle {battle_dict['id']} rejected from summary: {reason}")
+            self.rejected[reason] += 1
+            return False
+        self.accepted += 1
+        return True
+
+    def log_stats(self) -> None:
+        total_rejected = sum(self.rejected.values())
+        logger.info(
+            f"Summary filter: {self.accepted} accepted, {total_rejected} rejected {dict(self.rejected)}"
+        )
+
+
+battle_summary_filter = BattleSummaryFilter()
@@ -1,28 +1,65 @@
+import io
+import time
 import discord
 from discord.ext import commands, tasks
 from discord import app_commands
+from functools import partial
+from typing import Dict, List, Tuple
 from src.hellgate_watcher import (
-    HellgateWatcher,
     clear_battle_reports_images,
     clear_equipments_images,
 )
 from src.image_generator import BattleReportImageGenerator
+from src.pipeline import BattleReportPipeline
 from config import (
     BOT_COMMAND_PREFIX,
     BATTLE_CHECK_INTERVAL_MINUTES,
 )
-from src.database import get_channels, add_channel, remove_channel, DBChannel, get_player_by_name_and_server, get_player_statistics
+from src.database import (
+    get_channels,
+    add_channel,
+    remove_channel,
+    DBChannel,
+    get_player_by_name_and_server,
+    get_player_statistics,
+    get_leaderboard,
+    get_most_played_builds,
+    get_build_matchups,
+    get_most_active_team_of_player,
+    get_similar_rosters,
+    get_player_names,
+    counter_buffer,
+    player_stats_cache,
+    player_name_index,
+    load_player_name_index,
+    setup_database,
+    get_missing_derived_collections,
+    rebuild_derived_collections,
+)
+from src.battle_filter import battle_summary_filter
+from src.http_client import http_client
 from src.utils import logger
 
 
+# DISCORD BOT
 
+class HellgateBot(commands.Bot):
+    async def setup_hook(self):
+        missing_collections = await get_missing_derived_collections()
+        await setup_database()
+        await counter_buffer.start()
+        await rebuild_derived_collections(missing_collections)
+        await load_player_name_index()
 
+    async def close(self):
+        await counter_buffer.stop()
+        await http_client.close()
+        await super().close()
 
-# DISCORD BOT
 
 intents = discord.Intents.default()
 intents.message_content = True
-bot = commands.Bot(command_prefix=BOT_COMMAND_PREFIX, intents=intents)
+bot = HellgateBot(command_prefix=BOT_COMMAND_PREFIX, intents=intents)
 
 
 @bot.event
@@ -88,30 +125,33 @@ async def setchannel(
 @tasks.loop(minutes=BATTLE_CHECK_INTERVAL_MINUTES)
 async def send_battle_reports():
     logger.info("Started looking for new battle reports...")
-    battles = await HellgateWatcher.get_recent_battles()
-    battle_reports: dict[str, dict[str, list[str]]]= await get_battle_reports(battles)
-    await verify_channels()
+    report_channels = await get_report_channels()
 
-    for server in ["europe", "americas", "asia"]:
-        for mode in ["5v5", "2v2"]:
+    await BattleReportPipeline(deliver=partial(deliver_battle_report, report_channels)).run()
 
-            channels = [await get_discord_channel(dbchannel) for dbchannel in await get_channels(server=server, hg_type=mode)]
-
-            for battle in battle_reports[server][mode]:
-                for channel in channels:
-                    if not channel:
-                        continue
-                    try:
-                        await channel.send(file=discord.File(battle))   
-                        logger.info(f"Sent battle {battle.removeprefix('battle_report_').removesuffix('.png')} report to {channel.name}")
-                    except Exception as e:
-                        logger.error(
-                            f"An error occurred while sending battle report: {e}"
-                        )
-                        continue
+    http_client.log_stats()
+    battle_summary_filter.log_stats()
+    logger.info(f"Player stats cache: {player_stats_cache.stats}")
     logger.info("finished sending out battle reports")
 
 
+async def deliver_battle_report(
+    report_channels: Dict[Tuple[str, str], List[discord.TextChannel]],
+    server: str,
+    mode: str,
+    battle_report: str,
+):
+    for channel in report_channels.get((server, mode), []):
+        try:
+            await channel.send(file=discord.File(battle_report))
+            logger.info(f"Sent battle {battle_report.removeprefix('battle_report_').removesuffix('.png')} report to {channel.name}")
+        except Exception as e:
+            logger.error(
+                f"An error occurred while sending battle report: {e}"
+            )
+            continue
+
+
 @tasks.loop(hours=2)
 async def clear_storage():
     logger.info("Clearing storage...")
@@ -121,45 +161,31 @@ async def clear_storage():
     logger.info("Cleared equipment images...")
 
 
-async def get_battle_reports(battles):
-    battle_reports = {}
-    for server in ["europe", "americas", "asia"]:
-        battle_reports[server] = {}
-        if "5v5" in battles[server]:
-            battle_reports[server]["5v5"] = [
-                await BattleReportImageGenerator.generate_battle_report_5v5(battle)
-                for battle in battles[server]["5v5"]
-            ]
-        if "2v2" in battles[server]:
-            battle_reports[server]["2v2"] = [
-                await BattleReportImageGenerator.generate_battle_report_2v2(battle)
-                for battle in battles[server]["2v2"]
-            ]
-    return battle_reports
-
-
-async def verify_channels():
+async def get_report_channels() -> Dict[Tuple[str, str], List[discord.TextChannel]]:
+    """
+    Fetches every report channel once per cycle, by (server, mode), and removes
+    the ones that no longer exist. Every battle of the cycle is delivered to these.
+    """
+    report_channels = {}
     for server in ["europe", "americas", "asia"]:
         for mode in ["5v5", "2v2"]:
-            channels = await get_channels(server=server, hg_type=mode)
-            for channel in channels:
-                if not await channel_exists(channel.channel_id):
-                    await remove_channel(channel)
-
-async def channel_exists(channel_id) -> bool:
-    try:
-        channel = await bot.fetch_channel(channel_id)
-        logger.debug(f"Found channel '{channel.name}' ({channel_id})")  # type: ignore
-        return True
-    except Exception as e:
-        logger.error(f"Something went wrong fetching channel {channel_id}: {e}")
-        return False
+            report_channels[(server, mode)] = []
+            for dbchannel in await get_channels(server=server, hg_type=mode):
+                channel = await get_discord_channel(dbchannel)
+                if channel is None:
+                    await remove_channel(dbchannel)
+                else:
+                    report_channels[(server, mode)].append(channel)
+    return report_channels
 
 async def get_discord_channel(channel: DBChannel) -> discord.TextChannel | None:
-    if await channel_exists(channel.channel_id):
+    try:
         discord_channel = await bot.fetch_channel(channel.channel_id)
         logger.debug(f"Found channel '{discord_channel.name}' ({discord_channel.id})")  # type: ignore
         return discord_channel # type: ignore
+    except Exception as e:
+        logger.error(f"Something went wrong fetching channel {channel.channel_id}: {e}")
+        return None
     
 
 @app_commands.describe(
@@ -176,16 +202,165 @@ async def get_discord_channel(channel: DBChannel) -> discord.TextChannel | None:
 @bot.tree.command(name="stats", description="See the stats of a player.")
 async def get_player_stats(interaction: discord.Interaction, player_name: str, server: str):
     await interaction.response.defer()
+    started_at = time.monotonic()
+
+    player = await get_player_by_name_and_server(player_name, server)
+    if not player:
+        await interaction.followup.send("Cannot find player", ephemeral=True)
+        return
+
+    cache_key = (server, player.id)
+    cached = player_stats_cache.get(cache_key)
+    if cached is not None:
+        _, summary_image = cached
+    else:
+        stats = await get_player_statistics(player=player)
+        if not stats:
+            await interaction.followup.send("Cannot find stats for this player", ephemeral=True)
+            return
+
+        image_path = await BattleReportImageGenerator.generate_player_stats_summary_image(stats)
+        with open(image_path, "rb") as f:
+            summary_image = f.read()
+        player_stats_cache.set(cache_key, (stats, summary_image))
+
+    await interaction.followup.send(
+        file=discord.File(io.BytesIO(summary_image), filename=f"stats_{player.id}.png")
+    )
+    logger.info(f"/stats {player_name} ({server}) answered in {(time.monotonic() - started_at) * 1000:.0f}ms")
+
+@get_player_stats.autocomplete("player_name")
+async def player_name_autocomplete(interaction: discord.Interaction, current: str):
+    # The server option may not be filled in yet, suggestions then come from every server
+    server = getattr(interaction.namespace, "server", None)
+    return [
+        app_commands.Choice(name=name, value=name)
+        for name in player_name_index.suggest(server, current)
+    ]
+
+@app_commands.describe(
+    player_name="The name of the player.",
+    server="The server the player is on.",
+)
+@app_commands.choices(
+    server=[
+        app_commands.Choice(name="Europe", value="europe"),
+        app_commands.Choice(name="Americas", value="americas"),
+        app_commands.Choice(name="Asia", value="asia"),
+    ]
+)
+@bot.tree.command(name="matchups", description="See which builds counter a player's most played build.")
+async def get_player_matchups(interaction: discord.Interaction, player_name: str, server: str):
+    await interaction.response.defer()
 
     player = await get_player_by_name_and_server(player_name, server)
     if not player:
         await interaction.followup.send("Cannot find player", ephemeral=True)
         return
 
-    stats = await get_player_statistics(player=player)
-    if not stats:
-        await interaction.followup.send("Cannot find stats for this player", ephemeral=True)
+    builds = await get_most_played_builds(player.id, limit_number=1)
+    if not builds or not builds[0]["equipment"]:
+        await interaction.followup.send("Cannot find builds for this player", ephemeral=True)
         return
-    
-    image_path = await BattleReportImageGenerator.generate_player_stats_summary_image(stats)
-    await interaction.followup.send(file=discord.File(image_path))
\ No newline at end of file
+
+    build = builds[0]
+    matchups = await get_build_matchups(server, build["equipment_hash_id"])
+    if not matchups["counters"] and not matchups["victims"]:
+        await interaction.followup.send("Not enough battles with this build yet", ephemeral=True)
+        return
+
+    image_path = await BattleReportImageGenerator.generate_build_matchups_image(build, matchups)
+    await interaction.followup.send(file=discord.File(image_path))
+
+get_player_matchups.autocomplete("player_name")(player_name_autocomplete)
+
+@app_commands.describe(
+    player_name="The name of the player.",
+    server="The server the player is on.",
+)
+@app_commands.choices(
+    server=[
+        app_commands.Choice(name="Europe", value="europe"),
+        app_commands.Choice(name="Americas", value="americas"),
+        app_commands.Choice(name="Asia", value="asia"),
+    ]
+)
+@bot.tree.command(name="team", description="See a player's main 5v5 roster and the rosters it rotates with.")
+async def get_player_team(interaction: discord.Interaction, player_name: str, server: str):
+    await interaction.response.defer()
+
+    player = await get_player_by_name_and_server(player_name, server)
+    if not player:
+        await interaction.followup.send("Cannot find player", ephemeral=True)
+        return
+
+    team = await get_most_active_team_of_player(player.id)
+    if not team:
+        await interaction.followup.send("Cannot find a team for this player", ephemeral=True)
+        return
+
+    rosters = await get_similar_rosters(server, team.player_ids)
+    names = await get_player_names(list({player_id for roster, _ in rosters for player_id in roster.player_ids}))
+
+    # Players who are not in the main roster are marked with a *
+    lines = [f"{'Shared'.ljust(6)} {'Players'.ljust(80)} {'Battles'.rjust(7)} {'Winrate'.rjust(8)} {'Last seen'.rjust(10)}"]
+    for roster, nb_shared_players in rosters:
+        members = ", ".join(
+            sorted(
+                names.get(player_id, "?") if player_id in team.player_ids else f"*{names.get(player_id, '?')}"
+                for player_id in roster.player_ids
+            )
+        )
+        winrate = f"{round(roster.nb_wins / roster.nb_battles * 100, 2)}%" if roster.nb_battles else "-"
+        lines.append(
+            f"{f'{nb_shared_players}/{len(team.player_ids)}'.ljust(6)} {members[:80].ljust(80)} {str(roster.nb_battles).rjust(7)} {winrate.rjust(8)} {roster.last_seen.strftime('%Y-%m-%d').rjust(10)}"
+        )
+
+    title = f"**{player.name}'s {server.capitalize()} 5v5 rosters**"
+    await interaction.followup.send(title + "\n```\n" + "\n".join(lines) + "\n```")
+
+get_player_team.autocomplete("player_name")(player_name_autocomplete)
+
+@app_commands.describe(
+    server="The server to get the leaderboard of.",
+    entity="Rank players or teams.",
+    metric="What to rank by.",
+)
+@app_commands.choices(
+    server=[
+        app_commands.Choice(name="Europe", value="europe"),
+        app_commands.Choice(name="Americas", value="americas"),
+        app_commands.Choice(name="Asia", value="asia"),
+    ],
+    entity=[
+        app_commands.Choice(name="Players", value="players"),
+        app_commands.Choice(name="Teams", value="teams"),
+    ],
+    metric=[
+        app_commands.Choice(name="Battles", value="battles"),
+        app_commands.Choice(name="Wins", value="wins"),
+        app_commands.Choice(name="Winrate", value="winrate"),
+        app_commands.Choice(name="Rating", value="rating"),
+    ],
+)
+@bot.tree.command(name="leaderboard", description="See the top 5v5 players or teams of a server.")
+async def leaderboard(interaction: discord.Interaction, server: str, entity: str, metric: str):
+    await interaction.response.defer()
+
+    board = await get_leaderboard(server=server, entity=entity, metric=metric)
+    if not board or not board.entries:
+        await interaction.followup.send("No leaderboard for this server yet", ephemeral=True)
+        return
+
+    lines = [f"{'#'.ljust(3)} {entity[:-1].capitalize().ljust(40)} {'Battles'.rjust(7)} {'Wins'.rjust(6)} {'Winrate'.rjust(8)}"]
+    if metric == "rating":
+        lines[0] += f" {'Rating'.rjust(7)}"
+    for rank, entry in enumerate(board.entries, start=1):
+        winrate = f"{round(entry.nb_wins / entry.nb_battles * 100, 2)}%" if entry.nb_battles else "-"
+        line = f"{str(rank).ljust(3)} {entry.name[:40].ljust(40)} {str(entry.nb_battles).rjust(7)} {str(entry.nb_wins).rjust(6)} {winrate.rjust(8)}"
+        if metric == "rating":
+            line += f" {str(round(entry.value)).rjust(7)}"
+        lines.append(line)
+
+    title = f"**{server.capitalize()} 5v5 {entity} by {metric}**"
+    await interaction.followup.send(title + "\n```\n" + "\n".join(lines) + "\n```")
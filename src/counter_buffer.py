@@ -0,0 +1,315 @@
+import asyncio
+import json
+import os
+from collections import Counter
+from datetime import datetime
+from typing import Awaitable, Callable, Dict, List, Tuple
+from pymongo import UpdateOne
+from src.utils import logger
+
+
+def _encode(value):
+    if isinstance(value, datetime):
+        return {"$date": value.isoformat()}
+    raise TypeError(f"Cannot journal {type(value).__name__}")
+
+
+def _decode(obj: dict):
+    if "$date" in obj and len(obj) == 1:
+        return datetime.fromisoformat(obj["$date"])
+    return obj
+
+
+class PendingUpdate:
+    """Merged counter update for one document, flushed as a single upsert."""
+
+    __slots__ = ("inc", "max", "set", "set_on_insert", "add_to_set")
+
+    def __init__(self):
+        self.inc: Counter = Counter()
+        self.max: Dict = {}
+        self.set: Dict = {}
+        self.set_on_insert: Dict = {}
+        self.add_to_set: Dict[str, set] = {}
+
+    def merge(
+        self, inc: Dict, max_fields: Dict, set_fields: Dict, set_on_insert: Dict, add_to_set: Dict
+    ) -> None:
+        self.inc.update(inc)
+        for field, value in max_fields.items():
+            if field not in self.max or value > self.max[field]:
+                self.max[field] = value
+        self.set.update(set_fields)
+        for field, value in set_on_insert.items():
+            self.set_on_insert.setdefault(field, value)
+        for field, values in add_to_set.items():
+            self.add_to_set.setdefault(field, set()).update(values)
+
+    def to_update(self) -> Dict:
+        update = {}
+        if self.inc:
+            update["$inc"] = dict(self.inc)
+        if self.max:
+            update["$max"] = self.max
+        if self.set:
+            update["$set"] = self.set
+        if self.set_on_insert:
+            update["$setOnInsert"] = self.set_on_insert
+        if self.add_to_set:
+            update["$addToSet"] = {
+                field: {"$each": sorted(values)} for field, values in self.add_to_set.items()
+            }
+        return update
+
+
+class CounterBuffer:
+    """
+    Write-behind buffer for counter upserts. Increments are merged per
+    (collection, _id), last-seen style fields keep their max and set members
+    are unioned, so a hot document costs one write per flush instead of one
+    per battle.
+
+    The buffer flushes every flush_interval_seconds, as soon as max_pending
+    documents are waiting, and on stop(). Every add() is appended to a JSONL
+    journal first; the lines of the collections a flush wrote are trimmed
+    from it and the rest are replayed by start(), so unflushed increments
+    survive a restart. A crash in the middle of a flush can replay that
+    flush's increments once more. The journal belongs to one process: the
+    bot and a backfill each start the buffer with their own journal_path.
+    The on_flush(collection, ids) coroutine is awaited for every collection
+    once its documents are written.
+    """
+
+    def __init__(
+        self,
+        db,
+        journal_path: str,
+        flush_interval_seconds: float,
+        max_pending: int,
+        on_flush: Callable[[str, List[str]], Awaitable[None]] | None = None,
+    ):
+        self.db = db
+        self.on_flush = on_flush
+        self.journal_path = journal_path
+        self.flush_interval_seconds = flush_interval_seconds
+        self.max_pending = max_pending
+
+        self._pending: Dict[Tuple[str, str], PendingUpdate] = {}
+        self._journal = None
+        self._journal_lines = 0
+        self._flush_lock = asyncio.Lock()
+        self._timer_task: asyncio.Task | None = None
+        self._size_flush_task: asyncio.Task | None = None
+
+        self.nb_adds = 0
+        self.nb_writes = 0
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    # --- Journal ---
+
+    def _open_journal(self) -> None:
+        if self._journal is None:
+            os.makedirs(os.path.dirname(self.journal_path), exist_ok=True)
+            self._journal = open(self.journal_path, "a")
+
+    def _append_to_journal(self, entry: Dict) -> None:
+        self._open_journal()
+        self._journal.write(json.dumps(entry, default=_encode) + "\n")
+        self._journal.flush()
+        self._journal_lines += 1
+
+    def _trim_journal(self, nb_flushed_lines: int, failed_collections: set = frozenset()) -> None:
+        """
+        Drops the first nb_flushed_lines journal lines, except those of the collections
+        whose flush failed, and keeps the lines added during the flush.
+        """
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
+        with open(self.journal_path, "r") as f:
+            lines = f.readlines()
+
+        remaining_lines = [
+            line
+            for line in lines[:nb_flushed_lines]
+            if failed_collections and json.loads(line)["collection"] in failed_collections
+        ] + lines[nb_flushed_lines:]
+
+        tmp_path = f"{self.journal_path}.tmp"
+        with open(tmp_path, "w") as f:
+            f.writelines(remaining_lines)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.journal_path)
+        self._journal_lines = len(remaining_lines)
+
+    def _replay_journal(self) -> int:
+        if not os.path.exists(self.journal_path):
+            return 0
+
+        valid_lines = []
+        with open(self.journal_path, "r") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line, object_hook=_decode)
+                except json.JSONDecodeError:
+                    # Last line of a journal cut short by a crash
+                    logger.warning(f"Skipping a corrupted line in {self.journal_path}")
+                    continue
+                self._merge(**entry)
+                valid_lines.append(line if line.endswith("\n") else f"{line}\n")
+
+        # Rewritten without corrupted lines so new entries start on a clean line
+        tmp_path = f"{self.journal_path}.tmp"
+        with open(tmp_path, "w") as f:
+            f.writelines(valid_lines)
+        os.replace(tmp_path, self.journal_path)
+        self._journal_lines = len(valid_lines)
+        return len(valid_lines)
+
+    # --- Buffer ---
+
+    def _merge(
+        self,
+        collection: str,
+        id: str,
+        inc: Dict,
+        max_fields: Dict,
+        set_fields: Dict,
+        set_on_insert: Dict,
+        add_to_set: Dict | None = None,  # missing from journals written before it existed
+    ) -> None:
+        pending = self._pending.get((collection, id))
+        if pending is None:
+            pending = PendingUpdate()
+            self._pending[(collection, id)] = pending
+        pending.merge(inc, max_fields, set_fields, set_on_insert, add_to_set or {})
+
+    def _merge_update(self, collection: str, id: str, update: PendingUpdate) -> None:
+        self._merge(
+            collection, id, update.inc, update.max, update.set, update.set_on_insert, update.add_to_set
+        )
+
+    def add(
+        self,
+        collection: str,
+        id: str,
+        inc: Dict | None = None,
+        max_fields: Dict | None = None,
+        set_fields: Dict | None = None,
+        set_on_insert: Dict | None = None,
+        add_to_set: Dict[str, List] | None = None,
+    ) -> None:
+        entry = {
+            "collection": collection,
+            "id": id,
+            "inc": inc or {},
+            "max_fields": max_fields or {},
+            "set_fields": set_fields or {},
+            "set_on_insert": set_on_insert or {},
+            "add_to_set": add_to_set or {},
+        }
+        self._append_to_journal(entry)
+        self._merge(**entry)
+        self.nb_adds += 1
+
+        if len(self._pending) >= self.max_pending and (
+            self._size_flush_task is None or self._size_flush_task.done()
+        ):
+            self._size_flush_task = asyncio.get_running_loop().create_task(self.flush())
+
+    async def flush(self) -> int:
+        """
+        Writes every pending update, one unordered bulk_write per collection.
+        Returns the number of documents written.
+        """
+        async with self._flush_lock:
+            if not self._pending:
+                return 0
+
+            pending, self._pending = self._pending, {}
+            nb_flushed_lines = self._journal_lines
+
+            operations: Dict[str, list] = {}
+            for (collection, id), update in pending.items():
+                operations.setdefault(collection, []).append(
+                    UpdateOne({"_id": id}, update.to_update(), upsert=True)
+                )
+
+            collections = list(operations)
+            results = await asyncio.gather(
+                *[
+                    self.db[collection].bulk_write(operations[collection], ordered=False)
+                    for collection in collections
+                ],
+                return_exceptions=True,
+            )
+            failed_collections = set()
+            for collection, result in zip(collections, results):
+                if isinstance(result, Exception):
+                    logger.error(f"An error occurred while flushing {collection} counters: {result}")
+                    failed_collections.add(collection)
+
+            if failed_collections:
+                # Failed updates go back in front of the ones added during the flush and
+                # are retried next time; their journal lines are kept until they are written
+                added_during_flush, self._pending = self._pending, {}
+                for (collection, id), update in pending.items():
+                    if collection in failed_collections:
+                        self._merge_update(collection, id, update)
+                for (collection, id), update in added_during_flush.items():
+                    self._merge_update(collection, id, update)
+
+            self._trim_journal(nb_flushed_lines, failed_collections)
+            written_collections = [
+                collection for collection in collections if collection not in failed_collections
+            ]
+            nb_written = sum(len(operations[collection]) for collection in written_collections)
+            self.nb_writes += nb_written
+            if self.on_flush is not None:
+                for collection in written_collections:
+                    try:
+                        await self.on_flush(
+                            collection, [op._filter["_id"] for op in operations[collection]]
+                        )
+                    except Exception as e:
+                        logger.error(f"An error occurred after flushing {collection} counters: {e}")
+            logger.debug(
+                f"Flushed {nb_written} counter documents ({self.nb_adds} updates buffered so far)"
+            )
+            return nb_written
+
+    # --- Lifecycle ---
+
+    async def _run_timer(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval_seconds)
+            await self.flush()
+
+    async def start(self, journal_path: str | None = None) -> None:
+        """Replays the journal and starts the flush timer. journal_path replaces the constructor's."""
+        if self._timer_task is not None:
+            return
+
+        if journal_path is not None:
+            self.journal_path = journal_path
+
+        nb_replayed = self._replay_journal()
+        if nb_replayed:
+            logger.info(f"Replayed {nb_replayed} unflushed counter updates from {self.journal_path}")
+            await self.flush()
+        self._timer_task = asyncio.create_task(self._run_timer())
+
+    async def stop(self) -> None:
+        if self._timer_task is not None:
+            self._timer_task.cancel()
+            self._timer_task = None
+        await self.flush()
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
+        logger.info(
+            f"Counter buffer stopped: {self.nb_adds} updates written as {self.nb_writes} documents"
+        )
@@ -1,15 +1,45 @@
+import asyncio
 import hashlib
 import os
+import time
 from typing import List, Optional, Dict, Tuple
-from datetime import datetime, timezone
+from datetime import datetime, timedelta, timezone
 from itertools import combinations
 from pydantic import BaseModel, Field
-from pymongo import AsyncMongoClient, collation
-from pymongo.errors import DuplicateKeyError
+from pymongo import AsyncMongoClient, ReplaceOne, UpdateOne, collation
+from pymongo.errors import BulkWriteError
 
 # Assuming your directory structure allows this import
+from config import (
+    SERVER_URLS,
+    LEADERBOARD_SIZE,
+    LEADERBOARD_CANDIDATES,
+    LEADERBOARD_MIN_BATTLES_FOR_WINRATE,
+    RECENT_BATTLE_IDS_CACHE_SIZE,
+    PLAYER_STATS_CACHE_SIZE,
+    PLAYER_STATS_CACHE_TTL_SECONDS,
+    COUNTER_BUFFER_JOURNAL_PATH,
+    COUNTER_BUFFER_FLUSH_INTERVAL_SECONDS,
+    COUNTER_BUFFER_MAX_PENDING,
+    BUILD_ROLLUP_HOURLY_RETENTION_DAYS,
+    BUILD_META_SIZE,
+    BUILD_META_MIN_USES_FOR_WINRATE,
+    BUILD_MATCHUP_SIZE,
+    BUILD_MATCHUP_MIN_ENCOUNTERS,
+    RATING_INITIAL,
+    RATING_K_FACTOR,
+    RATING_PROVISIONAL_K_FACTOR,
+    RATING_PROVISIONAL_BATTLES,
+    RATING_CACHE_SIZE,
+    RATING_REPLAY_BATCH_SIZE,
+    SIMILAR_ROSTERS_MIN_SHARED_PLAYERS,
+    SIMILAR_ROSTERS_SIZE,
+)
 from src.albion_objects import Battle, Equipment, Player, Slot
-from src.utils import logger
+from src.counter_buffer import CounterBuffer
+from src.name_index import PlayerNameIndex
+from src.ratings import EloRatings
+from src.utils import LRUCache, TTLCache, logger
 
 
 # --- Configuration ---
@@ -20,6 +50,67 @@ client = AsyncMongoClient(MONGO_URI)
 db = client["hellgate_watcher"]
 processed_batches = db["processed_battle_ids"]
 
+# Ids processed in the last few cycles, checked before hitting processed_battle_ids
+recent_battle_ids = LRUCache(maxsize=RECENT_BATTLE_IDS_CACHE_SIZE)
+
+# (server, player id) -> (statistics dict, rendered summary PNG bytes) for /stats
+player_stats_cache = TTLCache(
+    maxsize=PLAYER_STATS_CACHE_SIZE, ttl_seconds=PLAYER_STATS_CACHE_TTL_SECONDS
+)
+
+
+def invalidate_player_stats(player_ids: List[str]) -> None:
+    for player_id in player_ids:
+        for server in SERVER_URLS:
+            player_stats_cache.pop((server, player_id))
+
+
+async def _on_counters_flushed(collection: str, ids: List[str]) -> None:
+    # Player and team counters land in the database on flush, later than the battle itself
+    if collection == "players":
+        invalidate_player_stats(ids)
+    if collection in LEADERBOARD_ENTITIES:
+        await update_leaderboards(collection, ids)
+
+
+# Set by setup_database once every player has name_lc; until then lookups by name fall back to a collation
+players_name_lc_migrated = False
+
+
+# Player names per server for /stats autocomplete, loaded by load_player_name_index
+player_name_index = PlayerNameIndex()
+
+
+async def load_player_name_index() -> None:
+    started_at = time.monotonic()
+    player_name_index.clear()
+    for player in await db.players.find({}, {"name": 1, "server": 1}).to_list():
+        player_name_index.add(player["server"], player["name"])
+    logger.info(
+        f"Loaded {player_name_index.nb_names} player names in {time.monotonic() - started_at:.2f}s"
+    )
+
+
+# Current ratings of recently seen players and teams, loaded by load_ratings before a battle is rated.
+# Unflushed ratings belong to the last few thousand documents added to the counter buffer, far fewer
+# than RATING_CACHE_SIZE, so only ratings already written to the database are ever evicted.
+ratings = EloRatings(
+    initial_rating=RATING_INITIAL,
+    k_factor=RATING_K_FACTOR,
+    provisional_k_factor=RATING_PROVISIONAL_K_FACTOR,
+    provisional_battles=RATING_PROVISIONAL_BATTLES,
+    maxsize=RATING_CACHE_SIZE,
+)
+
+
+# Merges the $inc counters of players, teams, equipments and relationships between flushes
+counter_buffer = CounterBuffer(
+    db,
+    journal_path=COUNTER_BUFFER_JOURNAL_PATH,
+    flush_interval_seconds=COUNTER_BUFFER_FLUSH_INTERVAL_SECONDS,
+    max_pending=COUNTER_BUFFER_MAX_PENDING,
+    on_flush=_on_counters_flushed,
+)
 
 
 # --- Pydantic Models for Database ---
@@ -75,6 +166,8 @@ class DBPlayer(BaseModel):
     nb_wins: int = 0
     nb_losses: int = 0
     server: str
+    rating: float = RATING_INITIAL
+    nb_rated_battles: int = 0
 
 
 class DBTeam(BaseModel):
@@ -87,6 +180,8 @@ class DBTeam(BaseModel):
     nb_losses: int = 0
     server: str
     last_seen: datetime
+    rating: float = RATING_INITIAL
+    nb_rated_battles: int = 0
 
 
 class UsageMetadata(BaseModel):
@@ -115,6 +210,21 @@ class DBPlayer_Equipment_Usage_Logs(BaseModel):
             raise Exception(f"Equipment with ID {self.equipment_hash_id} not found")
 
 
+class RatingMetadata(BaseModel):
+    entity: str  # "players" or "teams"
+    id: str  # player_id or player_ids_hash
+    battle_id: int
+
+
+class DBRatingSnapshot(BaseModel):
+    """Rating of a player or team after one battle, in the rating_history time-series collection"""
+
+    timestamp: datetime  # battle start time
+    metadata: RatingMetadata
+    rating: float
+    delta: float
+
+
 class DBPlayer_Relationship(BaseModel):
     """Social graph to find 'who plays with who' (Rotating 5th logic)"""
 
@@ -167,6 +277,60 @@ class DBChannel(BaseModel):
     hg_type: str
     channel_id: int
 
+
+class DBCrawlCursor(BaseModel):
+    """High-water mark of the newest battle already crawled on a server"""
+
+    id: str = Field(alias="_id")  # server
+    battle_id: int
+    start_time: datetime
+
+
+class DBLeaderboardEntry(BaseModel):
+    id: str = Field(alias="_id")  # player_id or player_ids_hash
+    name: str  # player name, or the team's player names joined
+    nb_battles: int = 0
+    nb_wins: int = 0
+    nb_losses: int = 0
+    rating: Optional[float] = None
+    nb_rated_battles: int = 0
+    value: float
+
+
+class DBLeaderboard(BaseModel):
+    """Materialized top entities of a server for one metric, kept up to date during ingest"""
+
+    id: str = Field(alias="_id")  # "{server}:{entity}:{metric}"
+    server: str
+    entity: str  # "players" or "teams"
+    metric: str  # "battles", "wins", "winrate" or "rating"
+    entries: List[DBLeaderboardEntry] = []
+    updated_at: datetime
+
+
+class DBBuildRollup(BaseModel):
+    """Usage of one build on a server during one hour or one day, kept up to date during ingest"""
+
+    id: str = Field(alias="_id")  # "{server}:{equipment_hash_id}:{bucket:%Y%m%d%H}"
+    server: str
+    equipment_hash_id: str
+    bucket: datetime  # start of the hour or day
+    nb_uses: int = 0
+    nb_wins: int = 0
+    player_ids: List[str] = []
+    team_ids: List[str] = []  # player_ids_hash of the teams the build was played in
+
+
+class DBBuildMatchup(BaseModel):
+    """How a build did against an opponent build on a server, kept up to date during ingest"""
+
+    id: str = Field(alias="_id")  # "{server}:{equipment_hash_id}:{opponent_hash_id}"
+    server: str
+    equipment_hash_id: str
+    opponent_hash_id: str
+    nb_encounters: int = 0  # battles with the build on one team and the opponent on the other
+    nb_wins: int = 0  # of those, battles the build's team won
+
 # --- Helper Functions ---
 
 
@@ -184,20 +348,33 @@ def get_team_hash(player_ids: List[str]) -> str:
     return hashlib.md5(",".join(sorted(player_ids)).encode()).hexdigest()
 
 
+def get_leaderboard_id(server: str, entity: str, metric: str) -> str:
+    return f"{server}:{entity}:{metric}"
+
+
+def get_build_rollup_id(server: str, equipment_hash: str, bucket: datetime) -> str:
+    return f"{server}:{equipment_hash}:{bucket:%Y%m%d%H}"
+
+
+def get_build_matchup_id(server: str, equipment_hash: str, opponent_hash: str) -> str:
+    return f"{server}:{equipment_hash}:{opponent_hash}"
+
+
 def get_channel_hash(server_id: int,server: str,hg_type: str):
     return hashlib.md5(f"{server_id}_{server}_{hg_type}".encode()).hexdigest()
 
 # --- Main Save Function ---
 
 
-async def save_data_from_battle5v5(battle: Battle, server: str):
+def _build_battle5v5_writes(battle: Battle, server: str, rate: bool = True) -> Dict[str, List]:
     """
-    Parses a Battle object and updates all 7 collections (including item_trends).
+    Builds the writes for one 5v5 battle. Counter updates for teams, players,
+    equipments and relationships go to the write-behind counter buffer; the
+    usage log documents, rating snapshots and the battle replace are returned
+    by collection. The battle is rated with the in-memory ratings, so
+    load_ratings must have loaded its players and teams. With rate=False no
+    rating, rated battle count or rating snapshot is written.
     """
-    logger.debug(f"Saving battle {battle.id} to database")
-    
-    db = client["hellgate_watcher"]
-
     # 1. Determine Winners vs Losers based on victims (Wipe Logic)
     winner_ids = battle.team_a_ids
     winner_hash = get_team_hash(winner_ids)
@@ -207,6 +384,18 @@ async def save_data_from_battle5v5(battle: Battle, server: str):
 
     battle_time = datetime.fromisoformat(battle.start_time.replace("Z", "+00:00"))
 
+    rating_updates = ratings.rate_battle(winner_ids, loser_ids, winner_hash, loser_hash) if rate else {}
+    rated_inc = {"nb_rated_battles": 1} if rate else {}
+
+    def rating_fields(entity: str, id: str) -> Dict:
+        return {"rating": round(rating_updates[(entity, id)][0], 2)} if rate else {}
+
+    writes: Dict[str, List] = {
+        "player_equipment_usage_logs": [],
+        "rating_history": _rating_history_documents(battle.id, battle_time, rating_updates),
+        "battles": [],
+    }
+
     # To track which player used which build for the Battle record
     players_builds_map = {}
 
@@ -215,26 +404,31 @@ async def save_data_from_battle5v5(battle: Battle, server: str):
         (winner_hash, winner_ids, True),
         (loser_hash, loser_ids, False),
     ]:
-        await db.teams.update_one(
-            {"_id": team_hash},
-            {
-                "$setOnInsert": {"player_ids": ids, "server": server},
-                "$inc": {
-                    "nb_battles": 1,
-                    "nb_wins": 1 if won else 0,
-                    "nb_losses": 0 if won else 1,
-                },
-                "$set": {"last_seen": battle_time},
+        counter_buffer.add(
+            "teams",
+            team_hash,
+            inc={
+                "nb_battles": 1,
+                "nb_wins": 1 if won else 0,
+                "nb_losses": 0 if won else 1,
+                **rated_inc,
             },
-            upsert=True,
+            max_fields={"last_seen": battle_time},
+            set_fields=rating_fields("teams", team_hash),
+            set_on_insert={"player_ids": ids, "server": server},
         )
 
     # 3. Update Player, Equipment, Equipment_Uses
-    all_players = [(player_id, True) for player_id in winner_ids] + [
-        (player_id, False) for player_id in loser_ids
+    all_players = [(player_id, True, winner_hash) for player_id in winner_ids] + [
+        (player_id, False, loser_hash) for player_id in loser_ids
     ]
 
-    for player_id, won in all_players:
+    logged_at = datetime.now(tz=timezone.utc)
+    rollup_buckets = [
+        (collection, get_rollup_bucket(battle_time, unit))
+        for collection, unit in BUILD_ROLLUP_UNITS.items()
+    ]
+    for player_id, won, team_hash in all_players:
         player_obj = battle.get_player(player_id)
         if not player_obj:
             raise Exception(f"Player with ID {player_id} not found")
@@ -243,73 +437,95 @@ async def save_data_from_battle5v5(battle: Battle, server: str):
         players_builds_map[player_id] = equipment_hash
 
         # Player Registry
-        await db.players.update_one(
-            {"_id": player_id},
-            {
-                "$set": {"name": player_obj.name, "last_seen": battle_time},
-                "$setOnInsert": {"first_seen": battle_time, "server": server},
-                "$inc": {
-                    "nb_wins": 1 if won else 0,
-                    "nb_losses": 0 if won else 1,
-                    "nb_battles": 1,
-                },
+        player_name_index.add(server, player_obj.name)
+        counter_buffer.add(
+            "players",
+            player_id,
+            inc={
+                "nb_wins": 1 if won else 0,
+                "nb_losses": 0 if won else 1,
+                "nb_battles": 1,
+                **rated_inc,
+            },
+            max_fields={"last_seen": battle_time},
+            set_fields={
+                "name": player_obj.name,
+                "name_lc": player_obj.name.lower(),
+                **rating_fields("players", player_id),
             },
-            upsert=True,
+            set_on_insert={"first_seen": battle_time, "server": server},
         )
 
-        await db.equipments.update_one(
-            {"_id": equipment_hash},
-            {
-                "$inc": {"nb_uses": 1, "nb_wins": 1 if won else 0},
-                "$setOnInsert": {
-                    "main_hand": player_obj.equipment.mainhand.type
-                    if player_obj.equipment.mainhand
-                    else None,
-                    "off_hand": player_obj.equipment.offhand.type
-                    if player_obj.equipment.offhand
-                    else None,
-                    "head": player_obj.equipment.head.type
-                    if player_obj.equipment.head
-                    else None,
-                    "armor": player_obj.equipment.armor.type
-                    if player_obj.equipment.armor
-                    else None,
-                    "shoes": player_obj.equipment.shoes.type
-                    if player_obj.equipment.shoes
-                    else None,
-                    "cape": player_obj.equipment.cape.type
-                    if player_obj.equipment.cape
-                    else None,
-                },
+        equipment = player_obj.equipment
+        counter_buffer.add(
+            "equipments",
+            equipment_hash,
+            inc={"nb_uses": 1, "nb_wins": 1 if won else 0},
+            set_on_insert={
+                "main_hand": equipment.mainhand.type if equipment.mainhand else None,
+                "off_hand": equipment.offhand.type if equipment.offhand else None,
+                "head": equipment.head.type if equipment.head else None,
+                "armor": equipment.armor.type if equipment.armor else None,
+                "shoes": equipment.shoes.type if equipment.shoes else None,
+                "cape": equipment.cape.type if equipment.cape else None,
             },
-            upsert=True,
         )
 
+        # Build meta rollups
+        for collection, bucket in rollup_buckets:
+            counter_buffer.add(
+                collection,
+                get_build_rollup_id(server, equipment_hash, bucket),
+                inc={"nb_uses": 1, "nb_wins": 1 if won else 0},
+                set_on_insert={"server": server, "equipment_hash_id": equipment_hash, "bucket": bucket},
+                add_to_set={"player_ids": [player_id], "team_ids": [team_hash]},
+            )
+
         # Player-Specific Equipment Usage
-        log = {
-            "timestamp": datetime.now(tz=timezone.utc),
-            "metadata": {
-                "player_id": player_id,
-                "equipment_hash_id": equipment_hash,
-                "won": won,
-            },
-        }
-        await db.player_equipment_usage_logs.insert_one(log)
+        writes["player_equipment_usage_logs"].append(
+            {
+                "timestamp": logged_at,
+                "metadata": {
+                    "player_id": player_id,
+                    "equipment_hash_id": equipment_hash,
+                    "won": won,
+                },
+            }
+        )
 
     # 4. Update Player Relationships (The Social Graph)
     for team_ids, won in [(winner_ids, True), (loser_ids, False)]:
         for p1, p2 in combinations(sorted(team_ids), 2):
             rel_hash = f"{p1}_{p2}"
-            await db.player_relationships.update_one(
-                {"_id": rel_hash},
-                {
-                    "$set": {"players": [p1, p2], "last_seen": battle_time},
-                    "$inc": {"nb_shared_battles": 1, "shared_wins": 1 if won else 0},
-                },
-                upsert=True,
+            counter_buffer.add(
+                "player_relationships",
+                rel_hash,
+                inc={"nb_shared_battles": 1, "shared_wins": 1 if won else 0},
+                max_fields={"last_seen": battle_time},
+                set_on_insert={"players": [p1, p2]},
             )
 
-    # 5. Save the Battle Instance with build mapping
+    # 5. Build Matchups, once per pair of distinct builds that faced each other
+    winner_builds = {players_builds_map[player_id] for player_id in winner_ids}
+    loser_builds = {players_builds_map[player_id] for player_id in loser_ids}
+    for winner_build in winner_builds:
+        for loser_build in loser_builds:
+            for build, opponent, won in [
+                (winner_build, loser_build, True),
+                (loser_build, winner_build, False),
+            ]:
+                counter_buffer.add(
+                    "build_matchups",
+                    get_build_matchup_id(server, build, opponent),
+                    inc={"nb_encounters": 1, "nb_wins": 1 if won else 0},
+                    set_on_insert={
+                        "server": server,
+                        "equipment_hash_id": build,
+                        "opponent_hash_id": opponent,
+                    },
+                )
+
+    # 6. Save the Battle Instance with build mapping
     final_battle = DBBattle5v5(
         _id=battle.id,
         winning_team_id=winner_hash,
@@ -321,10 +537,54 @@ async def save_data_from_battle5v5(battle: Battle, server: str):
         timestamp=battle_time,
         server=server,
     )
-    await db.battles.replace_one(
-        {"_id": final_battle.id}, final_battle.model_dump(by_alias=True), upsert=True
+    writes["battles"].append(
+        ReplaceOne(
+            {"_id": final_battle.id}, final_battle.model_dump(by_alias=True), upsert=True
+        )
     )
 
+    return writes
+
+
+async def save_data_from_battle5v5(battle: Battle, server: str):
+    """
+    Parses a Battle object and updates all 7 collections (including item_trends).
+    """
+    await save_data_from_battles5v5([(battle, server)])
+
+
+async def save_data_from_battles5v5(battles: List[Tuple[Battle, str]], rate: bool = True):
+    """
+    Saves several (battle, server) pairs in one flush: the battles in one
+    bulk_write, the usage logs and the rating history in one insert_many
+    each, sent concurrently. Battles are rated in the order given, unless
+    rate is False: the backfill saves older battles, out of order, next to
+    the bot's own ratings, so it leaves rating to replay_ratings.
+    Counters are buffered and written by the counter buffer's own flushes.
+    """
+    if not battles:
+        return
+
+    logger.debug(f"Saving battles {[battle.id for battle, _ in battles]} to database")
+
+    if rate:
+        await load_ratings(battles)
+    writes: Dict[str, List] = {}
+    for battle, server in battles:
+        for collection_name, operations in _build_battle5v5_writes(battle, server, rate=rate).items():
+            writes.setdefault(collection_name, []).extend(operations)
+
+    inserts = [
+        db.battles.bulk_write(writes["battles"]),
+        db.player_equipment_usage_logs.insert_many(writes["player_equipment_usage_logs"]),
+    ]
+    if writes["rating_history"]:
+        inserts.append(db.rating_history.insert_many(writes["rating_history"]))
+    await asyncio.gather(*inserts)
+
+    for battle, _ in battles:
+        invalidate_player_stats(battle.team_a_ids + battle.team_b_ids)
+
 
 async def clear_database():
     
@@ -338,65 +598,226 @@ async def clear_database():
 
 
 
+# --- Indexes ---
+
+
+# Every index the queries in this module rely on, by collection: (keys, create_index options).
+# setup_database creates them and drops any other index; src/index_audit.py checks them.
+INDEX_MANIFEST: Dict[str, List[Tuple[List[Tuple[str, int]], Dict]]] = {
+    "processed_battle_ids": [
+        ([("created_at", 1)], {"expireAfterSeconds": 24 * 60 * 60}),
+        ([("battle_id", 1)], {"unique": True}),
+    ],
+    "battles": [
+        ([("all_player_ids", 1), ("timestamp", -1)], {}),
+        ([("server", 1), ("timestamp", -1)], {}),
+        ([("timestamp", 1)], {}),
+    ],
+    "players": [
+        ([("server", 1), ("name_lc", 1)], {}),
+        ([("server", 1), ("nb_battles", -1)], {}),
+        ([("server", 1), ("nb_wins", -1)], {}),
+        ([("server", 1), ("rating", -1)], {}),
+    ],
+    "teams": [
+        ([("player_ids", 1), ("nb_wins", -1)], {}),
+        ([("server", 1), ("nb_battles", -1)], {}),
+        ([("server", 1), ("nb_wins", -1)], {}),
+        ([("server", 1), ("rating", -1)], {}),
+    ],
+    "player_relationships": [
+        ([("players", 1), ("nb_shared_battles", -1)], {}),
+    ],
+    # Time-series collections get a metaField + timeField index on creation (MongoDB 6.3+)
+    "player_equipment_usage_logs": [
+        ([("metadata", 1), ("timestamp", 1)], {}),
+        ([("metadata.equipment_hash_id", 1), ("timestamp", -1)], {}),
+        ([("metadata.player_id", 1), ("timestamp", -1)], {}),
+    ],
+    "rating_history": [
+        ([("metadata", 1), ("timestamp", 1)], {}),
+        ([("metadata.entity", 1), ("metadata.id", 1), ("timestamp", -1)], {}),
+    ],
+    "channels": [
+        ([("server", 1), ("hg_type", 1)], {}),
+    ],
+    "build_rollups_hourly": [
+        ([("server", 1), ("bucket", 1)], {}),
+        ([("bucket", 1)], {"expireAfterSeconds": BUILD_ROLLUP_HOURLY_RETENTION_DAYS * 24 * 60 * 60}),
+    ],
+    "build_rollups_daily": [
+        ([("server", 1), ("bucket", 1)], {}),
+    ],
+    "build_matchups": [
+        ([("server", 1), ("equipment_hash_id", 1), ("nb_encounters", -1)], {}),
+    ],
+}
+
+
+def get_index_name(keys: List[Tuple[str, int]]) -> str:
+    """Default MongoDB name of an index, e.g. server_1_nb_battles_-1"""
+    return "_".join(f"{field}_{direction}" for field, direction in keys)
+
+
+async def apply_index_manifest(database=None):
+    """Creates the indexes of INDEX_MANIFEST and drops the ones that are not in it."""
+    database = database if database is not None else db
+    for collection_name, indexes in INDEX_MANIFEST.items():
+        collection = database[collection_name]
+        expected_names = {get_index_name(keys) for keys, _ in indexes}
+
+        for index_name in await collection.index_information():
+            if index_name != "_id_" and index_name not in expected_names:
+                logger.info(f"Dropping index {collection_name}.{index_name}, not in the index manifest")
+                await collection.drop_index(index_name)
+
+        for keys, options in indexes:
+            await collection.create_index(keys, name=get_index_name(keys), **options)
+
+
+async def _create_time_series_collection(database, collection_name: str):
+    await database.create_collection(
+        collection_name,
+        timeseries={
+            "timeField": "timestamp",
+            "metaField": "metadata",
+            "granularity": "minutes",
+        },
+    )
+    logger.info(f"Created Time-Series collection: {collection_name}")
+
+
 async def setup_database():
-    """Initializes collections and indexes."""
-    
+    """
+    Initializes collections and indexes and migrates the players saved before
+    name_lc existed. Idempotent: the bot runs it on every startup.
+    """
+    global players_name_lc_migrated
     db = client["hellgate_watcher"]
     existing_collections = await db.list_collection_names()
 
-    if "player_equipment_usage_logs" not in existing_collections:
-        await db.create_collection(
-            "player_equipment_usage_logs",
-            timeseries={
-                "timeField": "timestamp",
-                "metaField": "metadata",
-                "granularity": "minutes",
-            },
-        )
-        logger.info("Created Time-Series collection: player_equipment_usage_logs")
+    for collection_name in ["player_equipment_usage_logs", "rating_history"]:
+        if collection_name not in existing_collections:
+            await _create_time_series_collection(db, collection_name)
 
-    processed_batches = db["processed_battle_ids"]
-    await processed_batches.create_index("created_at", expireAfterSeconds=24*60*60)
-    await processed_batches.create_index("battle_id", unique=True)
-    
+    # Players saved before name_lc existed
+    result = await db.players.update_many(
+        {"name_lc": {"$exists": False}}, [{"$set": {"name_lc": {"$toLower": "$name"}}}]
+    )
+    if result.modified_count:
+        logger.info(f"Added name_lc to {result.modified_count} players")
+    players_name_lc_migrated = True
 
     logger.info("Applying indexes")
-    await db.battles.create_index([("all_player_ids", 1), ("datetime", -1)])
-    await db.battles.create_index([("server", 1)])
-    await db.players.create_index([("nb_battles", -1)])
-    await db.players.create_index([("name", 1)])
-    await db.players.create_index([("server", 1)])
-    await db.teams.create_index([("player_ids", 1), ("wins", -1)])
-    await db.player_relationships.create_index([("players", 1), ("nb_shared_battles", -1)])
-    await db.player_equipment_usage_logs.create_index(
-        [("metadata.equipment_hash_id", 1), ("timestamp", -1)]
-    )
-    await db.player_equipment_usage_logs.create_index(
-        [("metadata.player_id", 1), ("timestamp", -1)]
-    )
+    await apply_index_manifest(db)
+
     logger.info("Database setup complete")
 
 
-async def is_battle_new(battle_id: str) -> bool:
+async def get_missing_derived_collections() -> List[str]:
+    """
+    The leaderboard, build rollup and build matchup collections that do not exist.
+    Checked before counter_buffer.start(), whose journal replay can create them.
+    """
+    existing_collections = set(await db.list_collection_names())
+    return [
+        collection
+        for collection in ["leaderboards", *BUILD_ROLLUP_UNITS, "build_matchups"]
+        if collection not in existing_collections
+    ]
+
+
+async def rebuild_derived_collections(missing_collections: List[str]) -> None:
+    """
+    Rebuilds the missing derived collections from the saved battles, players and
+    teams. Runs after counter_buffer.start() has flushed the journal and before
+    new battles are saved, so every saved battle is counted exactly once.
+    """
+    if "leaderboards" in missing_collections:
+        await rebuild_leaderboards()
+    if set(BUILD_ROLLUP_UNITS) & set(missing_collections):
+        await rebuild_build_rollups()
+    if "build_matchups" in missing_collections:
+        await rebuild_build_matchups()
+
+
+async def is_battle_new(battle_id: int) -> bool:
     """Checks if battle exists; if not, logs it and returns True."""
+    return battle_id in await filter_new_battle_ids([battle_id])
+
+
+def _processed_battle_ids_filter(battle_ids: List[int]) -> Dict:
+    return {"battle_id": {"$in": battle_ids}}
+
+
+async def filter_new_battle_ids(battle_ids: List[int]) -> List[int]:
+    """
+    Returns the ids that have not been processed yet and logs them as processed.
+    Uses one $in query and one unordered insert_many for the ids that are not
+    already in the recent id cache.
+    """
+    candidate_ids = [
+        battle_id
+        for battle_id in dict.fromkeys(battle_ids)
+        if battle_id not in recent_battle_ids
+    ]
+    if not candidate_ids:
+        return []
+
     try:
-        await processed_batches.insert_one(
-            {"battle_id": battle_id, "created_at": datetime.now(tz=timezone.utc)}
-        )
-        return True
-    except DuplicateKeyError:
-        return False
+        existing_ids = {
+            doc["battle_id"]
+            for doc in await processed_batches.find(
+                _processed_battle_ids_filter(candidate_ids), {"battle_id": 1}
+            ).to_list()
+        }
+        new_ids = [battle_id for battle_id in candidate_ids if battle_id not in existing_ids]
+
+        if new_ids:
+            created_at = datetime.now(tz=timezone.utc)
+            try:
+                await processed_batches.insert_many(
+                    [{"battle_id": battle_id, "created_at": created_at} for battle_id in new_ids],
+                    ordered=False,
+                )
+            except BulkWriteError as e:
+                # Ids inserted by someone else between the find and the insert are not new
+                failed_ids = {new_ids[error["index"]] for error in e.details["writeErrors"]}
+                new_ids = [battle_id for battle_id in new_ids if battle_id not in failed_ids]
     except Exception as e:
         logger.error(f"Database error: {e}")
-        return False
+        return []
+
+    for battle_id in candidate_ids:
+        recent_battle_ids.set(battle_id)
+    return new_ids
+
+
+async def get_crawl_cursor(server: str) -> DBCrawlCursor | None:
+    cursor = await db.crawl_cursors.find_one({"_id": server})
+    if not cursor:
+        return None
+    return DBCrawlCursor(**cursor)
+
+
+async def save_crawl_cursor(cursor: DBCrawlCursor):
+    await db.crawl_cursors.replace_one(
+        {"_id": cursor.id}, cursor.model_dump(by_alias=True), upsert=True
+    )
+
+
+def _player_name_filter(server: str, player_name: str) -> Dict:
+    return {"server": server, "name_lc": player_name.lower()}
 
 
 async def get_player_by_name_and_server(player_name: str, server: str) -> DBPlayer | None:
     
-    player = await db.players.find_one(
-        {"name": player_name, "server": server},
-        collation=collation.Collation(locale="en", strength=2),
-    )
+    player = await db.players.find_one(_player_name_filter(server, player_name))
+    if not player and not players_name_lc_migrated:
+        player = await db.players.find_one(
+            {"server": server, "name": player_name},
+            collation=collation.Collation(locale="en", strength=2),
+        )
     if not player:
         return None
     return DBPlayer(**player)
@@ -410,10 +831,8 @@ async def get_player_by_id(player_id: str) -> DBPlayer | None:
     return DBPlayer(**player)
 
 
-async def get_most_played_builds(player_id: str, limit_number: int = 5) -> List[dict]:
-    
-
-    pipeline = [
+def _most_played_builds_pipeline(player_id: str, limit_number: int) -> List[dict]:
+    return [
         # 1. Match only logs for this player
         {"$match": {"metadata.player_id": player_id}},
         # 2. Group by the equipment hash and calculate stats
@@ -433,6 +852,12 @@ async def get_most_played_builds(player_id: str, limit_number: int = 5) -> List[
         {"$limit": limit_number},
     ]
 
+
+async def get_most_played_builds(player_id: str, limit_number: int = 5) -> List[dict]:
+    
+
+    pipeline = _most_played_builds_pipeline(player_id, limit_number)
+
     logs = await db.player_equipment_usage_logs.aggregate(pipeline)
 
     aggregated_results = await logs.to_list()
@@ -447,6 +872,7 @@ async def get_most_played_builds(player_id: str, limit_number: int = 5) -> List[
 
         results.append(
             {
+                "equipment_hash_id": equipment_hash,
                 "equipment": equipment_obj,
                 "stats":{
                     "nb_uses": item["nb_uses"],
@@ -457,13 +883,17 @@ async def get_most_played_builds(player_id: str, limit_number: int = 5) -> List[
     return results
 
 
+def _relationships_of_player_filter(player_id: str) -> Dict:
+    return {"players": player_id}
+
+
 async def get_most_common_relationships(
     player_id: str, limit_number=4
 ) -> List[DBPlayer_Relationship] | None:
     
     relationships: List[DBPlayer_Relationship] = []
     for doc in (
-        await db.player_relationships.find({"players": player_id})
+        await db.player_relationships.find(_relationships_of_player_filter(player_id))
         .sort("nb_shared_battles", -1)
         .limit(limit_number)
         .to_list()
@@ -495,7 +925,93 @@ async def get_team_by_hash(team_hash: str) -> DBTeam | None:
     return DBTeam(**team)
 
 
+def _player_statistics_pipeline(
+    player_id: str, nb_builds: int = 5, nb_relationships: int = 4
+) -> List[dict]:
+    """
+    Aggregation on players that returns the player's document with its most
+    played builds (joined with their equipments) and its most common teammates
+    (joined with their names) in one round trip.
+    """
+    return [
+        {"$match": {"_id": player_id}},
+        {
+            "$lookup": {
+                "from": "player_equipment_usage_logs",
+                "pipeline": [
+                    {"$match": {"metadata.player_id": player_id}},
+                    {
+                        "$group": {
+                            "_id": "$metadata.equipment_hash_id",
+                            "nb_uses": {"$sum": 1},
+                            "nb_wins": {
+                                "$sum": {"$cond": [{"$eq": ["$metadata.won", True]}, 1, 0]}
+                            },
+                        }
+                    },
+                    {"$sort": {"nb_uses": -1}},
+                    {"$limit": nb_builds},
+                    {
+                        "$lookup": {
+                            "from": "equipments",
+                            "localField": "_id",
+                            "foreignField": "_id",
+                            "as": "equipment",
+                        }
+                    },
+                    {"$set": {"equipment": {"$first": "$equipment"}}},
+                ],
+                "as": "most_played_builds",
+            }
+        },
+        {
+            "$lookup": {
+                "from": "player_relationships",
+                "pipeline": [
+                    {"$match": {"players": player_id}},
+                    {"$sort": {"nb_shared_battles": -1}},
+                    {"$limit": nb_relationships},
+                    {
+                        "$set": {
+                            "other_player_id": {
+                                "$first": {
+                                    "$filter": {
+                                        "input": "$players",
+                                        "cond": {"$ne": ["$$this", player_id]},
+                                    }
+                                }
+                            }
+                        }
+                    },
+                    {
+                        "$lookup": {
+                            "from": "players",
+                            "localField": "other_player_id",
+                            "foreignField": "_id",
+                            "pipeline": [{"$project": {"name": 1}}],
+                            "as": "other_player",
+                        }
+                    },
+                    {"$set": {"other_player_name": {"$first": "$other_player.name"}}},
+                    {"$project": {"other_player": 0}},
+                ],
+                "as": "most_common_relationships",
+            }
+        },
+    ]
+
+
 async def get_player_statistics(player: DBPlayer) -> Dict | None:
+    started_at = time.monotonic()
+    docs = await (await db.players.aggregate(_player_statistics_pipeline(player.id))).to_list()
+    logger.debug(
+        f"Player statistics for {player.name} aggregated in {(time.monotonic() - started_at) * 1000:.1f}ms"
+    )
+    if not docs:
+        return None
+
+    doc = docs[0]
+    player = DBPlayer(**doc)
     player_stats = {
         "name": player.name,
         "nb_wins": player.nb_wins,
@@ -506,20 +1022,28 @@ async def get_player_statistics(player: DBPlayer) -> Dict | None:
         "winrate": f"{round(player.nb_wins/player.nb_battles*100,2)}%"
     }
 
-    most_played_builds_list = []
-    most_common_relationships_list = []
+    most_played_builds_list = [
+        {
+            "equipment": DBEquipment(**build["equipment"]).to_equipment()
+            if build.get("equipment")
+            else None,
+            "stats": {
+                "nb_uses": build["nb_uses"],
+                "winrate": str(round(build["nb_wins"]/build["nb_uses"]*100,2))+'%',
+            },
+        }
+        for build in doc["most_played_builds"]
+    ]
 
-    most_played_builds_list = await get_most_played_builds(player.id)
-    most_common_relationships = await get_most_common_relationships(player.id)
-    if most_common_relationships:
-        most_common_relationships_list = [
-            {
-                "player_name": (await rel.get_other_player(player.name)).name,
-                "nb_battles": rel.nb_shared_battles,
-                "winrate": f"{round(rel.shared_wins/rel.nb_shared_battles*100,2)}%"
-            }
-            for rel in most_common_relationships
-        ]
+    most_common_relationships_list = [
+        {
+            "player_name": rel["other_player_name"],
+            "nb_battles": rel["nb_shared_battles"],
+            "winrate": f"{round(rel['shared_wins']/rel['nb_shared_battles']*100,2)}%"
+        }
+        for rel in doc["most_common_relationships"]
+        if rel.get("other_player_name") is not None
+    ]
 
     result = {
         "player_stats": player_stats,
@@ -548,6 +1072,755 @@ async def get_most_active_teams(server: str, limit_number: int=10) -> List[DBTea
         teams.append(DBTeam(**doc))
     return teams
 
+def _teams_of_player_filter(player_id: str) -> Dict:
+    return {"player_ids": player_id}
+
+
+async def get_most_active_team_of_player(player_id: str) -> DBTeam | None:
+    teams = await db.teams.find(_teams_of_player_filter(player_id)).sort("nb_battles", -1).limit(1).to_list()
+    if not teams:
+        return None
+    return DBTeam(**teams[0])
+
+
+def _similar_rosters_stages(
+    server: str, player_ids: List[str], min_shared_players: int, limit_number: int
+) -> List[dict]:
+    return [
+        # The multikey index on player_ids is the inverted index from a player to their teams
+        {"$match": {"player_ids": {"$in": player_ids}, "server": server}},
+        {"$set": {"nb_shared_players": {"$size": {"$setIntersection": ["$player_ids", player_ids]}}}},
+        {"$match": {"nb_shared_players": {"$gte": min_shared_players}}},
+        {"$sort": {"nb_shared_players": -1, "nb_battles": -1, "last_seen": -1, "_id": 1}},
+        {"$limit": limit_number},
+    ]
+
+
+async def get_similar_rosters(
+    server: str,
+    player_ids: List[str],
+    min_shared_players: int = SIMILAR_ROSTERS_MIN_SHARED_PLAYERS,
+    limit_number: int = SIMILAR_ROSTERS_SIZE,
+) -> List[Tuple[DBTeam, int]]:
+    """
+    Teams of a server sharing at least min_shared_players players with the
+    roster, as (team, number of shared players), most shared first and then
+    most active. The roster itself comes first if it has played. Only the teams
+    of the roster's players are read, through the player_ids index.
+    """
+    started_at = time.monotonic()
+    cursor = await db.teams.aggregate(
+        _similar_rosters_stages(server, player_ids, min_shared_players, limit_number)
+    )
+    rosters = [(DBTeam(**doc), doc["nb_shared_players"]) for doc in await cursor.to_list()]
+    logger.debug(
+        f"Found {len(rosters)} rosters similar to {player_ids} in {(time.monotonic() - started_at) * 1000:.1f}ms"
+    )
+    return rosters
+
+
+async def get_player_names(player_ids: List[str]) -> Dict[str, str]:
+    return {
+        player["_id"]: player["name"]
+        for player in await db.players.find({"_id": {"$in": player_ids}}, {"name": 1}).to_list()
+    }
+
+
+# --- Leaderboards ---
+
+
+LEADERBOARD_ENTITIES = ["players", "teams"]
+LEADERBOARD_METRICS = ["battles", "wins", "winrate", "rating"]
+
+
+def _leaderboard_value(doc: dict, metric: str) -> float | None:
+    """A document's score for a metric, or None if it does not qualify."""
+    if metric == "battles":
+        return doc.get("nb_battles", 0)
+    if metric == "wins":
+        return doc.get("nb_wins", 0)
+    if metric == "rating":
+        # Provisional ratings still move too fast to rank
+        if doc.get("rating") is None or doc.get("nb_rated_battles", 0) < RATING_PROVISIONAL_BATTLES:
+            return None
+        return round(doc["rating"], 1)
+    if doc.get("nb_battles", 0) < LEADERBOARD_MIN_BATTLES_FOR_WINRATE:
+        return None
+    return round(doc["nb_wins"] / doc["nb_battles"] * 100, 2)
+
+
+async def _leaderboard_entries(entity: str, docs: List[dict]) -> List[dict]:
+    """Turns player or team documents into leaderboard entries, with display names."""
+    if entity == "players":
+        names = {doc["_id"]: doc["name"] for doc in docs}
+    else:
+        member_ids = list({player_id for doc in docs for player_id in doc["player_ids"]})
+        player_names = await get_player_names(member_ids)
+        names = {
+            doc["_id"]: ", ".join(
+                sorted(player_names.get(player_id, "?") for player_id in doc["player_ids"])
+            )
+            for doc in docs
+        }
+
+    return [
+        {
+            "_id": doc["_id"],
+            "name": names[doc["_id"]],
+            "nb_battles": doc.get("nb_battles", 0),
+            "nb_wins": doc.get("nb_wins", 0),
+            "nb_losses": doc.get("nb_losses", 0),
+            "rating": doc.get("rating"),
+            "nb_rated_battles": doc.get("nb_rated_battles", 0),
+        }
+        for doc in docs
+    ]
+
+
+def _rank_leaderboard_entries(entries: List[dict], metric: str) -> List[dict]:
+    ranked = []
+    for entry in entries:
+        value = _leaderboard_value(entry, metric)
+        if value is not None:
+            ranked.append({**entry, "value": value})
+    ranked.sort(key=lambda entry: (-entry["value"], -entry["nb_battles"], entry["_id"]))
+    return ranked[:LEADERBOARD_CANDIDATES]
+
+
+async def update_leaderboards(entity: str, ids: List[str]) -> None:
+    """
+    Merges the current counters of the given players or teams into their
+    servers' leaderboards. Leaderboards keep LEADERBOARD_CANDIDATES entries so
+    that an entry whose winrate drops can be replaced from below.
+    """
+    docs = await db[entity].find({"_id": {"$in": ids}}).to_list()
+    if not docs:
+        return
+
+    updated_entries: Dict[str, List[dict]] = {}
+    for entry, doc in zip(await _leaderboard_entries(entity, docs), docs):
+        updated_entries.setdefault(doc["server"], []).append(entry)
+
+    leaderboard_ids = [
+        get_leaderboard_id(server, entity, metric)
+        for server in updated_entries
+        for metric in LEADERBOARD_METRICS
+    ]
+    current = {
+        doc["_id"]: doc
+        for doc in await db.leaderboards.find({"_id": {"$in": leaderboard_ids}}).to_list()
+    }
+
+    updated_at = datetime.now(tz=timezone.utc)
+    operations = []
+    for server, entries in updated_entries.items():
+        for metric in LEADERBOARD_METRICS:
+            leaderboard_id = get_leaderboard_id(server, entity, metric)
+            merged = {
+                entry["_id"]: entry
+                for entry in current.get(leaderboard_id, {}).get("entries", [])
+            }
+            merged.update({entry["_id"]: entry for entry in entries})
+
+            leaderboard = DBLeaderboard(
+                _id=leaderboard_id,
+                server=server,
+                entity=entity,
+                metric=metric,
+                entries=_rank_leaderboard_entries(list(merged.values()), metric),
+                updated_at=updated_at,
+            )
+            operations.append(
+                ReplaceOne(
+                    {"_id": leaderboard_id}, leaderboard.model_dump(by_alias=True), upsert=True
+                )
+            )
+
+    await db.leaderboards.bulk_write(operations)
+
+
+def _leaderboard_winrate_pipeline(server: str) -> List[dict]:
+    return [
+        {
+            "$match": {
+                "server": server,
+                "nb_battles": {"$gte": LEADERBOARD_MIN_BATTLES_FOR_WINRATE},
+            }
+        },
+        {"$set": {"winrate": {"$divide": ["$nb_wins", "$nb_battles"]}}},
+        {"$sort": {"winrate": -1, "nb_battles": -1}},
+        {"$limit": LEADERBOARD_CANDIDATES},
+    ]
+
+
+def _leaderboard_rating_filter(server: str) -> Dict:
+    return {"server": server, "nb_rated_battles": {"$gte": RATING_PROVISIONAL_BATTLES}}
+
+
+async def rebuild_leaderboards() -> None:
+    """Recomputes every leaderboard from the players and teams collections."""
+    started_at = time.monotonic()
+    for entity in LEADERBOARD_ENTITIES:
+        for server in SERVER_URLS:
+            for metric in LEADERBOARD_METRICS:
+                if metric == "winrate":
+                    cursor = await db[entity].aggregate(_leaderboard_winrate_pipeline(server))
+                    docs = await cursor.to_list()
+                elif metric == "rating":
+                    docs = await (
+                        db[entity].find(_leaderboard_rating_filter(server))
+                        .sort("rating", -1)
+                        .limit(LEADERBOARD_CANDIDATES)
+                        .to_list()
+                    )
+                else:
+                    sort_field = "nb_wins" if metric == "wins" else "nb_battles"
+                    docs = await (
+                        db[entity].find({"server": server})
+                        .sort(sort_field, -1)
+                        .limit(LEADERBOARD_CANDIDATES)
+                        .to_list()
+                    )
+
+                leaderboard_id = get_leaderboard_id(server, entity, metric)
+                leaderboard = DBLeaderboard(
+                    _id=leaderboard_id,
+                    server=server,
+                    entity=entity,
+                    metric=metric,
+                    entries=_rank_leaderboard_entries(await _leaderboard_entries(entity, docs), metric),
+                    updated_at=datetime.now(tz=timezone.utc),
+                )
+                await db.leaderboards.replace_one(
+                    {"_id": leaderboard_id}, leaderboard.model_dump(by_alias=True), upsert=True
+                )
+    logger.info(f"Rebuilt leaderboards in {time.monotonic() - started_at:.2f}s")
+
+
+async def get_leaderboard(
+    server: str, entity: str, metric: str, limit_number: int = LEADERBOARD_SIZE
+) -> DBLeaderboard | None:
+    leaderboard = await db.leaderboards.find_one({"_id": get_leaderboard_id(server, entity, metric)})
+    if not leaderboard:
+        return None
+    leaderboard = DBLeaderboard(**leaderboard)
+    leaderboard.entries = leaderboard.entries[:limit_number]
+    return leaderboard
+
+
+# --- Build Meta ---
+
+
+# Rollup collection -> bucket size
+BUILD_ROLLUP_UNITS = {"build_rollups_hourly": "hour", "build_rollups_daily": "day"}
+BUILD_META_METRICS = ["uses", "winrate"]
+
+
+def get_rollup_bucket(timestamp: datetime, unit: str) -> datetime:
+    """Start of the hour or day the timestamp falls in."""
+    if unit == "day":
+        return timestamp.replace(hour=0, minute=0, second=0, microsecond=0)
+    return timestamp.replace(minute=0, second=0, microsecond=0)
+
+
+def _ceil_rollup_bucket(timestamp: datetime, unit: str) -> datetime:
+    bucket = get_rollup_bucket(timestamp, unit)
+    if bucket == timestamp:
+        return bucket
+    return bucket + (timedelta(days=1) if unit == "day" else timedelta(hours=1))
+
+
+def _build_rollup_ranges(
+    start: datetime, end: datetime, now: datetime
+) -> Dict[str, List[Tuple[datetime, datetime]]]:
+    """
+    Splits [start, end), widened to whole hours, into the whole days read from
+    the daily rollups and the hours around them read from the hourly rollups.
+    Hours older than the hourly retention are widened to whole days.
+    """
+    start = get_rollup_bucket(start, "hour")
+    end = _ceil_rollup_bucket(end, "hour")
+    hourly_cutoff = now - timedelta(days=BUILD_ROLLUP_HOURLY_RETENTION_DAYS - 1)
+    if start < hourly_cutoff:
+        start = get_rollup_bucket(start, "day")
+    if end < hourly_cutoff:
+        end = _ceil_rollup_bucket(end, "day")
+
+    first_day = _ceil_rollup_bucket(start, "day")
+    last_day = get_rollup_bucket(end, "day")
+    if first_day >= last_day:
+        return {"build_rollups_hourly": [(start, end)], "build_rollups_daily": []}
+    return {
+        "build_rollups_hourly": [
+            (range_start, range_end)
+            for range_start, range_end in [(start, first_day), (last_day, end)]
+            if range_start < range_end
+        ],
+        "build_rollups_daily": [(first_day, last_day)],
+    }
+
+
+def _build_rollup_pipeline(
+    server: str, ranges: Dict[str, List[Tuple[datetime, datetime]]], stages: List[dict]
+) -> Tuple[str, List[dict]]:
+    """
+    (collection, pipeline) reading the rollups of every range, the first
+    collection's with $match and the other one's with $unionWith, then the stages.
+    """
+    matches = [
+        (
+            collection,
+            {
+                "$match": {
+                    "server": server,
+                    "$or": [
+                        {"bucket": {"$gte": range_start, "$lt": range_end}}
+                        for range_start, range_end in collection_ranges
+                    ],
+                }
+            },
+        )
+        for collection, collection_ranges in ranges.items()
+        if collection_ranges
+    ]
+    (collection, first_match), other_matches = matches[0], matches[1:]
+    pipeline = [first_match]
+    for other_collection, match in other_matches:
+        pipeline.append({"$unionWith": {"coll": other_collection, "pipeline": [match]}})
+    return collection, pipeline + stages
+
+
+def _top_builds_stages(metric: str, limit_number: int) -> List[dict]:
+    stages: List[dict] = [
+        {
+            "$group": {
+                "_id": "$equipment_hash_id",
+                "nb_uses": {"$sum": "$nb_uses"},
+                "nb_wins": {"$sum": "$nb_wins"},
+            }
+        },
+    ]
+    if metric == "winrate":
+        stages += [
+            {"$match": {"nb_uses": {"$gte": BUILD_META_MIN_USES_FOR_WINRATE}}},
+            {"$set": {"winrate": {"$divide": ["$nb_wins", "$nb_uses"]}}},
+            {"$sort": {"winrate": -1, "nb_uses": -1, "_id": 1}},
+        ]
+    else:
+        stages.append({"$sort": {"nb_uses": -1, "nb_wins": -1, "_id": 1}})
+    stages.append({"$limit": limit_number})
+    return stages
+
+
+def _distinct_counts_stages(equipment_hashes: List[str]) -> List[dict]:
+    def union_size(field: str) -> dict:
+        return {
+            "$size": {
+                "$reduce": {
+                    "input": f"${field}",
+                    "initialValue": [],
+                    "in": {"$setUnion": ["$$value", "$$this"]},
+                }
+            }
+        }
+
+    return [
+        {"$match": {"equipment_hash_id": {"$in": equipment_hashes}}},
+        {
+            "$group": {
+                "_id": "$equipment_hash_id",
+                "player_ids": {"$push": "$player_ids"},
+                "team_ids": {"$push": "$team_ids"},
+            }
+        },
+        {
+            "$project": {
+                "nb_players": union_size("player_ids"),
+                "nb_teams": union_size("team_ids"),
+            }
+        },
+    ]
+
+
+async def get_top_builds(
+    server: str,
+    start: datetime,
+    end: datetime,
+    metric: str = "uses",
+    limit_number: int = BUILD_META_SIZE,
+) -> List[dict]:
+    """
+    Most used or best winrate builds of a server between start and end, merged
+    from the hourly and daily rollups instead of scanning the usage logs. The
+    winrate ranking only counts builds with BUILD_META_MIN_USES_FOR_WINRATE uses.
+    """
+    started_at = time.monotonic()
+    ranges = _build_rollup_ranges(start, end, now=datetime.now(tz=timezone.utc))
+
+    collection, pipeline = _build_rollup_pipeline(server, ranges, _top_builds_stages(metric, limit_number))
+    top_builds = await (await db[collection].aggregate(pipeline)).to_list()
+    if not top_builds:
+        return []
+
+    equipment_hashes = [build["_id"] for build in top_builds]
+    collection, pipeline = _build_rollup_pipeline(server, ranges, _distinct_counts_stages(equipment_hashes))
+    distinct_counts = {
+        doc["_id"]: doc for doc in await (await db[collection].aggregate(pipeline)).to_list()
+    }
+    equipments = {
+        doc["_id"]: DBEquipment(**doc).to_equipment()
+        for doc in await db.equipments.find({"_id": {"$in": equipment_hashes}}).to_list()
+    }
+
+    results = []
+    for build in top_builds:
+        counts = distinct_counts.get(build["_id"], {})
+        results.append(
+            {
+                "equipment_hash_id": build["_id"],
+                "equipment": equipments.get(build["_id"]),
+                "stats": {
+                    "nb_uses": build["nb_uses"],
+                    "nb_wins": build["nb_wins"],
+                    "winrate": str(round(build["nb_wins"] / build["nb_uses"] * 100, 2)) + '%',
+                    "nb_players": counts.get("nb_players", 0),
+                    "nb_teams": counts.get("nb_teams", 0),
+                },
+            }
+        )
+    logger.debug(
+        f"Top builds of {server} by {metric} from {start} to {end} in {(time.monotonic() - started_at) * 1000:.0f}ms"
+    )
+    return results
+
+
+def _build_rollups_from_battles_pipeline(unit: str, since: datetime | None) -> List[dict]:
+    """Rebuilds the rollups of one bucket size from the battles collection."""
+    pipeline: List[dict] = []
+    if since is not None:
+        pipeline.append({"$match": {"timestamp": {"$gte": since}}})
+    pipeline += [
+        {
+            "$project": {
+                "server": 1,
+                "timestamp": 1,
+                "winner_ids": 1,
+                "winning_team_id": 1,
+                "losing_team_id": 1,
+                "builds": {"$objectToArray": "$players_builds"},
+            }
+        },
+        {"$unwind": "$builds"},
+        {"$set": {"won": {"$in": ["$builds.k", "$winner_ids"]}}},
+        {
+            "$group": {
+                "_id": {
+                    "server": "$server",
+                    "equipment_hash_id": "$builds.v",
+                    "bucket": {"$dateTrunc": {"date": "$timestamp", "unit": unit}},
+                },
+                "nb_uses": {"$sum": 1},
+                "nb_wins": {"$sum": {"$cond": ["$won", 1, 0]}},
+                "player_ids": {"$addToSet": "$builds.k"},
+                "team_ids": {
+                    "$addToSet": {"$cond": ["$won", "$winning_team_id", "$losing_team_id"]}
+                },
+            }
+        },
+        {
+            "$project": {
+                "_id": {
+                    "$concat": [
+                        "$_id.server",
+                        ":",
+                        "$_id.equipment_hash_id",
+                        ":",
+                        {"$dateToString": {"date": "$_id.bucket", "format": "%Y%m%d%H"}},
+                    ]
+                },
+                "server": "$_id.server",
+                "equipment_hash_id": "$_id.equipment_hash_id",
+                "bucket": "$_id.bucket",
+                "nb_uses": 1,
+                "nb_wins": 1,
+                "player_ids": 1,
+                "team_ids": 1,
+            }
+        },
+    ]
+    return pipeline
+
+
+async def rebuild_build_rollups() -> None:
+    """
+    Recomputes the build rollups from the battles collection, which unlike the
+    usage logs has the server, the battle time and the teams. Hourly rollups
+    are only rebuilt for the hourly retention.
+    """
+    started_at = time.monotonic()
+    hourly_since = get_rollup_bucket(
+        datetime.now(tz=timezone.utc) - timedelta(days=BUILD_ROLLUP_HOURLY_RETENTION_DAYS), "day"
+    )
+    for collection, unit in BUILD_ROLLUP_UNITS.items():
+        since = hourly_since if unit == "hour" else None
+        pipeline = _build_rollups_from_battles_pipeline(unit, since) + [{"$out": collection}]
+        await (await db.battles.aggregate(pipeline)).to_list()
+    logger.info(f"Rebuilt build rollups in {time.monotonic() - started_at:.2f}s")
+
+
+# --- Build Matchups ---
+
+
+def _build_matchups_stages(server: str, equipment_hash: str, limit_number: int) -> List[dict]:
+    def ranked_by_winrate(direction: int) -> List[dict]:
+        return [
+            {"$sort": {"winrate": direction, "nb_encounters": -1, "_id": 1}},
+            {"$limit": limit_number},
+        ]
+
+    return [
+        {
+            "$match": {
+                "server": server,
+                "equipment_hash_id": equipment_hash,
+                "nb_encounters": {"$gte": BUILD_MATCHUP_MIN_ENCOUNTERS},
+                "opponent_hash_id": {"$ne": equipment_hash},
+            }
+        },
+        {"$set": {"winrate": {"$divide": ["$nb_wins", "$nb_encounters"]}}},
+        {"$facet": {"counters": ranked_by_winrate(1), "victims": ranked_by_winrate(-1)}},
+    ]
+
+
+async def get_build_matchups(
+    server: str, equipment_hash: str, limit_number: int = BUILD_MATCHUP_SIZE
+) -> Dict[str, List[dict]]:
+    """
+    The opponent builds a build loses to most ("counters") and beats most
+    ("victims") on a server, among the ones it met BUILD_MATCHUP_MIN_ENCOUNTERS
+    times. The winrates are the build's own against each opponent.
+    """
+    cursor = await db.build_matchups.aggregate(
+        _build_matchups_stages(server, equipment_hash, limit_number)
+    )
+    facets = (await cursor.to_list())[0]
+
+    opponent_hashes = [
+        matchup["opponent_hash_id"] for matchups in facets.values() for matchup in matchups
+    ]
+    equipments = {
+        doc["_id"]: DBEquipment(**doc).to_equipment()
+        for doc in await db.equipments.find({"_id": {"$in": opponent_hashes}}).to_list()
+    }
+
+    return {
+        facet: [
+            {
+                "equipment_hash_id": matchup["opponent_hash_id"],
+                "equipment": equipments.get(matchup["opponent_hash_id"]),
+                "stats": {
+                    "nb_encounters": matchup["nb_encounters"],
+                    "winrate": str(round(matchup["winrate"] * 100, 2)) + '%',
+                },
+            }
+            for matchup in matchups
+            if matchup["opponent_hash_id"] in equipments
+        ]
+        for facet, matchups in facets.items()
+    }
+
+
+def _build_matchups_from_battles_pipeline() -> List[dict]:
+    """Recomputes every build matchup from the battles collection, like _build_battle5v5_writes counts them."""
+
+    def team_builds(team_field: str) -> dict:
+        return {
+            "$setUnion": [
+                {
+                    "$map": {
+                        "input": {
+                            "$filter": {
+                                "input": {"$objectToArray": "$players_builds"},
+                                "cond": {"$in": ["$$this.k", f"${team_field}"]},
+                            }
+                        },
+                        "in": "$$this.v",
+                    }
+                }
+            ]
+        }
+
+    return [
+        {
+            "$project": {
+                "server": 1,
+                "winner_builds": team_builds("winner_ids"),
+                "loser_builds": team_builds("loser_ids"),
+            }
+        },
+        {"$unwind": "$winner_builds"},
+        {"$unwind": "$loser_builds"},
+        {
+            "$project": {
+                "server": 1,
+                "sides": [
+                    {"build": "$winner_builds", "opponent": "$loser_builds", "won": 1},
+                    {"build": "$loser_builds", "opponent": "$winner_builds", "won": 0},
+                ],
+            }
+        },
+        {"$unwind": "$sides"},
+        {
+            "$group": {
+                "_id": {
+                    "server": "$server",
+                    "build": "$sides.build",
+                    "opponent": "$sides.opponent",
+                },
+                "nb_encounters": {"$sum": 1},
+                "nb_wins": {"$sum": "$sides.won"},
+            }
+        },
+        {
+            "$project": {
+                "_id": {"$concat": ["$_id.server", ":", "$_id.build", ":", "$_id.opponent"]},
+                "server": "$_id.server",
+                "equipment_hash_id": "$_id.build",
+                "opponent_hash_id": "$_id.opponent",
+                "nb_encounters": 1,
+                "nb_wins": 1,
+            }
+        },
+    ]
+
+
+async def rebuild_build_matchups() -> None:
+    """Recomputes the build_matchups collection from the battles collection."""
+    started_at = time.monotonic()
+    pipeline = _build_matchups_from_battles_pipeline() + [{"$out": "build_matchups"}]
+    await (await db.battles.aggregate(pipeline)).to_list()
+    logger.info(f"Rebuilt build matchups in {time.monotonic() - started_at:.2f}s")
+
+
+# --- Ratings ---
+
+
+def _rating_history_documents(
+    battle_id: int, battle_time: datetime, rating_updates: Dict[Tuple[str, str], Tuple[float, float]]
+) -> List[dict]:
+    """DBRatingSnapshot documents, built as plain dicts since replay_ratings makes millions of them."""
+    return [
+        {
+            "timestamp": battle_time,
+            "metadata": {"entity": entity, "id": id, "battle_id": battle_id},
+            "rating": round(rating, 2),
+            "delta": round(delta, 2),
+        }
+        for (entity, id), (rating, delta) in rating_updates.items()
+    ]
+
+
+async def load_ratings(battles: List[Tuple[Battle, str]]) -> None:
+    """Loads the stored ratings of the players and teams of the battles that are not in memory yet."""
+    ids = {
+        "players": {
+            player_id for battle, _ in battles for player_id in battle.team_a_ids + battle.team_b_ids
+        },
+        "teams": {
+            get_team_hash(team_ids)
+            for battle, _ in battles
+            for team_ids in [battle.team_a_ids, battle.team_b_ids]
+        },
+    }
+    for entity, entity_ids in ids.items():
+        missing_ids = ratings.missing(entity, list(entity_ids))
+        if not missing_ids:
+            continue
+        found = await db[entity].find(
+            {"_id": {"$in": missing_ids}}, {"rating": 1, "nb_rated_battles": 1}
+        ).to_list()
+        for doc in found:
+            ratings.load(entity, doc["_id"], doc.get("rating"), doc.get("nb_rated_battles", 0))
+        for id in set(missing_ids) - {doc["_id"] for doc in found}:
+            ratings.load(entity, id, None, 0)
+
+
+async def replay_ratings(batch_size: int = RATING_REPLAY_BATCH_SIZE) -> int:
+    """
+    Rebuilds every player and team rating, and the rating history, from the
+    battles collection in time order. Battles are streamed in batches of
+    batch_size and the history is inserted batch by batch while the next one
+    is rated. Nothing else may write ratings meanwhile: stop the bot and any
+    backfill first. Returns the number of battles replayed.
+    """
+    started_at = time.monotonic()
+    replay = EloRatings(
+        initial_rating=RATING_INITIAL,
+        k_factor=RATING_K_FACTOR,
+        provisional_k_factor=RATING_PROVISIONAL_K_FACTOR,
+        provisional_battles=RATING_PROVISIONAL_BATTLES,
+    )
+
+    await db.rating_history.drop()
+    await _create_time_series_collection(db, "rating_history")
+    for keys, options in INDEX_MANIFEST["rating_history"]:
+        await db.rating_history.create_index(keys, name=get_index_name(keys), **options)
+
+    nb_battles = 0
+    nb_inserts = 0
+    history: List[dict] = []
+    insert_task: asyncio.Task | None = None
+    cursor = (
+        db.battles.find(
+            {},
+            {"winner_ids": 1, "loser_ids": 1, "winning_team_id": 1, "losing_team_id": 1, "timestamp": 1},
+        )
+        .sort("timestamp", 1)
+        .batch_size(batch_size)
+    )
+    async for battle in cursor:
+        rating_updates = replay.rate_battle(
+            battle["winner_ids"], battle["loser_ids"], battle["winning_team_id"], battle["losing_team_id"]
+        )
+        history.extend(_rating_history_documents(battle["_id"], battle["timestamp"], rating_updates))
+        nb_battles += 1
+
+        if len(history) >= batch_size:
+            if insert_task is not None:
+                await insert_task
+            insert_task = asyncio.create_task(db.rating_history.insert_many(history, ordered=False))
+            history = []
+            nb_inserts += 1
+            if nb_inserts % 20 == 0:
+                logger.info(f"Replayed {nb_battles} battles")
+
+    if insert_task is not None:
+        await insert_task
+    if history:
+        await db.rating_history.insert_many(history, ordered=False)
+
+    for entity in LEADERBOARD_ENTITIES:
+        await db[entity].update_many({}, {"$unset": {"rating": "", "nb_rated_battles": ""}})
+    operations: Dict[str, List[UpdateOne]] = {}
+    for (entity, id), (rating, nb_rated_battles) in replay.items():
+        operations.setdefault(entity, []).append(
+            UpdateOne(
+                {"_id": id},
+                {"$set": {"rating": round(rating, 2), "nb_rated_battles": nb_rated_battles}},
+            )
+        )
+    for entity, entity_operations in operations.items():
+        for start in range(0, len(entity_operations), batch_size):
+            await db[entity].bulk_write(entity_operations[start:start + batch_size], ordered=False)
+
+    ratings.clear()
+    await rebuild_leaderboards()
+    logger.info(
+        f"Replayed the ratings of {nb_battles} battles ({len(replay)} players and teams) in {time.monotonic() - started_at:.2f}s"
+    )
+    return nb_battles
+
+
 def pretty_print_stats(stats):
     player = stats["player_stats"]
     relationships = stats["most_common_relationships"]
@@ -571,8 +1844,12 @@ def pretty_print_stats(stats):
         print(f"""\t{str(equipment.mainhand.type if equipment.mainhand else "").ljust(15)} \t{str(equipment.offhand.type if equipment.offhand else "").ljust(15)} \t{str(equipment.head.type if equipment.head else "").ljust(15)} \t{str(equipment.armor.type if equipment.armor else "").ljust(15)} \t{str(equipment.shoes.type if equipment.shoes else "").ljust(15)} \t{str(equipment.cape.type if equipment.cape else "").ljust(15)} \t{str(equipment_stats["nb_uses"]).ljust(15)} \t{equipment_stats["winrate"].ljust(15)} """)
 
 
+def _channels_filter(server: str, hg_type: str) -> Dict:
+    return {"server": server, "hg_type": hg_type}
+
+
 async def get_channels(server: str, hg_type: str):
-    channels = await db.channels.find({"server": server, "hg_type": hg_type}).to_list()
+    channels = await db.channels.find(_channels_filter(server, hg_type)).to_list()
     return [DBChannel(**doc) for doc in channels]
 
 async def add_channel(server_id: int,channel_id: int, server: str, hg_type: str):
@@ -1,35 +1,28 @@
 import asyncio
-from src.database import is_battle_new, save_data_from_battle5v5
+from src.database import (
+    DBCrawlCursor,
+    filter_new_battle_ids,
+    get_crawl_cursor,
+    save_crawl_cursor,
+    save_data_from_battles5v5,
+)
 from src.albion_objects import Battle
+from src.batch_classifier import classify_battles
+from src.battle_filter import battle_summary_filter
+from src.http_client import http_client
 from src.utils import logger
 from datetime import datetime, timedelta, timezone
-from typing import List, Dict
+from typing import AsyncIterator, List, Dict
 import json
 import os
-import aiohttp
+import time
 from config import *
 
 
-
-
 class HellgateWatcher:
     @staticmethod
     async def get_json(url: str) -> Dict | None:
-        json = None
-        tries = 0
-        while tries < MAX_RETRIES:
-            async with aiohttp.ClientSession(
-                timeout=aiohttp.ClientTimeout(total=TIMEOUT)
-            ) as session:
-                try:
-                    async with session.get(url) as response:
-                        response.raise_for_status()
-                        json = await response.json()
-
-                except Exception as e:
-                    logger.error(f"An error occurred while fetching {url}: {e}")
-            tries += 1
-            return json
+        return await http_client.get_json(url)
 
     @staticmethod
     async def _get_50_battles(server_url: str, limit=BATTLES_LIMIT, page=0):
@@ -56,6 +49,28 @@ class HellgateWatcher:
                 return True
         return
 
+    @staticmethod
+    def _reached_cursor(battles_dicts, cursor: DBCrawlCursor | None) -> bool:
+        """True once a page reaches battles that were already crawled in a previous cycle."""
+        if cursor is None:
+            return False
+
+        for battle_dict in battles_dicts:
+            if battle_dict["id"] <= cursor.battle_id:
+                return True
+        return False
+
+    @staticmethod
+    def _newest_battle(battles_dicts, cursor: DBCrawlCursor | None, server: str) -> DBCrawlCursor | None:
+        for battle_dict in battles_dicts:
+            if cursor is None or battle_dict["id"] > cursor.battle_id:
+                cursor = DBCrawlCursor(
+                    _id=server,
+                    battle_id=battle_dict["id"],
+                    start_time=datetime.fromisoformat(battle_dict["startTime"]),
+                )
+        return cursor
+
     @staticmethod
     def is_out_of_range(battle_dict, range_minutes=BATTLES_MAX_AGE_MINUTES):
         start_time = datetime.fromisoformat(battle_dict["startTime"])
@@ -64,139 +79,124 @@ class HellgateWatcher:
         )
 
     @staticmethod
-    async def get_recent_battles() -> Dict[str, Dict[str, List[Battle]]]:
-        recent_battles = {
-            "europe": {"5v5": [], "2v2": [], "total": 0},
-            "americas": {"5v5": [], "2v2": [], "total": 0},
-            "asia": {"5v5": [], "2v2": [], "total": 0},
-        }
-
-        for server in ["europe", "americas", "asia"]:
-            logger.debug(f"Started looking for battles in {server} server")
-            server_url = SERVER_URLS[server]
-            page_number = 0
-
-            while True:
-                logger.debug(f"Fetching 50 Battles from {server_url}")
-                batch = await HellgateWatcher._get_50_battles(server_url, page=page_number)
-                batch.reverse()
-            
-                if not batch:
-                    break
-
-                batch_tasks = [HellgateWatcher.process_single_battle(battle, server) for battle in batch]
-                results = await asyncio.gather(*batch_tasks)
-
-                for battle in results:
-                    if battle:
-                        recent_battles[server]["total"] += 1
-                        if battle.is_hellgate_5v5:
-                            recent_battles[server]["5v5"].append(battle)
-                        elif battle.is_hellgate_2v2:
-                            recent_battles[server]["2v2"].append(battle)
-
-                if  HellgateWatcher._contains_battles_out_of_range(batch):
-                    logger.debug("finished looking for battles in this server")
-                    break
-
-                page_number += 1
-
-            logger.info(
-                f"SERVER: {server.ljust(8)} \tFound {len(recent_battles[server]['5v5'])} 5v5 Hellgate Battles"
-            )
-            logger.info(
-                f"SERVER: {server.ljust(8)} \tFound {len(recent_battles[server]['2v2'])} 2v2 Hellgate Battles"
-            )
-
-        return recent_battles
+    async def iter_new_battles(server: str) -> AsyncIterator[List[dict]]:
+        """
+        Pages through a server's recent battles and yields, page by page, the
+        candidate battle dicts that have not been processed yet. Paging stops at
+        the server's crawl cursor, which is advanced once the crawl completes.
+        """
+        logger.debug(f"Started looking for battles in {server} server")
+        server_url = SERVER_URLS[server]
+        page_number = 0
+        started_at = time.monotonic()
+
+        cursor = await get_crawl_cursor(server)
+        newest = cursor
+
+        while True:
+            logger.debug(f"Fetching 50 Battles from {server_url}")
+            batch = await HellgateWatcher._get_50_battles(server_url, page=page_number)
+            batch.reverse()
+
+            if not batch:
+                break
+
+            newest = HellgateWatcher._newest_battle(batch, newest, server)
+
+            yield await HellgateWatcher.filter_new_battles(batch)
+
+            if HellgateWatcher._reached_cursor(batch, cursor):
+                logger.debug("reached previously crawled battles in this server")
+                break
+
+            # Safety bound when there is no cursor yet or it is far behind
+            if HellgateWatcher._contains_battles_out_of_range(batch):
+                logger.debug("finished looking for battles in this server")
+                break
+
+            page_number += 1
+
+        if newest is not None and newest is not cursor:
+            await save_crawl_cursor(newest)
+
+        logger.info(
+            f"SERVER: {server.ljust(8)} \tCrawled {page_number + 1} page(s) in {time.monotonic() - started_at:.2f}s"
+        )
 
     @staticmethod
-    async def process_single_battle(battle_dict: dict, server: str) -> Battle | None:
-        server_url = SERVER_URLS[server]
-        battle_id = battle_dict["id"]
-                
+    def _is_candidate(battle_dict: dict) -> bool:
         player_count = len(battle_dict["players"])
         if not (player_count == 4 or player_count == 10):
-            return
-
-        logger.debug(f"Checking if battle {battle_id} has already been processed")
-        if not await is_battle_new(battle_id):
-            logger.debug(f"Battle {battle_id} has already been processed, skipping battle")
-            return
-        
-        logger.debug(f"Fetching battle events for battle: {battle_id}")
-        battle_events = await HellgateWatcher.get_battle_events(
-            battle_id, server_url
+            return False
+        return battle_summary_filter.accepts(battle_dict)
+
+    @staticmethod
+    async def filter_new_battles(batch: List[dict]) -> List[dict]:
+        """Keeps the candidate battles of a page that are new, deduplicating the whole page in one batch."""
+        candidates = [
+            battle_dict for battle_dict in batch if HellgateWatcher._is_candidate(battle_dict)
+        ]
+        new_ids = set(
+            await filter_new_battle_ids([battle_dict["id"] for battle_dict in candidates])
         )
-        try:
+        logger.debug(f"{len(new_ids)} new battles out of {len(candidates)} candidates")
+
+        return [battle_dict for battle_dict in candidates if battle_dict["id"] in new_ids]
+
+    @staticmethod
+    async def process_battles(batch: List[dict], server: str, rate: bool = True) -> List[Battle | None]:
+        """
+        Processes a page of battles: deduplicates the page in one batch, fetches
+        the events concurrently and classifies every battle in one vectorized pass.
+        The 5v5 battles are only rated if rate is True.
+        """
+        server_url = SERVER_URLS[server]
+        new_battles = await HellgateWatcher.filter_new_battles(batch)
+
+        events = await asyncio.gather(
+            *[HellgateWatcher.get_battle_events(battle_dict["id"], server_url) for battle_dict in new_battles]
+        )
+        for battle_dict, battle_events in zip(new_battles, events):
             battle_dict["battle_events"] = battle_events
-            battle = Battle(battle_dict)
+
+        try:
+            modes = classify_battles(new_battles)
         except Exception as e:
-            logger.error(
-                f"An error occurred while parsing battle {battle_dict['id']}: {e}"
-            )
-            return
-        
-        if battle.is_hellgate_5v5:
-            logger.debug(f"Battle {battle.id} is a 5v5 Hellgate Battle")
-            await save_data_from_battle5v5(battle=battle, server=server)
-            return battle
-        elif battle.is_hellgate_2v2:
-            return battle
+            logger.error(f"An error occurred while classifying a page of battles: {e}")
+            return []
+
+        results = []
+        battles_5v5 = []
+        for battle_dict, mode in zip(new_battles, modes):
+            if mode is None:
+                continue
+            try:
+                battle = Battle(battle_dict)
+            except Exception as e:
+                logger.error(f"An error occurred while parsing battle {battle_dict['id']}: {e}")
+                continue
+            results.append(battle)
+            if mode == "5v5":
+                battles_5v5.append((battle, server))
+
+        # The page's 5v5 battles are persisted in one flush
+        logger.debug(f"{len(battles_5v5)} 5v5 Hellgate Battles in page")
+        await save_data_from_battles5v5(battles_5v5, rate=rate)
+        return results
 
     @staticmethod
     async def save_battles_5v5(
-        max_lookback_minutes: int, 
+        max_lookback_minutes: int,
         servers: List[str] = ["europe", "americas", "asia"]
     ) -> None:
         """
         Crawls servers for recent 5v5 battles within a specific lookback window
-        and saves them to the database using concurrent batch processing.
+        and saves them to the database using the resumable backfill engine.
         """
-        for server in servers:
-            logger.info(f"Started scanning {server} for 5v5 battles (Lookback: {max_lookback_minutes}m)")
-            server_url = SERVER_URLS[server]
-            page_number = 0
-            total_saved = 0
-
-            while True:
-                logger.debug(f"Fetching page {page_number} from {server}")
-                batch = await HellgateWatcher._get_50_battles(server_url, page=page_number)
-                
-                if not batch:
-                    logger.info(f"No more battles found on {server} at page {page_number}")
-                    break
-
-                # 1. Process the batch concurrently (Process 50 battles at once)
-                # This uses your process_single_battle which handles is_battle_new and save_data_from_battle5v5
-                batch_tasks = [
-                    HellgateWatcher.process_single_battle(battle_dict, server) 
-                    for battle_dict in batch
-                ]
-                results = await asyncio.gather(*batch_tasks)
-
-                # Count how many were actually 5v5 and saved
-                saved_in_batch = len([b for b in results if b and b.is_hellgate_5v5])
-                total_saved += saved_in_batch
-                
-                logger.info(f"Page {page_number} processed. 5v5 battles saved this batch: {saved_in_batch}")
-
-                # 2. Check if we have reached the time limit
-                # Note: contains_battles_out_of_range needs the max_lookback_minutes passed in
-                if HellgateWatcher._contains_battles_out_of_range(batch, range_minutes=max_lookback_minutes):
-                    logger.info(f"Reached lookback limit ({max_lookback_minutes}m) on {server}. Stopping.")
-                    break
-
-                # 3. Safety break for API limits
-                if page_number >= 199:
-                    logger.warning(f"Reached hard page limit (200) on {server}")
-                    break
-
-                page_number += 1
-                # Optional: Small sleep to be kind to the API
-                await asyncio.sleep(1)
-
-            logger.info(f"Finished {server}. Total 5v5 battles saved: {total_saved}")
+        # Imported here because the backfill engine is built on HellgateWatcher
+        from src.backfill import BackfillEngine
+
+        await BackfillEngine(max_lookback_minutes=max_lookback_minutes, servers=servers).run()
 
     @staticmethod
     async def get_battle_events(battle_id: int, server_url: str) -> List[dict]:
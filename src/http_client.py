@@ -0,0 +1,187 @@
+import asyncio
+import random
+import time
+import aiohttp
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict
+from urllib.parse import urlparse
+from config import (
+    TIMEOUT,
+    MAX_RETRIES,
+    RETRY_BACKOFF_SECONDS,
+    SERVER_URLS,
+    RATE_LIMIT_DELAY_SECONDS,
+    RATE_LIMIT_BURST,
+    MAX_CONCURRENT_REQUESTS_PER_HOST,
+    HTTP_POOL_LIMIT,
+    HTTP_POOL_LIMIT_PER_HOST,
+    HTTP_DNS_CACHE_TTL_SECONDS,
+    HTTP_KEEPALIVE_TIMEOUT_SECONDS,
+)
+from src.utils import logger
+
+
+class HostBudget:
+    """
+    Concurrency limit and token-bucket rate budget for a single host.
+    Tokens refill at one per RATE_LIMIT_DELAY_SECONDS, up to RATE_LIMIT_BURST.
+    """
+
+    def __init__(
+        self,
+        max_concurrent: int = MAX_CONCURRENT_REQUESTS_PER_HOST,
+        delay_seconds: float = RATE_LIMIT_DELAY_SECONDS,
+        burst: int = RATE_LIMIT_BURST,
+    ):
+        self.delay_seconds = delay_seconds
+        self.burst = burst
+        self._semaphore = asyncio.Semaphore(max_concurrent)
+        self._lock = asyncio.Lock()
+        self._tokens: float = burst
+        self._last_refill = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        if self.delay_seconds > 0:
+            self._tokens = min(
+                self.burst, self._tokens + (now - self._last_refill) / self.delay_seconds
+            )
+        else:
+            self._tokens = self.burst
+        self._last_refill = now
+
+    async def _take_token(self) -> None:
+        async with self._lock:
+            self._refill()
+            if self._tokens < 1:
+                await asyncio.sleep((1 - self._tokens) * self.delay_seconds)
+                self._refill()
+            self._tokens -= 1
+
+    @asynccontextmanager
+    async def acquire(self) -> AsyncIterator[None]:
+        async with self._semaphore:
+            await self._take_token()
+            yield
+
+
+class HttpClient:
+    """
+    Long-lived HTTP client shared by every gameinfo and render API request.
+    The underlying session is created lazily and kept open until close() is
+    called, so connections are pooled and reused per host across crawl cycles.
+    """
+
+    def __init__(self):
+        self._session: aiohttp.ClientSession | None = None
+        self._budgets: Dict[str, HostBudget] = {
+            urlparse(server_url).netloc: HostBudget()
+            for server_url in SERVER_URLS.values()
+        }
+        self.new_connections: int = 0
+        self.reused_connections: int = 0
+
+    def _create_session(self) -> aiohttp.ClientSession:
+        connector = aiohttp.TCPConnector(
+            limit=HTTP_POOL_LIMIT,
+            limit_per_host=HTTP_POOL_LIMIT_PER_HOST,
+            ttl_dns_cache=HTTP_DNS_CACHE_TTL_SECONDS,
+            keepalive_timeout=HTTP_KEEPALIVE_TIMEOUT_SECONDS,
+        )
+
+        trace_config = aiohttp.TraceConfig()
+        trace_config.on_connection_create_end.append(self._on_connection_create_end)
+        trace_config.on_connection_reuseconn.append(self._on_connection_reuseconn)
+
+        return aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(total=TIMEOUT),
+            trace_configs=[trace_config],
+        )
+
+    async def _on_connection_create_end(self, session, context, params):
+        self.new_connections += 1
+
+    async def _on_connection_reuseconn(self, session, context, params):
+        self.reused_connections += 1
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            self._session = self._create_session()
+        return self._session
+
+    @asynccontextmanager
+    async def _budget(self, url: str) -> AsyncIterator[None]:
+        """Applies the host's budget to gameinfo requests; other hosts are only pool-limited."""
+        budget = self._budgets.get(urlparse(url).netloc)
+        if budget is None:
+            yield
+            return
+        async with budget.acquire():
+            yield
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        return {
+            "new_connections": self.new_connections,
+            "reused_connections": self.reused_connections,
+        }
+
+    def log_stats(self) -> None:
+        total = self.new_connections + self.reused_connections
+        hit_rate = round(self.reused_connections / total * 100, 2) if total else 0
+        logger.info(
+            f"HTTP pool: {self.reused_connections} reused connections, "
+            f"{self.new_connections} new connections ({hit_rate}% pool hits)"
+        )
+
+    @staticmethod
+    def _is_retryable(error: Exception) -> bool:
+        """Timeouts, rate limiting and server errors are worth retrying; other errors will not change."""
+        if isinstance(error, asyncio.TimeoutError):
+            return True
+        if isinstance(error, aiohttp.ClientResponseError):
+            return error.status == 429 or error.status >= 500
+        return False
+
+    @staticmethod
+    def _retry_delay(error: Exception, attempt: int) -> float:
+        """Exponential backoff with jitter, or the server's Retry-After for a 429."""
+        if isinstance(error, aiohttp.ClientResponseError) and error.status == 429 and error.headers:
+            retry_after = error.headers.get("Retry-After")
+            if retry_after and retry_after.isdigit():
+                return float(retry_after)
+        return RETRY_BACKOFF_SECONDS * 2 ** attempt * random.uniform(0.5, 1.5)
+
+    async def get_json(self, url: str) -> Dict | None:
+        for attempt in range(MAX_RETRIES):
+            try:
+                async with self._budget(url), self.session.get(url) as response:
+                    response.raise_for_status()
+                    return await response.json()
+            except Exception as e:
+                logger.error(f"An error occurred while fetching {url}: {e}")
+                if not self._is_retryable(e) or attempt == MAX_RETRIES - 1:
+                    return None
+                # Waits outside the host budget so other requests keep flowing
+                await asyncio.sleep(self._retry_delay(e, attempt))
+        return None
+
+    async def get_bytes(self, url: str) -> bytes | None:
+        try:
+            async with self._budget(url), self.session.get(url) as response:
+                response.raise_for_status()
+                return await response.read()
+        except Exception as e:
+            logger.error(f"An error occurred while fetching {url}: {e}")
+            return None
+
+    async def close(self) -> None:
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+            self.log_stats()
+        self._session = None
+
+
+http_client = HttpClient()
@@ -4,8 +4,8 @@ from src.utils import logger
 from PIL import Image, ImageDraw, ImageFont, ImageEnhance
 from datetime import datetime
 import os
-import aiohttp
 from config import *
+from src.http_client import http_client
 from src.hellgate_watcher import clear_equipments_images
 
 # Shared Constants for a cohesive look
@@ -80,34 +80,11 @@ class BattleReportImageGenerator:
 
     @staticmethod
     async def get_image(url: str) -> bytes | None:
-        async with aiohttp.ClientSession(
-            timeout=aiohttp.ClientTimeout(total=TIMEOUT)
-        ) as session:
-            try:
-                async with session.get(url) as response:
-                    response.raise_for_status()
-                    return await response.read()
-
-            except Exception as e:
-                logger.error(f"An error occurred while fetching {url}: {e}")
-                return None
+        return await http_client.get_bytes(url)
 
     @staticmethod
     async def get_json(url: str) -> Dict | None:
-        attempt = 0
-        async with aiohttp.ClientSession(
-            timeout=aiohttp.ClientTimeout(total=TIMEOUT)
-        ) as session:
-            while attempt < MAX_RETRIES:
-                try:
-                    async with session.get(url) as response:
-                        response.raise_for_status()
-                        return await response.json()
-
-                except Exception as e:
-                    logger.error(f"An error occurred while fetching {url}: {e}")
-                attempt += 1
-        return None
+        return await http_client.get_json(url)
 
     @staticmethod
     async def generate_battle_report_2v2(battle: Battle) -> str:
@@ -450,7 +427,34 @@ class BattleReportImageGenerator:
             "FREQUENT TEAMMATES": await BattleReportImageGenerator.generate_team_mates_image(stats["most_common_relationships"]),
             "MOST USED BUILDS": await BattleReportImageGenerator.generate_equipment_with_stats_list_image(stats["most_played_builds"])
         }
-        
+        return BattleReportImageGenerator.stack_sections(paths, "summary")
+
+    @staticmethod
+    async def generate_build_matchups_image(build: Dict[str, Any], matchups: Dict[str, List[Dict[str, Any]]]) -> str:
+        """
+        Generates an image of a build with the builds it is countered by and
+        strong against. build and the matchup entries are dicts with 'equipment'
+        and 'stats', as returned by get_build_matchups.
+        """
+        sections = {
+            "BUILD": [build],
+            "COUNTERED BY": matchups["counters"],
+            "STRONG AGAINST": matchups["victims"],
+        }
+        paths = {
+            title: await BattleReportImageGenerator.generate_equipment_with_stats_list_image(entries)
+            for title, entries in sections.items()
+            if entries
+        }
+        # The single build panel keeps its size instead of being scaled up to the matchup rows
+        return BattleReportImageGenerator.stack_sections(paths, "matchups", fit_width=False)
+
+    @staticmethod
+    def stack_sections(paths: Dict[str, str], name: str, fit_width: bool = True) -> str:
+        """
+        Stacks section images under their titles, then deletes them. With
+        fit_width every section is resized to the width of the widest one.
+        """
         raw_images = {k: Image.open(v) for k, v in paths.items()}
         
         # 2. Resizing - Normalize all to the widest component
@@ -460,6 +464,9 @@ class BattleReportImageGenerator:
         
         processed_sections = []
         for title, img in raw_images.items():
+            if not fit_width:
+                processed_sections.append((title, img))
+                continue
             ratio = content_width / img.width
             new_h = int(img.height * ratio)
             processed_sections.append((title, img.resize((content_width, new_h), Image.Resampling.LANCZOS)))
@@ -488,7 +495,7 @@ class BattleReportImageGenerator:
             curr_y += img.height + GAP
 
         # 5. Final Save
-        save_path = f"{BATTLE_REPORT_IMAGE_FOLDER}/summary_{datetime.now().strftime('%Y%m%d%H%M%S')}.png"
+        save_path = f"{BATTLE_REPORT_IMAGE_FOLDER}/{name}_{datetime.now().strftime('%Y%m%d%H%M%S')}.png"
         final_image.save(save_path)
         
         # Cleanup
@@ -0,0 +1,293 @@
+import random
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Tuple
+from config import LEADERBOARD_CANDIDATES, SERVER_URLS
+from src.database import (
+    BUILD_ROLLUP_UNITS,
+    INDEX_MANIFEST,
+    LEADERBOARD_METRICS,
+    _build_matchups_stages,
+    _build_rollup_pipeline,
+    _build_rollup_ranges,
+    _channels_filter,
+    _leaderboard_rating_filter,
+    _leaderboard_winrate_pipeline,
+    _most_played_builds_pipeline,
+    _player_name_filter,
+    _player_statistics_pipeline,
+    _processed_battle_ids_filter,
+    _relationships_of_player_filter,
+    _similar_rosters_stages,
+    _teams_of_player_filter,
+    _top_builds_stages,
+    get_build_rollup_id,
+    get_index_name,
+    get_leaderboard_id,
+    get_rollup_bucket,
+)
+from src.utils import logger
+
+
+class QueryAudit:
+    """explain() summary of one query shape used by src/database.py"""
+
+    def __init__(self, name: str, collection: str, explain: Dict):
+        self.name = name
+        self.collection = collection
+        self.stages = set()
+        self.collection_scans = 0
+        self.docs_examined = 0
+        self.keys_examined = 0
+        self.returned = None
+        self._read(explain)
+
+    def _read(self, node) -> None:
+        if isinstance(node, list):
+            for child in node:
+                self._read(child)
+            return
+        if not isinstance(node, dict):
+            return
+
+        for key, value in node.items():
+            if key == "rejectedPlans":
+                continue
+            if key == "stage":
+                self.stages.add(value)
+                if value == "COLLSCAN":
+                    self.collection_scans += 1
+            elif key == "collectionScans":  # $lookup stages
+                self.collection_scans += value
+            elif key == "totalDocsExamined":
+                self.docs_examined += value
+            elif key == "totalKeysExamined":
+                self.keys_examined += value
+            elif key == "nReturned" and self.returned is None:
+                self.returned = value
+            else:
+                self._read(value)
+
+    @property
+    def ratio(self) -> float:
+        return self.docs_examined / max(self.returned or 0, 1)
+
+    def __str__(self):
+        status = "COLLSCAN" if self.collection_scans else "ok"
+        return (
+            f"{status.ljust(8)} \t{self.name.ljust(40)} \texamined: {str(self.docs_examined).ljust(6)} "
+            f"\tkeys: {str(self.keys_examined).ljust(6)} \treturned: {str(self.returned).ljust(6)} "
+            f"\tratio: {self.ratio:.2f}"
+        )
+
+
+async def _sample_values(database) -> Dict:
+    """Real ids and names to run the query shapes with."""
+    player = await database.players.find_one({}) or {
+        "_id": "player", "name": "Player", "server": "europe"
+    }
+    team = await database.teams.find_one({}) or {"_id": "team", "player_ids": [player["_id"]]}
+    equipment = await database.equipments.find_one({}) or {"_id": "equipment"}
+    return {
+        "player_id": player["_id"],
+        "player_name": player["name"],
+        "server": player["server"],
+        "team_id": team["_id"],
+        "team_player_ids": team["player_ids"],
+        "equipment_id": equipment["_id"],
+    }
+
+
+def _query_shapes(values: Dict) -> List[Tuple[str, str, Dict]]:
+    """
+    (name, collection, explain command body) for every query in src/database.py,
+    built with the same filter and pipeline builders as the queries themselves.
+    """
+    server = values["server"]
+    player_id = values["player_id"]
+    leaderboard_ids = [get_leaderboard_id(server, "players", metric) for metric in LEADERBOARD_METRICS]
+    now = datetime.now(tz=timezone.utc)
+    build_rollup_ranges = _build_rollup_ranges(now - timedelta(days=7, hours=6), now, now)
+
+    def find(collection, filter, sort=None, limit=None) -> Dict:
+        command = {"find": collection, "filter": filter}
+        if sort:
+            command["sort"] = sort
+        if limit:
+            command["limit"] = limit
+        return command
+
+    def aggregate(collection, pipeline) -> Dict:
+        return {"aggregate": collection, "pipeline": pipeline, "cursor": {}}
+
+    return [
+        ("filter_new_battle_ids", "processed_battle_ids",
+         find("processed_battle_ids", _processed_battle_ids_filter([1, 2, 3]))),
+        ("get_crawl_cursor", "crawl_cursors", find("crawl_cursors", {"_id": server}, limit=1)),
+        ("get_player_by_name_and_server", "players",
+         find("players", _player_name_filter(server, values["player_name"]), limit=1)),
+        ("get_player_by_id", "players", find("players", {"_id": player_id}, limit=1)),
+        ("get_most_played_builds", "player_equipment_usage_logs",
+         aggregate("player_equipment_usage_logs", _most_played_builds_pipeline(player_id, 5))),
+        ("get_most_common_relationships", "player_relationships",
+         find("player_relationships", _relationships_of_player_filter(player_id),
+              sort={"nb_shared_battles": -1}, limit=4)),
+        ("get_db_equipment_by_hash", "equipments", find("equipments", {"_id": values["equipment_id"]}, limit=1)),
+        ("get_team_by_hash", "teams", find("teams", {"_id": values["team_id"]}, limit=1)),
+        ("get_player_statistics", "players", aggregate("players", _player_statistics_pipeline(player_id))),
+        ("get_most_active_players", "players",
+         find("players", {"server": server}, sort={"nb_battles": -1}, limit=10)),
+        ("get_most_active_teams", "teams", find("teams", {"server": server}, sort={"nb_battles": -1}, limit=10)),
+        ("_leaderboard_entries (names)", "players", find("players", {"_id": {"$in": [player_id]}})),
+        ("update_leaderboards (boards)", "leaderboards", find("leaderboards", {"_id": {"$in": leaderboard_ids}})),
+        ("rebuild_leaderboards (wins)", "players",
+         find("players", {"server": server}, sort={"nb_wins": -1}, limit=LEADERBOARD_CANDIDATES)),
+        ("rebuild_leaderboards (rating)", "players",
+         find("players", _leaderboard_rating_filter(server), sort={"rating": -1}, limit=LEADERBOARD_CANDIDATES)),
+        ("load_ratings", "teams", find("teams", {"_id": {"$in": [values["team_id"]]}})),
+        ("replay_ratings", "battles", find("battles", {}, sort={"timestamp": 1}, limit=1000)),
+        ("rebuild_leaderboards (winrate)", "teams",
+         aggregate("teams", _leaderboard_winrate_pipeline(server))),
+        ("get_leaderboard", "leaderboards", find("leaderboards", {"_id": leaderboard_ids[0]}, limit=1)),
+        ("get_top_builds", "build_rollups_hourly",
+         aggregate(*_build_rollup_pipeline(server, build_rollup_ranges, _top_builds_stages("uses", 10)))),
+        ("get_build_matchups", "build_matchups",
+         aggregate("build_matchups", _build_matchups_stages(server, values["equipment_id"], 3))),
+        ("get_most_active_team_of_player", "teams",
+         find("teams", _teams_of_player_filter(player_id), sort={"nb_battles": -1}, limit=1)),
+        ("get_similar_rosters", "teams",
+         aggregate("teams", _similar_rosters_stages(server, values["team_player_ids"], 3, 10))),
+        ("get_channels", "channels", find("channels", _channels_filter(server, "5v5"))),
+    ]
+
+
+async def audit_index_manifest(database) -> List[str]:
+    """Problems with the indexes that exist compared with INDEX_MANIFEST."""
+    problems = []
+    for collection_name, indexes in INDEX_MANIFEST.items():
+        existing = set(await database[collection_name].index_information())
+        expected = {get_index_name(keys) for keys, _ in indexes}
+        for index_name in sorted(expected - existing):
+            problems.append(f"missing index {collection_name}.{index_name}")
+        for index_name in sorted(existing - expected - {"_id_"}):
+            problems.append(f"index {collection_name}.{index_name} is not in the manifest")
+    return problems
+
+
+async def audit_queries(database) -> List[QueryAudit]:
+    values = await _sample_values(database)
+    audits = []
+    for name, collection, command in _query_shapes(values):
+        explain = await database.command({"explain": command, "verbosity": "executionStats"})
+        audits.append(QueryAudit(name, collection, explain))
+    return audits
+
+
+async def seed_audit_database(database, nb_players: int = 2000, seed: int = 0) -> None:
+    """Fills an empty database with synthetic documents shaped like the ones ingest writes."""
+    rng = random.Random(seed)
+    now = datetime.now(tz=timezone.utc)
+    servers = list(SERVER_URLS)
+
+    await database.create_collection(
+        "player_equipment_usage_logs",
+        timeseries={"timeField": "timestamp", "metaField": "metadata", "granularity": "minutes"},
+    )
+
+    players = []
+    for index in range(nb_players):
+        nb_battles = rng.randint(1, 200)
+        nb_wins = rng.randint(0, nb_battles)
+        players.append({
+            "_id": f"player{index}",
+            "name": f"Player{index}",
+            "name_lc": f"player{index}",
+            "server": servers[index % len(servers)],
+            "first_seen": now - timedelta(days=30),
+            "last_seen": now - timedelta(minutes=rng.randint(0, 43200)),
+            "nb_battles": nb_battles,
+            "nb_wins": nb_wins,
+            "nb_losses": nb_battles - nb_wins,
+            "rating": round(rng.gauss(1500, 150), 2),
+            "nb_rated_battles": nb_battles,
+        })
+    await database.players.insert_many(players)
+
+    teams, relationships, logs, equipments, rollup_sources = [], [], [], {}, []
+    for index in range(nb_players // 5):
+        server = servers[index % len(servers)]
+        member_ids = [players[i]["_id"] for i in rng.sample(range(index % len(servers), nb_players, len(servers)), 5)]
+        nb_battles = rng.randint(1, 100)
+        nb_wins = rng.randint(0, nb_battles)
+        teams.append({
+            "_id": f"team{index}",
+            "player_ids": member_ids,
+            "server": server,
+            "last_seen": now,
+            "nb_battles": nb_battles,
+            "nb_wins": nb_wins,
+            "nb_losses": nb_battles - nb_wins,
+            "rating": round(rng.gauss(1500, 150), 2),
+            "nb_rated_battles": nb_battles,
+        })
+        for i, p1 in enumerate(sorted(member_ids)):
+            for p2 in sorted(member_ids)[i + 1:]:
+                relationships.append({
+                    "_id": f"{p1}_{p2}_{index}",
+                    "players": [p1, p2],
+                    "last_seen": now,
+                    "nb_shared_battles": nb_battles,
+                    "shared_wins": nb_wins,
+                })
+        for player_id in member_ids:
+            equipment_id = f"build{rng.randint(0, 200)}"
+            equipments[equipment_id] = {"_id": equipment_id, "main_hand": "MAIN_SWORD", "nb_uses": 1, "nb_wins": 0}
+            logs.append({
+                "timestamp": now - timedelta(minutes=rng.randint(0, 43200)),
+                "metadata": {"player_id": player_id, "equipment_hash_id": equipment_id, "won": rng.random() < 0.5},
+            })
+            rollup_sources.append((logs[-1], server, f"team{index}"))
+
+    rollups = {collection: {} for collection in BUILD_ROLLUP_UNITS}
+    for log, server, team_id in rollup_sources:
+        for collection, unit in BUILD_ROLLUP_UNITS.items():
+            bucket = get_rollup_bucket(log["timestamp"], unit)
+            rollup_id = get_build_rollup_id(server, log["metadata"]["equipment_hash_id"], bucket)
+            rollup = rollups[collection].setdefault(rollup_id, {
+                "_id": rollup_id,
+                "server": server,
+                "equipment_hash_id": log["metadata"]["equipment_hash_id"],
+                "bucket": bucket,
+                "nb_uses": 0,
+                "nb_wins": 0,
+                "player_ids": [],
+                "team_ids": [],
+            })
+            rollup["nb_uses"] += 1
+            rollup["nb_wins"] += log["metadata"]["won"]
+            rollup["player_ids"] = sorted(set(rollup["player_ids"]) | {log["metadata"]["player_id"]})
+            rollup["team_ids"] = sorted(set(rollup["team_ids"]) | {team_id})
+
+    await database.teams.insert_many(teams)
+    for collection, documents in rollups.items():
+        await database[collection].insert_many(list(documents.values()))
+    await database.player_relationships.insert_many(relationships)
+    await database.player_equipment_usage_logs.insert_many(logs)
+    await database.equipments.insert_many(list(equipments.values()))
+    await database.processed_battle_ids.insert_many(
+        [{"battle_id": battle_id, "created_at": now} for battle_id in range(nb_players)]
+    )
+    await database.channels.insert_many(
+        [{"_id": f"channel{index}", "server": servers[index % len(servers)], "hg_type": "5v5", "channel_id": index} for index in range(30)]
+    )
+    await database.leaderboards.insert_many(
+        [
+            {"_id": get_leaderboard_id(server, entity, metric), "server": server, "entity": entity, "metric": metric, "entries": [], "updated_at": now}
+            for server in servers
+            for entity in ["players", "teams"]
+            for metric in LEADERBOARD_METRICS
+        ]
+    )
+    await database.crawl_cursors.insert_many(
+        [{"_id": server, "battle_id": 0, "start_time": now} for server in servers]
+    )
+    logger.info(f"Seeded {nb_players} players, {len(teams)} teams and {len(logs)} usage logs")
@@ -0,0 +1,79 @@
+import json
+from typing import Dict, NamedTuple, Optional
+from config import ITEM_TAXONOMY_PATH
+
+
+class ItemTaxon(NamedTuple):
+    role: Optional[str]  # "healer", "tank", "melee" or "ranged"
+    armor_class: Optional[str]  # "plate", "leather" or "cloth"
+    artifact_line: Optional[str]  # e.g. "KEEPER", "HELL", "AVALON"
+    two_handed: bool
+
+
+class ItemTaxonomy:
+    """
+    Resolves item types (without tier and enchantment, e.g. "2H_HOLYSTAFF") to
+    an ItemTaxon using the rules in the taxonomy data file. Each item type is
+    resolved once and then served from a cache.
+    """
+
+    def __init__(self, taxonomy_path: str):
+        with open(taxonomy_path, "r") as f:
+            taxonomy = json.load(f)
+
+        self._two_handed_prefix: str = taxonomy["two_handed_prefix"]
+        self._healing_weapons = frozenset(taxonomy["healing_weapons"])
+        self._weapon_roles: Dict[str, str] = {
+            weapon_line: role
+            for role, weapon_lines in taxonomy["weapon_roles"].items()
+            for weapon_line in weapon_lines
+        }
+        self._armor_roles: Dict[str, str] = taxonomy["armor_classes"]
+        self._melee_plate_markers = taxonomy["melee_plate_markers"]
+        self._artifact_lines = frozenset(taxonomy["artifact_lines"])
+        self._taxa: Dict[str, ItemTaxon] = {}
+
+    def lookup(self, item_type: str) -> ItemTaxon:
+        taxon = self._taxa.get(item_type)
+        if taxon is None:
+            taxon = self._resolve(item_type)
+            self._taxa[item_type] = taxon
+        return taxon
+
+    def _resolve(self, item_type: str) -> ItemTaxon:
+        tokens = item_type.split("_")
+
+        armor_class = None
+        lowered_type = item_type.lower()
+        for candidate in self._armor_roles:
+            if candidate in lowered_type:
+                armor_class = candidate
+                break
+
+        if item_type in self._healing_weapons:
+            role = "healer"
+        elif armor_class is not None:
+            role = self._armor_roles[armor_class]
+            if armor_class == "plate" and any(
+                marker in item_type for marker in self._melee_plate_markers
+            ):
+                role = "melee"
+        else:
+            role = next(
+                (self._weapon_roles[token] for token in tokens if token in self._weapon_roles),
+                None,
+            )
+
+        artifact_line = next(
+            (token for token in reversed(tokens) if token in self._artifact_lines), None
+        )
+
+        return ItemTaxon(
+            role=role,
+            armor_class=armor_class,
+            artifact_line=artifact_line,
+            two_handed=item_type.startswith(self._two_handed_prefix),
+        )
+
+
+item_taxonomy = ItemTaxonomy(ITEM_TAXONOMY_PATH)
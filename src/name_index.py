@@ -0,0 +1,160 @@
+import heapq
+from bisect import bisect_left, insort
+from typing import Dict, Iterator, List, Tuple
+
+SuggestionKey = Tuple[int, str, str]
+
+
+def _suggestion_key(name: str) -> SuggestionKey:
+    """Shorter names first, then alphabetical ignoring case."""
+    return len(name), name.lower(), name
+
+
+class _TrieNode:
+    __slots__ = ("depth", "children", "top", "bucket")
+
+    def __init__(self, depth: int):
+        self.depth = depth
+        # None until the node is burst, names then continue in the children
+        self.children: Dict[str, "_TrieNode"] | None = None
+        # Best suggestions of the whole subtree
+        self.top: List[SuggestionKey] = []
+        # Sorted (lowercase name, name) of the subtree, or only of the names ending here once burst
+        self.bucket: List[Tuple[str, str]] = []
+
+
+class PrefixTrie:
+    """
+    Case-insensitive burst trie of names. A node keeps its names in a sorted
+    bucket until the bucket holds more than burst_size names, then splits them
+    into child nodes by their next character. Every node also keeps the best
+    max_suggestions names of its subtree, so a prefix that ends on a node is
+    answered from that list and any other prefix with a bisect in one bucket.
+    A larger limit on a burst node walks its subtree.
+    """
+
+    def __init__(self, max_suggestions: int = 25, burst_size: int = 128):
+        self.max_suggestions = max_suggestions
+        self.burst_size = burst_size
+        self._root = _TrieNode(depth=0)
+
+    def _add_to_top(self, node: _TrieNode, key: SuggestionKey) -> None:
+        top = node.top
+        if len(top) < self.max_suggestions or key < top[-1]:
+            insort(top, key)
+            del top[self.max_suggestions:]
+
+    def insert(self, name: str) -> bool:
+        lowered = name.lower()
+        path = [self._root]
+        node = self._root
+        while node.children is not None and len(lowered) > node.depth:
+            char = lowered[node.depth]
+            child = node.children.get(char)
+            if child is None:
+                child = _TrieNode(depth=node.depth + 1)
+                node.children[char] = child
+            node = child
+            path.append(node)
+
+        entry = (lowered, name)
+        position = bisect_left(node.bucket, entry)
+        if position < len(node.bucket) and node.bucket[position] == entry:
+            return False
+        node.bucket.insert(position, entry)
+
+        key = _suggestion_key(name)
+        for path_node in path:
+            self._add_to_top(path_node, key)
+
+        if node.children is None and len(node.bucket) > self.burst_size:
+            self._burst(node)
+        return True
+
+    def _burst(self, node: _TrieNode) -> None:
+        node.children = {}
+        staying = []
+        for lowered, name in node.bucket:
+            if len(lowered) == node.depth:
+                staying.append((lowered, name))
+                continue
+            char = lowered[node.depth]
+            child = node.children.get(char)
+            if child is None:
+                child = _TrieNode(depth=node.depth + 1)
+                node.children[char] = child
+            child.bucket.append((lowered, name))  # stays sorted, the bucket was
+            self._add_to_top(child, _suggestion_key(name))
+        node.bucket = staying
+
+        for child in node.children.values():
+            if len(child.bucket) > self.burst_size:
+                self._burst(child)
+
+    def search(self, prefix: str, limit: int) -> List[str]:
+        """Up to limit names starting with prefix, shortest and then alphabetical first."""
+        lowered = prefix.lower()
+        node = self._root
+        while node.children is not None and len(lowered) > node.depth:
+            node = node.children.get(lowered[node.depth])
+            if node is None:
+                return []
+
+        if len(lowered) == node.depth and limit <= self.max_suggestions:
+            return [name for _, _, name in node.top[:limit]]
+        if len(lowered) == node.depth and node.children is not None:
+            # The bucket only holds the names ending here, the others are in the children
+            keys = (_suggestion_key(name) for _, name in self._iter_subtree(node))
+            return [name for _, _, name in heapq.nsmallest(limit, keys)]
+
+        bucket = node.bucket
+        matches = []
+        for position in range(bisect_left(bucket, (lowered, "")), len(bucket)):
+            bucket_name, name = bucket[position]
+            if not bucket_name.startswith(lowered):
+                break
+            matches.append(name)
+        return sorted(matches, key=_suggestion_key)[:limit]
+
+
+    def _iter_subtree(self, node: _TrieNode) -> Iterator[Tuple[str, str]]:
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            yield from node.bucket
+            if node.children is not None:
+                stack.extend(node.children.values())
+
+
+class PlayerNameIndex:
+    """In-memory prefix index of player names per server, used for /stats autocomplete."""
+
+    def __init__(self, max_suggestions: int = 25):
+        self.max_suggestions = max_suggestions
+        self._tries: Dict[str, PrefixTrie] = {}
+        self.nb_names = 0
+
+    def add(self, server: str, name: str) -> None:
+        trie = self._tries.get(server)
+        if trie is None:
+            trie = PrefixTrie(max_suggestions=self.max_suggestions)
+            self._tries[server] = trie
+        if trie.insert(name):
+            self.nb_names += 1
+
+    def suggest(self, server: str | None, prefix: str, limit: int = 25) -> List[str]:
+        """Names starting with prefix on a server, or on every server if server is None."""
+        if not prefix:
+            return []
+        if server is not None:
+            trie = self._tries.get(server)
+            return trie.search(prefix, limit) if trie else []
+
+        suggestions = set()
+        for trie in self._tries.values():
+            suggestions.update(trie.search(prefix, limit))
+        return sorted(suggestions, key=_suggestion_key)[:limit]
+
+    def clear(self) -> None:
+        self._tries.clear()
+        self.nb_names = 0
@@ -0,0 +1,134 @@
+import asyncio
+import time
+from collections import Counter
+from typing import Awaitable, Callable, List, Tuple
+from config import (
+    SERVER_URLS,
+    PIPELINE_QUEUE_SIZE,
+    PIPELINE_EVENT_WORKERS,
+    PIPELINE_PARSE_WORKERS,
+    PIPELINE_PERSIST_WORKERS,
+    PIPELINE_RENDER_WORKERS,
+    PIPELINE_DELIVER_WORKERS,
+)
+from src.albion_objects import Battle, RawBattle
+from src.database import save_data_from_battle5v5
+from src.hellgate_watcher import HellgateWatcher
+from src.image_generator import BattleReportImageGenerator
+from src.utils import logger
+
+DeliverCallback = Callable[[str, str, str], Awaitable[None]]
+
+
+class BattleReportPipeline:
+    """
+    Streams battles from crawl to Discord one at a time through bounded queues:
+    page fetch -> event fetch -> parse/classify -> persist -> render -> deliver.
+    Each stage has its own worker count, and a full queue blocks the stage
+    before it, so only a bounded number of battles is in flight at once.
+    """
+
+    def __init__(
+        self,
+        deliver: DeliverCallback,
+        servers: List[str] = ["europe", "americas", "asia"],
+    ):
+        self.deliver = deliver
+        self.servers = servers
+        self.counts: Counter = Counter()
+
+        self._events_queue: asyncio.Queue[Tuple[str, dict]] = asyncio.Queue(PIPELINE_QUEUE_SIZE)
+        self._parse_queue: asyncio.Queue[Tuple[str, dict]] = asyncio.Queue(PIPELINE_QUEUE_SIZE)
+        self._persist_queue: asyncio.Queue[Tuple[str, str, Battle]] = asyncio.Queue(PIPELINE_QUEUE_SIZE)
+        self._render_queue: asyncio.Queue[Tuple[str, str, Battle]] = asyncio.Queue(PIPELINE_QUEUE_SIZE)
+        self._deliver_queue: asyncio.Queue[Tuple[str, str, str]] = asyncio.Queue(PIPELINE_QUEUE_SIZE)
+
+    async def run(self) -> Counter:
+        started_at = time.monotonic()
+
+        stages = [
+            (self._events_queue, self._fetch_events, PIPELINE_EVENT_WORKERS),
+            (self._parse_queue, self._parse, PIPELINE_PARSE_WORKERS),
+            (self._persist_queue, self._persist, PIPELINE_PERSIST_WORKERS),
+            (self._render_queue, self._render, PIPELINE_RENDER_WORKERS),
+            (self._deliver_queue, self._deliver, PIPELINE_DELIVER_WORKERS),
+        ]
+        workers = [
+            [asyncio.create_task(self._worker(queue, handler)) for _ in range(nb_workers)]
+            for queue, handler, nb_workers in stages
+        ]
+
+        try:
+            await asyncio.gather(*[self._fetch_pages(server) for server in self.servers])
+
+            # Once a stage's queue is drained nothing more can reach the next one
+            for (queue, _, _), stage_workers in zip(stages, workers):
+                await queue.join()
+                for worker in stage_workers:
+                    worker.cancel()
+        finally:
+            for stage_workers in workers:
+                for worker in stage_workers:
+                    worker.cancel()
+
+        logger.info(
+            f"Pipeline finished in {time.monotonic() - started_at:.2f}s: {dict(self.counts)}"
+        )
+        return self.counts
+
+    async def _worker(self, queue: asyncio.Queue, handler: Callable) -> None:
+        while True:
+            item = await queue.get()
+            try:
+                await handler(*item)
+            except Exception as e:
+                logger.error(f"An error occurred in pipeline stage {handler.__name__}: {e}")
+            finally:
+                queue.task_done()
+
+    async def _fetch_pages(self, server: str) -> None:
+        try:
+            async for new_battles in HellgateWatcher.iter_new_battles(server):
+                for battle_dict in new_battles:
+                    self.counts["new"] += 1
+                    await self._events_queue.put((server, battle_dict))
+        except Exception as e:
+            logger.error(f"An error occurred while crawling {server}: {e}")
+
+    async def _fetch_events(self, server: str, battle_dict: dict) -> None:
+        logger.debug(f"Fetching battle events for battle: {battle_dict['id']}")
+        battle_dict["battle_events"] = await HellgateWatcher.get_battle_events(
+            battle_dict["id"], SERVER_URLS[server]
+        )
+        await self._parse_queue.put((server, battle_dict))
+
+    async def _parse(self, server: str, battle_dict: dict) -> None:
+        try:
+            mode = RawBattle(battle_dict).hellgate_mode
+            if mode is None:
+                self.counts["rejected"] += 1
+                return
+            battle = Battle(battle_dict)
+        except Exception as e:
+            logger.error(f"An error occurred while parsing battle {battle_dict['id']}: {e}")
+            return
+
+        self.counts[mode] += 1
+        await self._persist_queue.put((server, mode, battle))
+
+    async def _persist(self, server: str, mode: str, battle: Battle) -> None:
+        if mode == "5v5":
+            logger.debug(f"Battle {battle.id} is a 5v5 Hellgate Battle")
+            await save_data_from_battle5v5(battle=battle, server=server)
+        await self._render_queue.put((server, mode, battle))
+
+    async def _render(self, server: str, mode: str, battle: Battle) -> None:
+        if mode == "5v5":
+            image_path = await BattleReportImageGenerator.generate_battle_report_5v5(battle)
+        else:
+            image_path = await BattleReportImageGenerator.generate_battle_report_2v2(battle)
+        await self._deliver_queue.put((server, mode, image_path))
+
+    async def _deliver(self, server: str, mode: str, image_path: str) -> None:
+        await self.deliver(server, mode, image_path)
+        self.counts["delivered"] += 1
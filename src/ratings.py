@@ -0,0 +1,94 @@
+from typing import Dict, List, Tuple
+from src.utils import LRUCache
+
+# (entity, id) with entity "players" or "teams"
+RatingKey = Tuple[str, str]
+# (rating, number of rated battles)
+RatingState = Tuple[float, int]
+
+
+def expected_score(rating: float, opponent_rating: float) -> float:
+    return 1 / (1 + 10 ** ((opponent_rating - rating) / 400))
+
+
+class EloRatings:
+    """
+    Elo ratings of players and rosters (teams).
+
+    A team's players are rated as one side whose rating is the mean of
+    theirs: every player moves by their own K times the gap between the
+    result and the side's expected score. The two rosters are rated against
+    each other the same way. Entities with fewer than provisional_battles
+    rated battles use provisional_k_factor, so new players settle quickly.
+    Rating a battle costs O(team size).
+
+    Ratings that are not in memory count as initial_rating with no battles;
+    callers load the stored ones first with missing() and load().
+    """
+
+    def __init__(
+        self,
+        initial_rating: float,
+        k_factor: float,
+        provisional_k_factor: float,
+        provisional_battles: int,
+        maxsize: int | None = None,
+    ):
+        self.initial_rating = initial_rating
+        self.k_factor = k_factor
+        self.provisional_k_factor = provisional_k_factor
+        self.provisional_battles = provisional_battles
+        self._ratings = LRUCache(maxsize=maxsize)
+
+    def __len__(self) -> int:
+        return len(self._ratings)
+
+    def missing(self, entity: str, ids: List[str]) -> List[str]:
+        return [id for id in ids if (entity, id) not in self._ratings]
+
+    def load(self, entity: str, id: str, rating: float | None, nb_rated_battles: int) -> None:
+        """Loads a stored rating, unless a newer one is already in memory."""
+        if (entity, id) not in self._ratings:
+            rating = self.initial_rating if rating is None else rating
+            self._ratings.set((entity, id), (rating, nb_rated_battles))
+
+    def get(self, entity: str, id: str) -> RatingState:
+        return self._ratings.get((entity, id), (self.initial_rating, 0))
+
+    def items(self) -> List[Tuple[RatingKey, RatingState]]:
+        return self._ratings.items()
+
+    def clear(self) -> None:
+        self._ratings.clear()
+
+    def _k_factor(self, nb_rated_battles: int) -> float:
+        if nb_rated_battles < self.provisional_battles:
+            return self.provisional_k_factor
+        return self.k_factor
+
+    def _rate_sides(
+        self, entity: str, winner_ids: List[str], loser_ids: List[str], updates: Dict
+    ) -> None:
+        winners = [self.get(entity, id) for id in winner_ids]
+        losers = [self.get(entity, id) for id in loser_ids]
+        winner_rating = sum(rating for rating, _ in winners) / len(winners)
+        loser_rating = sum(rating for rating, _ in losers) / len(losers)
+        winner_gain = 1 - expected_score(winner_rating, loser_rating)
+
+        for ids, states, score_gap in [
+            (winner_ids, winners, winner_gain),
+            (loser_ids, losers, -winner_gain),
+        ]:
+            for id, (rating, nb_rated_battles) in zip(ids, states):
+                delta = self._k_factor(nb_rated_battles) * score_gap
+                self._ratings.set((entity, id), (rating + delta, nb_rated_battles + 1))
+                updates[(entity, id)] = (rating + delta, delta)
+
+    def rate_battle(
+        self, winner_ids: List[str], loser_ids: List[str], winner_team: str, loser_team: str
+    ) -> Dict[RatingKey, Tuple[float, float]]:
+        """Rates one battle and returns the new (rating, delta) of every player and both teams."""
+        updates: Dict[RatingKey, Tuple[float, float]] = {}
+        self._rate_sides("players", winner_ids, loser_ids, updates)
+        self._rate_sides("teams", [winner_team], [loser_team], updates)
+        return updates
@@ -1,4 +1,6 @@
+from collections import OrderedDict
 import logging
+import time
 
 logging.basicConfig(
     level=logging.INFO,
@@ -7,3 +9,90 @@ logging.basicConfig(
 )
 logger = logging.getLogger("hellgate_watcher_logger")
 logger.setLevel(logging.INFO)
+
+
+class LRUCache:
+    """Bounded mapping that evicts the least recently used key once full. maxsize None never evicts."""
+
+    def __init__(self, maxsize: int | None):
+        self.maxsize = maxsize
+        self._data: OrderedDict = OrderedDict()
+
+    def __contains__(self, key) -> bool:
+        if key in self._data:
+            self._data.move_to_end(key)
+            return True
+        return False
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key, default=None):
+        if key not in self._data:
+            return default
+        self._data.move_to_end(key)
+        return self._data[key]
+
+    def set(self, key, value=None) -> None:
+        self._data[key] = value
+        self._data.move_to_end(key)
+        while self.maxsize is not None and len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def pop(self, key, default=None):
+        return self._data.pop(key, default)
+
+    def items(self) -> list:
+        return list(self._data.items())
+
+    def clear(self) -> None:
+        self._data.clear()
+
+
+class TTLCache(LRUCache):
+    """LRUCache whose entries also expire ttl_seconds after being set. Counts hits and misses."""
+
+    def __init__(self, maxsize: int, ttl_seconds: float):
+        super().__init__(maxsize)
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+
+    def __contains__(self, key) -> bool:
+        return self._get_entry(key) is not None
+
+    def _get_entry(self, key):
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        expires_at, _ = entry
+        if expires_at < time.monotonic():
+            del self._data[key]
+            return None
+        self._data.move_to_end(key)
+        return entry
+
+    def get(self, key, default=None):
+        entry = self._get_entry(key)
+        if entry is None:
+            self.misses += 1
+            return default
+        self.hits += 1
+        return entry[1]
+
+    def set(self, key, value=None) -> None:
+        super().set(key, (time.monotonic() + self.ttl_seconds, value))
+
+    def pop(self, key, default=None):
+        entry = self._data.pop(key, None)
+        return default if entry is None else entry[1]
+
+    @property
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
@@ -0,0 +1,85 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+from src.backfill import BackfillEngine
+from src.hellgate_watcher import HellgateWatcher
+from src.http_client import HostBudget
+
+
+class FakeRecentBattles:
+    """The /battles?sort=recent list, which gets new_per_fetch new battles in front after every fetch."""
+
+    def __init__(self, nb_battles: int, new_per_fetch: int):
+        self.now = datetime.now(timezone.utc)
+        self.next_id = 0
+        self.battles = []
+        self.new_per_fetch = new_per_fetch
+        self._add(nb_battles)
+
+    def _add(self, nb_battles: int) -> None:
+        for _ in range(nb_battles):
+            start_time = self.now - timedelta(minutes=1000) + timedelta(seconds=self.next_id)
+            self.battles.insert(0, {"id": self.next_id, "startTime": start_time.isoformat()})
+            self.next_id += 1
+
+    async def get_50_battles(self, server_url, limit=50, page=0):
+        await asyncio.sleep(0)
+        batch = [dict(battle) for battle in self.battles[page * limit:(page + 1) * limit]]
+        self._add(self.new_per_fetch)
+        return batch
+
+
+def _run_backfill(monkeypatch, tmp_path, recent_battles, max_pages=1000, stop_after_chunks=None):
+    processed = set()
+    nb_chunks = 0
+
+    async def process_battles(batch, server, rate=True):
+        assert not rate
+        processed.update(battle_dict["id"] for battle_dict in batch)
+        return []
+
+    monkeypatch.setattr(HellgateWatcher, "_get_50_battles", recent_battles.get_50_battles)
+    monkeypatch.setattr(HellgateWatcher, "process_battles", process_battles)
+
+    engine = BackfillEngine(
+        max_lookback_minutes=100_000,
+        servers=["europe"],
+        max_pages=max_pages,
+        chunk_pages=3,
+        checkpoint_path=str(tmp_path / "checkpoint.json"),
+    )
+    engine._budget = HostBudget(max_concurrent=4, delay_seconds=0, burst=4)
+    if stop_after_chunks is not None:
+        save_checkpoint = engine._save_checkpoint
+
+        def save_then_stop():
+            nonlocal nb_chunks
+            save_checkpoint()
+            nb_chunks += 1
+            if nb_chunks == stop_after_chunks:
+                raise KeyboardInterrupt
+
+        engine._save_checkpoint = save_then_stop
+
+    try:
+        asyncio.run(engine.run())
+    except KeyboardInterrupt:
+        pass
+    return processed
+
+
+def test_backfill_does_not_skip_battles_while_the_list_grows(monkeypatch, tmp_path):
+    recent_battles = FakeRecentBattles(nb_battles=1000, new_per_fetch=7)
+    processed = _run_backfill(monkeypatch, tmp_path, recent_battles)
+    assert set(range(1000)) <= processed
+
+
+def test_resumed_backfill_continues_from_the_oldest_processed_battle(monkeypatch, tmp_path):
+    recent_battles = FakeRecentBattles(nb_battles=1000, new_per_fetch=0)
+    processed = _run_backfill(monkeypatch, tmp_path, recent_battles, stop_after_chunks=2)
+    assert processed == set(range(700, 1000))
+
+    # 120 battles arrive while the backfill is stopped, shifting every offset
+    recent_battles._add(120)
+    processed |= _run_backfill(monkeypatch, tmp_path, recent_battles)
+    assert set(range(1000)) <= processed
+    assert not set(range(1000, 1120)) & processed
@@ -0,0 +1,70 @@
+import copy
+import random
+from src.albion_objects import Battle
+from src.batch_classifier import classify_battles, pack_battles
+from benchmarks.synthetic import battle_dict, player_dict
+
+
+def _expected_mode(data: dict) -> str | None:
+    try:
+        battle = Battle(copy.deepcopy(data))
+    except Exception:
+        return None
+    return "5v5" if battle.is_hellgate_5v5 else "2v2" if battle.is_hellgate_2v2 else None
+
+
+def _over_cap(data: dict, rng: random.Random) -> None:
+    event = rng.choice(data["battle_events"])
+    event["Killer"]["AverageItemPower"] = rng.choice([1400, 1500, 5000])
+
+
+def _oversized_group(data: dict, rng: random.Random) -> None:
+    event = rng.choice(data["battle_events"])
+    event["GroupMembers"].append(event["Victim"])
+
+
+def _zero_fame(data: dict, rng: random.Random) -> None:
+    rng.choice(data["battle_events"])["TotalVictimKillFame"] = 0
+
+
+def _outside_the_table(data: dict, rng: random.Random) -> None:
+    # Tier, enchantment and quality the precomputed table does not cover
+    item_dict = rng.choice(data["battle_events"])["Killer"]["Equipment"]["MainHand"]
+    item_dict["Type"] = rng.choice(["T9_2H_CLAYMORE", "T8_2H_CLAYMORE@5", "T8_MAIN_SWORD@9"])
+    item_dict["Quality"] = rng.choice([item_dict["Quality"], 6, 9])
+
+
+def _extra_player(data: dict, rng: random.Random) -> None:
+    event = rng.choice(data["battle_events"])
+    event["Participants"].append(player_dict("extra", event["Killer"]["Equipment"]))
+
+
+def _malformed(data: dict, rng: random.Random) -> None:
+    event = rng.choice(data["battle_events"])
+    mistake = rng.randrange(3)
+    if mistake == 0:
+        del event["Killer"]["Equipment"]
+    elif mistake == 1:
+        event["Victim"]["Equipment"]["Head"] = {"Type": "T", "Quality": 1}
+    else:
+        data["battle_events"] = None
+
+
+MUTATIONS = [_over_cap, _oversized_group, _zero_fame, _outside_the_table, _extra_player, _malformed]
+
+
+def test_classify_battles_matches_battle():
+    battle_dicts = []
+    for seed in range(600):
+        rng = random.Random(seed)
+        data = battle_dict(seed, players_per_team=rng.choice([2, 5]), nb_events=rng.choice([1, 3, 6]), seed=seed)
+        # Malformed goes last, it can remove the events the others change
+        for mutation in sorted(rng.sample(MUTATIONS, rng.choice([0, 0, 1, 2])), key=MUTATIONS.index):
+            mutation(data, rng)
+        battle_dicts.append(data)
+
+    expected = [_expected_mode(data) for data in battle_dicts]
+
+    assert classify_battles(battle_dicts) == expected
+    assert {"5v5", "2v2", None} <= set(expected)
+    assert pack_battles(battle_dicts).fallback_items
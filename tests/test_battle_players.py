@@ -0,0 +1,27 @@
+import pytest
+from src.albion_objects import Battle
+from benchmarks.synthetic import battle_dict
+
+
+def test_get_player_returns_the_merged_player_of_every_reference():
+    data = battle_dict(1, nb_events=30, seed=3)
+    first_killer = data["battle_events"][0]["Killer"]
+    # The first sighting lacks the cape, a later one has it
+    first_killer["Equipment"] = {**first_killer["Equipment"], "Cape": None}
+    battle = Battle(data)
+
+    referenced_ids = {
+        player["Id"]
+        for event in data["battle_events"]
+        for player in [event["Killer"], event["Victim"], *event["Participants"], *event["GroupMembers"]]
+    }
+    assert sorted(player.id for player in battle.players) == sorted(referenced_ids)
+    for player_id in referenced_ids:
+        assert battle.get_player(player_id) is next(player for player in battle.players if player.id == player_id)
+    assert battle.get_player(first_killer["Id"]).equipment.cape is not None
+
+
+def test_get_player_raises_for_an_unknown_id():
+    battle = Battle(battle_dict(1, seed=3))
+    with pytest.raises(ValueError):
+        battle.get_player("not a player")
@@ -0,0 +1,43 @@
+import src.database as database
+from src.albion_objects import Battle
+from src.database import _build_battle5v5_writes
+from benchmarks.synthetic import battle_dict
+
+
+class RecordingCounterBuffer:
+    def __init__(self):
+        self.adds = []
+
+    def add(self, collection, id, inc=None, set_fields=None, **fields):
+        self.adds.append((collection, id, inc or {}, set_fields or {}))
+
+
+def test_unrated_writes_leave_ratings_alone(monkeypatch):
+    counter_buffer = RecordingCounterBuffer()
+    monkeypatch.setattr(database, "counter_buffer", counter_buffer)
+    battle = Battle(battle_dict(1, seed=1))
+    before = {id: database.ratings.get("players", id) for id in battle.team_a_ids + battle.team_b_ids}
+
+    writes = _build_battle5v5_writes(battle, "europe", rate=False)
+
+    assert writes["rating_history"] == []
+    assert {id: database.ratings.get("players", id) for id in before} == before
+    for collection, _, inc, set_fields in counter_buffer.adds:
+        if collection in ("players", "teams"):
+            assert "nb_rated_battles" not in inc
+            assert "rating" not in set_fields
+            assert inc["nb_battles"] == 1
+
+
+def test_rated_writes_set_ratings(monkeypatch):
+    counter_buffer = RecordingCounterBuffer()
+    monkeypatch.setattr(database, "counter_buffer", counter_buffer)
+    battle = Battle(battle_dict(2, seed=2))
+
+    writes = _build_battle5v5_writes(battle, "europe")
+
+    assert len(writes["rating_history"]) == 12
+    for collection, _, inc, set_fields in counter_buffer.adds:
+        if collection in ("players", "teams"):
+            assert inc["nb_rated_battles"] == 1
+            assert "rating" in set_fields
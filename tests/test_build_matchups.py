@@ -0,0 +1,119 @@
+from collections import Counter, defaultdict
+import src.database as database
+from src.albion_objects import Battle
+from src.database import _build_battle5v5_writes, _build_matchups_from_battles_pipeline
+from benchmarks.synthetic import battle_dict
+
+
+class FakeCounterBuffer:
+    def __init__(self):
+        self.inc = defaultdict(Counter)
+
+    def add(self, collection, id, inc=None, **fields):
+        self.inc[(collection, id)].update(inc or {})
+
+
+# --- Python transcription of the aggregation operators the pipeline uses ---
+
+
+def _evaluate(expression, document: dict, variables: dict):
+    if isinstance(expression, str) and expression.startswith("$$"):
+        name, *path = expression[2:].split(".")
+        value = variables[name]
+        for field in path:
+            value = value[field]
+        return value
+    if isinstance(expression, str) and expression.startswith("$"):
+        value = document
+        for field in expression[1:].split("."):
+            value = value[field]
+        return value
+    if isinstance(expression, list):
+        return [_evaluate(element, document, variables) for element in expression]
+    if not isinstance(expression, dict):
+        return expression
+
+    operators = [key for key in expression if key.startswith("$")]
+    if not operators:
+        return {key: _evaluate(value, document, variables) for key, value in expression.items()}
+
+    (operator, argument), = expression.items()
+    if operator == "$objectToArray":
+        return [{"k": k, "v": v} for k, v in _evaluate(argument, document, variables).items()]
+    if operator == "$filter":
+        return [
+            this
+            for this in _evaluate(argument["input"], document, variables)
+            if _evaluate(argument["cond"], document, {**variables, "this": this})
+        ]
+    if operator == "$map":
+        return [
+            _evaluate(argument["in"], document, {**variables, "this": this})
+            for this in _evaluate(argument["input"], document, variables)
+        ]
+    if operator == "$in":
+        value, array = _evaluate(argument, document, variables)
+        return value in array
+    if operator == "$setUnion":
+        return sorted({value for array in _evaluate(argument, document, variables) for value in array})
+    if operator == "$concat":
+        return "".join(_evaluate(argument, document, variables))
+    raise NotImplementedError(operator)
+
+
+def _run_pipeline(pipeline, documents):
+    for stage in pipeline:
+        (name, spec), = stage.items()
+        if name == "$project":
+            documents = [
+                {
+                    field: document[field] if value == 1 else _evaluate(value, document, {})
+                    for field, value in spec.items()
+                    if value != 1 or field in document
+                }
+                for document in documents
+            ]
+        elif name == "$unwind":
+            field = spec[1:]
+            documents = [{**document, field: value} for document in documents for value in document[field]]
+        elif name == "$group":
+            groups = {}
+            for document in documents:
+                key = _evaluate(spec["_id"], document, {})
+                group = groups.setdefault(repr(key), {"_id": key})
+                for field, accumulator in spec.items():
+                    if field != "_id":
+                        (operator, argument), = accumulator.items()
+                        assert operator == "$sum"
+                        group[field] = group.get(field, 0) + _evaluate(argument, document, {})
+            documents = list(groups.values())
+        else:
+            raise NotImplementedError(name)
+    return documents
+
+
+def test_ingest_matchup_counters_match_the_rebuild_pipeline(monkeypatch):
+    fake_counter_buffer = FakeCounterBuffer()
+    monkeypatch.setattr(database, "counter_buffer", fake_counter_buffer)
+
+    battle_documents = []
+    for battle_id in range(300):
+        server = ["europe", "americas"][battle_id % 2]
+        battle = Battle(battle_dict(battle_id, seed=battle_id))
+        writes = _build_battle5v5_writes(battle, server)
+        battle_documents.append(writes["battles"][0]._doc)
+
+    ingested = {
+        id: dict(inc)
+        for (collection, id), inc in fake_counter_buffer.inc.items()
+        if collection == "build_matchups"
+    }
+    rebuilt = {
+        document["_id"]: {"nb_encounters": document["nb_encounters"], "nb_wins": document["nb_wins"]}
+        for document in _run_pipeline(_build_matchups_from_battles_pipeline(), battle_documents)
+    }
+
+    assert ingested == rebuilt
+    # The synthetic battles must exercise repeated pairs and mirror matchups
+    assert max(counts["nb_encounters"] for counts in rebuilt.values()) > 1
+    assert any(id.split(":")[1] == id.split(":")[2] for id in rebuilt)
@@ -0,0 +1,77 @@
+import asyncio
+from collections import Counter, defaultdict
+from src.counter_buffer import CounterBuffer
+
+
+class FakeCollection:
+    def __init__(self, db, name: str):
+        self.db = db
+        self.name = name
+
+    async def bulk_write(self, operations, ordered=True):
+        if self.name in self.db.failing:
+            raise RuntimeError(f"{self.name} is down")
+        for operation in operations:
+            self.db.counts[(self.name, operation._filter["_id"])].update(operation._doc["$inc"])
+
+
+class FakeDB:
+    def __init__(self):
+        self.failing = set()
+        self.counts = defaultdict(Counter)
+
+    def __getitem__(self, name: str) -> FakeCollection:
+        return FakeCollection(self, name)
+
+
+def _buffer(db, journal_path) -> CounterBuffer:
+    return CounterBuffer(db, str(journal_path), flush_interval_seconds=3600, max_pending=10_000)
+
+
+def test_partial_flush_failure_does_not_replay_written_collections(tmp_path):
+    journal_path = tmp_path / "journal.jsonl"
+    db = FakeDB()
+
+    async def run():
+        buffer = _buffer(db, journal_path)
+        await buffer.start()
+        buffer.add("a", "x", inc={"n": 1})
+        buffer.add("b", "y", inc={"n": 1})
+
+        db.failing = {"b"}
+        assert await buffer.flush() == 1
+        # Crash before "b" is retried: only its update is left to replay
+        buffer._timer_task.cancel()
+
+        db.failing = set()
+        restarted = _buffer(db, journal_path)
+        await restarted.start()
+        await restarted.stop()
+
+    asyncio.run(run())
+    assert db.counts[("a", "x")]["n"] == 1
+    assert db.counts[("b", "y")]["n"] == 1
+
+
+def test_journals_of_separate_processes_are_independent(tmp_path):
+    db = FakeDB()
+
+    async def run():
+        bot = _buffer(db, tmp_path / "bot.jsonl")
+        backfill = _buffer(db, tmp_path / "unused.jsonl")
+        await bot.start()
+        await backfill.start(journal_path=str(tmp_path / "backfill.jsonl"))
+
+        bot.add("a", "x", inc={"n": 1})
+        backfill.add("a", "x", inc={"n": 1})
+        await backfill.flush()
+        # The backfill's flush must not trim the bot's unflushed line
+        bot._timer_task.cancel()
+
+        restarted = _buffer(db, tmp_path / "bot.jsonl")
+        await restarted.start()
+        await restarted.stop()
+        await backfill.stop()
+
+    asyncio.run(run())
+    assert db.counts[("a", "x")]["n"] == 2
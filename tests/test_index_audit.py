@@ -0,0 +1,43 @@
+import asyncio
+import os
+import pytest
+from pymongo import AsyncMongoClient, MongoClient
+from pymongo.errors import PyMongoError
+from src.database import apply_index_manifest
+from src.index_audit import audit_index_manifest, audit_queries, seed_audit_database
+
+MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017")
+AUDIT_DATABASE = "hellgate_watcher_index_audit_test"
+
+
+def _mongod_is_reachable() -> bool:
+    client = MongoClient(MONGO_URI, serverSelectionTimeoutMS=500)
+    try:
+        client.admin.command("ping")
+        return True
+    except PyMongoError:
+        return False
+    finally:
+        client.close()
+
+
+@pytest.mark.skipif(not _mongod_is_reachable(), reason="no mongod reachable at MONGO_URI")
+def test_no_query_scans_a_collection():
+    async def run():
+        client = AsyncMongoClient(MONGO_URI)
+        try:
+            await client.drop_database(AUDIT_DATABASE)
+            database = client[AUDIT_DATABASE]
+            await seed_audit_database(database, nb_players=2000)
+            await apply_index_manifest(database)
+            return await audit_index_manifest(database), await audit_queries(database)
+        finally:
+            await client.drop_database(AUDIT_DATABASE)
+            await client.close()
+
+    problems, audits = asyncio.run(run())
+    for audit in audits:
+        print(audit)
+
+    assert problems == []
+    assert [audit.name for audit in audits if audit.collection_scans] == []
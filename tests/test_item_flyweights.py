@@ -0,0 +1,27 @@
+import pytest
+from src.albion_objects import Battle, MainHand, OffHand
+from benchmarks.synthetic import battle_dict
+
+
+def test_equal_items_share_one_immutable_instance():
+    item = MainHand.from_dict({"Type": "T8_MAIN_SWORD@3", "Quality": 4})
+
+    assert MainHand.from_dict({"Type": "T8_MAIN_SWORD@3", "Quality": 4}) is item
+    assert MainHand.from_dict({"Type": "T8_MAIN_SWORD@3", "Quality": 5}) is not item
+    assert OffHand.from_dict({"Type": "T8_MAIN_SWORD@3", "Quality": 4}) is not item
+    assert (item.type, item.tier, item.enchantment, item.quality) == ("MAIN_SWORD", 8, 3, 4)
+    with pytest.raises(AttributeError):
+        item.quality = 5
+    with pytest.raises(AttributeError):
+        del item.tier
+
+
+def test_parsed_battles_share_items_and_have_no_instance_dicts():
+    battle = Battle(battle_dict(1, seed=3))
+    other_battle = Battle(battle_dict(2, seed=3))
+    player = battle.players[0]
+    same_player = other_battle.get_player(player.id)
+
+    assert same_player.equipment.mainhand is player.equipment.mainhand
+    for instance in [player, player.equipment, player.equipment.head]:
+        assert not hasattr(instance, "__dict__")
@@ -0,0 +1,97 @@
+import itertools
+import pytest
+from config import BASE_IP
+from src.albion_objects import (
+    IP_CAP_PROFILES,
+    MAX_ENCHANTMENT,
+    MAX_QUALITY,
+    MAX_TIER,
+    Armor,
+    Bag,
+    Cape,
+    Food,
+    Head,
+    MainHand,
+    OffHand,
+    Potion,
+    Shoes,
+    _max_item_power_table,
+)
+
+ITEM_CLASSES = [MainHand, OffHand, Armor, Head, Shoes, Cape, Bag, Potion, Food]
+
+
+# --- Transcription of get_max_item_power before the lookup table ---
+
+
+def _apply_ip_cap(ip, ip_cap, soft_cap_percent):
+    if ip <= ip_cap:
+        return ip
+    return ip_cap + (ip - ip_cap) * (soft_cap_percent / 100)
+
+
+def _baseline_max_item_power(item_class, tier, enchantment, quality, ip_cap, ip_softcap_percent):
+    quality_ip = {0: 0, 1: 0, 2: 20, 3: 40, 4: 60, 5: 100}.get(quality, 0)
+    item_power = BASE_IP + tier * 100 + enchantment * 100 + quality_ip
+    item_power = _apply_ip_cap(item_power, ip_cap, ip_softcap_percent)
+    if item_class in (Cape, Bag, Potion, Food):
+        return item_power
+
+    # The baseline computes the mastery bonus as tier - (4 * 5), the table must keep it
+    mastery_bonus_percent = tier - 4 * 5
+    item_power += 100
+    item_power += 120 * 2
+    item_power += 3 * 0.2 * 120
+    item_power += 4 * 0.1 * 120
+    if item_class in (MainHand, OffHand):
+        item_power += 5 * 0.025 * 120
+    item_power += item_power * mastery_bonus_percent / 100
+    return _apply_ip_cap(item_power, ip_cap, ip_softcap_percent)
+
+
+def _item_type(tier: int, enchantment: int) -> str:
+    return f"T{tier}_2H_ITEM@{enchantment}" if enchantment else f"T{tier}_2H_ITEM"
+
+
+@pytest.mark.parametrize("item_class", ITEM_CLASSES, ids=lambda item_class: item_class.__name__)
+def test_max_item_power_table_matches_the_baseline(item_class):
+    combinations = itertools.product(
+        range(MAX_TIER + 1), range(MAX_ENCHANTMENT + 1), range(MAX_QUALITY + 1), IP_CAP_PROFILES
+    )
+    for tier, enchantment, quality, (ip_cap, ip_softcap_percent) in combinations:
+        item = item_class({"Type": _item_type(tier, enchantment), "Quality": quality})
+        key = (item_class, tier, enchantment, quality, ip_cap, ip_softcap_percent)
+        expected = _baseline_max_item_power(item_class, tier, enchantment, quality, ip_cap, ip_softcap_percent)
+
+        assert key in _max_item_power_table
+        assert _max_item_power_table[key] == pytest.approx(expected)
+        assert item.get_max_item_power(ip_cap, ip_softcap_percent) == pytest.approx(expected)
+
+
+@pytest.mark.parametrize(
+    "item_class, item_type, quality, expected",
+    [
+        (MainHand, "T8_2H_ITEM@4", 5, 1254.0),
+        (OffHand, "T4_OFF_ITEM", 1, 987.0),
+        (Armor, "T4_ARMOR_ITEM", 1, 974.4),
+        (Head, "T5_HEAD_ITEM@1", 2, 1125.55),
+        (Cape, "T6_CAPE@2", 3, 1114.0),
+        (Food, "T1_MEAL", 0, 400.0),
+    ],
+)
+def test_known_max_item_powers(item_class, item_type, quality, expected):
+    item = item_class({"Type": item_type, "Quality": quality})
+    assert item.get_max_item_power(1100, 35) == pytest.approx(expected)
+
+
+def test_uncached_combination_is_computed_and_stored():
+    ip_cap, ip_softcap_percent = 1234.0, 17
+    item = MainHand({"Type": "T8_2H_ITEM@4", "Quality": 5})
+    key = (MainHand, 8, 4, 5, ip_cap, ip_softcap_percent)
+    _max_item_power_table.pop(key, None)
+
+    item_power = item.get_max_item_power(ip_cap, ip_softcap_percent)
+
+    assert item_power == pytest.approx(_baseline_max_item_power(MainHand, 8, 4, 5, ip_cap, ip_softcap_percent))
+    assert _max_item_power_table[key] == item_power
+    del _max_item_power_table[key]
@@ -0,0 +1,23 @@
+import random
+import pytest
+from src.name_index import PrefixTrie
+
+
+def _expected(names, prefix, limit):
+    matches = [name for name in names if name.lower().startswith(prefix.lower())]
+    return sorted(matches, key=lambda name: (len(name), name.lower(), name))[:limit]
+
+
+@pytest.mark.parametrize("limit", [5, 25, 100, 1000])
+def test_search_matches_a_scan_beyond_max_suggestions(limit):
+    rng = random.Random(0)
+    # Far more names than max_suggestions and burst_size share the prefix "Ab"
+    names = sorted({
+        "Ab" + "".join(rng.choice("abcdeXYZ") for _ in range(rng.randint(0, 6))) for _ in range(600)
+    } | {"Zed", "Zebra", "ab"})
+    trie = PrefixTrie(max_suggestions=10, burst_size=8)
+    for name in names:
+        trie.insert(name)
+
+    for prefix in ["a", "Ab", "abc", "abXy", "z", "q"]:
+        assert trie.search(prefix, limit) == _expected(names, prefix, limit)
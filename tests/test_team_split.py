@@ -0,0 +1,145 @@
+import logging
+import random
+from src.albion_objects import Battle
+from benchmarks.synthetic import battle_dict
+
+
+# --- Transcription of the fixed-point loop _split_ids_by_team replaced ---
+
+
+def _fixed_point_split(battle):
+    team_a_ids = set()
+    team_b_ids = set()
+
+    all_player_ids = set([player.id for player in battle.players])
+
+    if battle.events:
+        team_a_ids.add(battle.events[0].killer.id)
+
+    for _ in range(len(all_player_ids) + 1):
+        for event in battle.events:
+            killer_id = event.killer.id
+            victim_id = event.victim.id
+
+            group_member_ids = {player.id for player in event.group_members}
+
+            if killer_id in team_a_ids:
+                team_a_ids.update(group_member_ids)
+                if victim_id not in team_a_ids:
+                    team_b_ids.add(victim_id)
+            elif killer_id in team_b_ids:
+                team_b_ids.update(group_member_ids)
+                if victim_id not in team_b_ids:
+                    team_a_ids.add(victim_id)
+
+            if victim_id in team_a_ids:
+                if killer_id not in team_a_ids:
+                    team_b_ids.add(killer_id)
+                    team_b_ids.update(group_member_ids)
+            elif victim_id in team_b_ids:
+                if killer_id not in team_b_ids:
+                    team_a_ids.add(killer_id)
+                    team_a_ids.update(group_member_ids)
+
+    if len(team_a_ids) >= len(battle.players) // 2:
+        team_b_ids.update(all_player_ids - team_a_ids)
+        team_a_ids = all_player_ids - team_b_ids
+    elif len(team_b_ids) >= len(battle.players) // 2:
+        team_a_ids.update(all_player_ids - team_b_ids)
+        team_b_ids = all_player_ids - team_a_ids
+
+    if team_a_ids.issubset(set(battle.victim_ids)):
+        team_a_ids, team_b_ids = team_b_ids, team_a_ids
+
+    return team_a_ids, team_b_ids
+
+
+def _mixed_battle_dict(battle_id: int, seed: int) -> dict:
+    """battle_dict where both teams get kills and killers only bring part of their group."""
+    rng = random.Random(seed)
+    players_per_team = rng.choice([2, 5])
+    battle = battle_dict(battle_id, players_per_team=players_per_team, nb_events=rng.randint(1, 10), seed=seed)
+    players = {event["Killer"]["Id"]: event["Killer"] for event in battle["battle_events"]}
+    players |= {event["Victim"]["Id"]: event["Victim"] for event in battle["battle_events"]}
+    team_a = sorted({event["Killer"]["Id"] for event in battle["battle_events"]})
+    team_b = sorted({event["Victim"]["Id"] for event in battle["battle_events"]})
+
+    rng.shuffle(battle["battle_events"])
+    for event in battle["battle_events"]:
+        if rng.random() < 0.4:
+            event["Killer"], event["Victim"] = event["Victim"], event["Killer"]
+        killer_id = event["Killer"]["Id"]
+        teammates = [player_id for player_id in (team_a if killer_id in team_a else team_b) if player_id != killer_id]
+        # The killer is always part of its own group
+        group = [killer_id] + rng.sample(teammates, rng.randint(0, len(teammates)))
+        event["GroupMembers"] = [players[player_id] for player_id in group]
+        event["Participants"] = [players[killer_id]]
+    return battle
+
+
+def test_union_find_split_matches_the_fixed_point_loop():
+    for seed in range(500):
+        battle = Battle(battle_dict(seed, seed=seed))
+        team_a_ids, team_b_ids = _fixed_point_split(battle)
+
+        assert not battle.team_conflicts
+        assert set(battle.team_a_ids) == team_a_ids
+        assert set(battle.team_b_ids) == team_b_ids
+
+
+def _agrees_with_every_event(team_a_ids, team_b_ids, battle) -> bool:
+    side = {**{player_id: "a" for player_id in team_a_ids}, **{player_id: "b" for player_id in team_b_ids}}
+    return all(
+        side.get(event.killer.id) != side.get(event.victim.id)
+        and all(side.get(member.id) == side.get(event.killer.id) for member in event.group_members)
+        for event in battle.events
+    )
+
+
+def _every_player_is_linked(battle) -> bool:
+    links = {player.id: set() for player in battle.players}
+    for event in battle.events:
+        for player in [event.victim, *event.group_members]:
+            links[event.killer.id].add(player.id)
+            links[player.id].add(event.killer.id)
+    reached, stack = set(), [battle.events[0].killer.id]
+    while stack:
+        player_id = stack.pop()
+        if player_id not in reached:
+            reached.add(player_id)
+            stack.extend(links[player_id])
+    return reached == set(links)
+
+
+def test_union_find_split_matches_the_fixed_point_loop_on_mixed_battles():
+    nb_identical = 0
+    for seed in range(500):
+        battle = Battle(_mixed_battle_dict(seed, seed))
+        team_a_ids, team_b_ids = _fixed_point_split(battle)
+
+        assert not battle.team_conflicts
+        if not _every_player_is_linked(battle):
+            # Both fill the unlinked players into whichever team is short
+            continue
+        assert _agrees_with_every_event(battle.team_a_ids, battle.team_b_ids, battle)
+        # The loop never put a killer on the side of its group members, so it can
+        # fill the players it missed into the wrong team; only compare when it did not
+        if _agrees_with_every_event(team_a_ids, team_b_ids, battle):
+            assert set(battle.team_a_ids) == team_a_ids
+            assert set(battle.team_b_ids) == team_b_ids
+            nb_identical += 1
+    assert nb_identical > 400
+
+
+def test_contradictory_event_is_recorded_and_logged(caplog):
+    battle = battle_dict(1, seed=1)
+    first_event = battle["battle_events"][0]
+    # The victim of the first kill is also listed in the killer's group
+    first_event["GroupMembers"].append(first_event["Victim"])
+
+    with caplog.at_level(logging.WARNING, logger="hellgate_watcher_logger"):
+        parsed = Battle(battle)
+
+    assert parsed.team_conflicts
+    assert all(first_event["Victim"]["Name"] in conflict for conflict in parsed.team_conflicts)
+    assert any("Conflicting team assignments" in record.message for record in caplog.records)